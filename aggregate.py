@@ -0,0 +1,904 @@
+import json
+import shutil
+import datetime
+from pathlib import Path
+from collections import Counter
+from sinks import Sink
+from keywords import TextFilter
+from features import TextFeatures
+
+
+def sort_dict(d):
+    d = {k: v for k, v in sorted(d.items(), key=lambda item: item[1], reverse=True)}
+    return d
+
+
+def add_counts(d: dict, other: dict):
+    for k, v in other.items():
+        if k not in d:
+            d[k] = v
+        else:
+            d[k] += v
+    return d
+
+
+def convert_dates(result: dict, dates):
+    """
+    turn the epochs of the active periods and author creations into dates
+    (see dates.py) and add the active spans
+    """
+    for line in result.values():
+        start = line["active_period"]["start_date"]
+        end = line["active_period"]["end_date"]
+        line["active_span"] = str(datetime.timedelta(seconds=end - start))
+        line["active_period"]["start_date"] = dates.date(start)
+        line["active_period"]["end_date"] = dates.date(end)
+        if "author_created_date" in line:
+            created = line["author_created_date"]
+            line["author_created_date"] = dates.date(created) if created else 0
+    return result
+
+
+class Aggregator:
+    """
+    base class of the aggregators fed by DataProcessor.aggregate
+
+    every aggregator sees the same scan of the data:
+    - setup() is called once with the processor and the sink all outputs are written to
+    - start() is called when a time chunk (or the whole run) begins
+    - update() is called with every line
+    - finish() is called when the chunk ends, it exports the result and resets
+
+    in parallel runs (see parallel.py) every worker runs start() and update() on
+    its part of the data and returns get_state(); the states are then merged in
+    data order with merge() before finish()
+
+    in incremental runs (see checkpoint.py) the state of the last run is merged
+    after start(), and the new state is kept before finish()
+
+    when the input is a database (see sql_store.py), aggregators with sql = True
+    get the result of a query with update_sql() instead of the lines. only
+    AuthorDict and IdDict have queries, the other aggregators read the lines of
+    the database like those of jsonl files
+    """
+
+    # keys read by the aggregator
+    fields = []
+    # modes the aggregator works with
+    modes = ["submissions", "comments"]
+    # whether the state can be kept and merged with later data (see checkpoint.py)
+    incremental = True
+    # write the json outputs over existing files instead of appending to them
+    overwrite = False
+    # whether update_sql() answers the export from a database
+    sql = False
+
+    def setup(self, processor, sink: Sink = None):
+        assert (
+            processor.mode in self.modes
+        ), f"{type(self).__name__} only works with {' or '.join(self.modes)}."
+        self.output_directory = processor.output_directory
+        self.mode = processor.mode
+        self.dates = processor.dates
+        self.sink = sink if sink is not None else Sink()
+
+    def write_json(self, output_path, result):
+        json_record = json.dumps(result, ensure_ascii=False)
+        self.sink.open(output_path, mode="w" if self.overwrite else "a+")
+        self.sink.write(output_path, json_record)
+        self.sink.close(output_path)
+
+    def start(self, filename: str):
+        pass
+
+    def update(self, line: dict):
+        raise NotImplementedError
+
+    def finish(self, filename: str):
+        raise NotImplementedError
+
+    def get_state(self) -> dict:
+        raise NotImplementedError
+
+    def merge(self, state: dict):
+        raise NotImplementedError
+
+    def update_sql(self, store, time_period_epochs: tuple = None, n_items: int = None):
+        raise NotImplementedError
+
+
+class AuthorDict(Aggregator):
+    """
+    {author: total_post/comment_number}
+
+    with table=True the dict is written as a table directory that is looked up
+    from disk, see kvstore.py
+    """
+
+    fields = ["author", "created_utc"]
+    sql = True
+
+    def __init__(self, table: bool = False):
+        self.table = table
+
+    def start(self, filename: str):
+        self.author_dict = {}
+
+    def update(self, line: dict):
+        author = line.get("author")
+        if author not in self.author_dict:
+            self.author_dict[author] = 1
+        else:
+            self.author_dict[author] += 1
+
+    def finish(self, filename: str):
+        output_path = (
+            Path(self.output_directory) / f"author_dict_{self.mode}_{filename}"
+        )
+        if self.table:
+            from kvstore import write_table
+
+            write_table(output_path, sort_dict(self.author_dict).items())
+        else:
+            self.write_json(
+                output_path.with_suffix(".json"), sort_dict(self.author_dict)
+            )
+        self.author_dict = {}
+
+    def get_state(self) -> dict:
+        return {"author_dict": self.author_dict}
+
+    def merge(self, state: dict):
+        add_counts(self.author_dict, state["author_dict"])
+
+    def update_sql(self, store, time_period_epochs: tuple = None, n_items: int = None):
+        add_counts(self.author_dict, store.author_counts(time_period_epochs, n_items))
+
+
+class IdDict(Aggregator):
+    """
+    {"flair": {post_id: flair}, "title": {post_id: title}}
+
+    with table=True it is written as a table directory of {post_id: [flair, title]}
+    that is looked up from disk, see kvstore.py
+    """
+
+    fields = ["id", "link_flair_text", "title", "created_utc"]
+    modes = ["submissions"]
+    sql = True
+
+    def __init__(self, table: bool = False):
+        self.table = table
+
+    def start(self, filename: str):
+        self.id_dict = {"flair": {}, "title": {}}
+
+    def add(self, id, flair, title):
+        if id in self.id_dict["flair"]:
+            raise Exception(
+                f"Post with id '{id}' has appeared twice. There may be duplicated files, "
+                "see DataProcessor.export_deduplicated."
+            )
+        self.id_dict["flair"][id] = flair
+        self.id_dict["title"][id] = title
+
+    def update(self, line: dict):
+        id = line.get("id")
+        if id:
+            self.add(id, line.get("link_flair_text"), line.get("title"))
+
+    def finish(self, filename: str):
+        output_path = (
+            Path(self.output_directory) / f"id_dict_{self.mode}_{filename}"
+        )
+        if self.table:
+            flairs = self.id_dict["flair"]
+            titles = self.id_dict["title"]
+            from kvstore import write_table
+
+            write_table(output_path, ((id, [flairs[id], titles[id]]) for id in flairs))
+        else:
+            self.write_json(output_path.with_suffix(".json"), self.id_dict)
+        self.id_dict = {"flair": {}, "title": {}}
+
+    def get_state(self) -> dict:
+        return {"id_dict": self.id_dict}
+
+    def merge(self, state: dict):
+        id_dict = state["id_dict"]
+        for id, flair in id_dict["flair"].items():
+            self.add(id, flair, id_dict["title"][id])
+
+    def update_sql(self, store, time_period_epochs: tuple = None, n_items: int = None):
+        for id, flair, title in store.posts(time_period_epochs, n_items):
+            if id:
+                self.add(id, flair, title)
+
+
+class AuthorSketch(Aggregator):
+    """
+    authors with at least min_count posts/comments and/or the top_n authors,
+    counted in fixed memory with a count-min sketch (see sketch.py)
+
+    the authors are counted in batches, an author becomes a candidate when its
+    estimate reaches min_count, with top_n only the candidates with the highest
+    estimates are kept. the estimates can be too high but never too low, so no
+    author is missed (except for top_n, where the candidates are approximate)
+
+    with exact=True nothing is written: the sketches and candidates are kept
+    for a second pass with FrequentAuthors, which counts only the candidates
+
+    in parallel runs the sketches of the parts are added, but an author only
+    becomes a candidate by reaching min_count within one part, so an author whose
+    lines are spread over the parts could be missed. parallel runs therefore
+    need exact=True: the exact pass checks the estimates of the added sketches
+    for every author instead of the candidates
+    """
+
+    fields = ["author", "created_utc"]
+    incremental = False
+
+    def __init__(
+        self,
+        min_count: int = None,
+        top_n: int = None,
+        width: int = 2**21,
+        depth: int = 4,
+        batch_size: int = 65536,
+        exact: bool = False,
+    ):
+        assert min_count or top_n, "AuthorSketch needs a min_count or top_n."
+        self.min_count = min_count
+        self.top_n = top_n
+        self.width = width
+        self.depth = depth
+        self.batch_size = batch_size
+        self.exact = exact
+        # number of candidates kept for top_n
+        self.capacity = top_n * 10 if top_n else None
+        # {filename: (sketch, candidates)} for the exact pass
+        self.results = {}
+
+    def output_path(self, filename: str) -> Path:
+        name = f"frequent_authors_{self.mode}_{filename}.json"
+        return Path(self.output_directory) / name
+
+    def select(self, counts: dict) -> dict:
+        """
+        the authors of the counts above min_count, the top_n first
+        """
+        if self.min_count:
+            counts = {k: v for k, v in counts.items() if v >= self.min_count}
+        counts = sort_dict(counts)
+        if self.top_n:
+            counts = dict(list(counts.items())[: self.top_n])
+        return counts
+
+    def start(self, filename: str):
+        from sketch import CountMinSketch
+
+        self.sketch = CountMinSketch(self.width, self.depth)
+        self.candidates = {}
+        self.batch = []
+
+    def update(self, line: dict):
+        self.batch.append(line.get("author"))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        counter = Counter(self.batch)
+        authors = list(counter)
+        import numpy as np
+
+        counts = np.fromiter(counter.values(), np.int64, len(authors))
+        self.sketch.add(authors, counts)
+        for author, estimate in zip(authors, self.sketch.estimate(authors)):
+            if self.min_count is None or estimate >= self.min_count:
+                self.candidates[author] = int(estimate)
+        if self.capacity and len(self.candidates) > 2 * self.capacity:
+            self.estimate_candidates()
+        self.batch = []
+
+    def estimate_candidates(self):
+        """
+        update the estimates of the candidates, with top_n keep the highest ones
+        """
+        authors = list(self.candidates)
+        estimates = self.sketch.estimate(authors).tolist()
+        self.candidates = sort_dict(dict(zip(authors, estimates)))
+        if self.capacity:
+            self.candidates = dict(list(self.candidates.items())[: self.capacity])
+
+    def finish(self, filename: str):
+        self.flush()
+        self.estimate_candidates()
+        if self.exact:
+            self.results[filename] = (self.sketch, set(self.candidates))
+        else:
+            self.write_json(self.output_path(filename), self.select(self.candidates))
+        self.sketch = None
+        self.candidates = {}
+
+    def get_state(self) -> dict:
+        self.flush()
+        return {"sketch": self.sketch, "candidates": self.candidates}
+
+    def merge(self, state: dict):
+        assert self.exact, "Parallel runs of AuthorSketch need exact=True."
+        self.sketch.merge(state["sketch"])
+        for author in state["candidates"]:
+            self.candidates[author] = 0
+
+
+class FrequentAuthors(Aggregator):
+    """
+    exact counts of the candidates of an AuthorSketch (second pass)
+
+    with top_n only the candidates are counted, otherwise every author whose
+    estimate reaches min_count, so the memory only grows with the frequent authors
+    """
+
+    fields = ["author", "created_utc"]
+    incremental = False
+
+    def __init__(self, sketch: AuthorSketch):
+        assert sketch.exact, "FrequentAuthors needs an AuthorSketch with exact=True."
+        self.author_sketch = sketch
+
+    def start(self, filename: str):
+        self.sketch, self.candidates = self.author_sketch.results[filename]
+        self.counts = {}
+        self.batch = []
+
+    def update(self, line: dict):
+        self.batch.append(line.get("author"))
+        if len(self.batch) >= self.author_sketch.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        counter = Counter(self.batch)
+        if self.author_sketch.top_n:
+            keep = {a: n for a, n in counter.items() if a in self.candidates}
+        else:
+            authors = list(counter)
+            estimates = self.sketch.estimate(authors)
+            keep = {
+                a: counter[a]
+                for a, estimate in zip(authors, estimates)
+                if estimate >= self.author_sketch.min_count
+            }
+        add_counts(self.counts, keep)
+        self.batch = []
+
+    def finish(self, filename: str):
+        self.flush()
+        self.write_json(
+            self.author_sketch.output_path(filename),
+            self.author_sketch.select(self.counts),
+        )
+        self.counts = {}
+
+    def get_state(self) -> dict:
+        self.flush()
+        return {"counts": self.counts}
+
+    def merge(self, state: dict):
+        add_counts(self.counts, state["counts"])
+
+
+class AuthorStats(Aggregator):
+    """
+    base class of the poster and commenter stats
+
+    if an author_dict is given, only its authors above the threshold are kept,
+    otherwise the authors are counted in the same scan and filtered when exporting
+
+    lines are collected in batches of batch_size and added to a StatsTable
+    (see author_stats.py), the nested dicts are only built when exporting.
+    the "numpy" engine reduces each batch with numpy, the "pandas" engine loads
+    the batch into a DataFrame and reduces it with groupby operations, both
+    give the same output
+    """
+
+    # name of the StatsTable in author_stats.py, imported when the stats start
+    table_class = None
+    # keys that are kept as python objects in the DataFrames of the pandas engine
+    text_fields = []
+
+    def __init__(
+        self,
+        threshold: int,
+        author_dict: dict = None,
+        custom_filename: str = None,
+        batch_size: int = 65536,
+        engine: str = "numpy",
+    ):
+        assert engine in ["numpy", "pandas"], f"{engine} is not an engine."
+        self.threshold = threshold
+        self.author_dict = author_dict
+        self.custom_filename = custom_filename
+        self.batch_size = batch_size
+        self.engine = engine
+
+    def output_name(self, filename: str) -> str:
+        raise NotImplementedError
+
+    def start(self, filename: str):
+        authors = None
+        if self.author_dict is not None:
+            authors = [
+                author
+                for author, total in self.author_dict.items()
+                if self.threshold <= 1 or total >= self.threshold
+            ]
+        import author_stats
+
+        self.table = getattr(author_stats, self.table_class)(authors)
+        self.batch = []
+
+    def update(self, line: dict):
+        self.batch.append(line)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.engine == "pandas":
+            if self.batch:
+                import pandas as pd
+
+                # text columns stay object columns so None is kept as None
+                df = pd.DataFrame(
+                    {
+                        key: pd.Series(
+                            [line.get(key) for line in self.batch],
+                            dtype=object if key in self.text_fields else None,
+                        )
+                        for key in self.fields
+                    }
+                )
+                self.table.add_frame(df)
+        else:
+            self.table.add_batch(self.batch)
+        self.batch = []
+
+    def finish(self, filename: str):
+        self.flush()
+        if self.author_dict is None:
+            order = self.table.get_order(self.threshold)
+        else:
+            order = [
+                (i, self.author_dict[author])
+                for i, author in enumerate(self.table.authors.names)
+            ]
+        result = self.table.to_result(order)
+        output_path = Path(self.output_directory) / self.output_name(filename)
+        self.write_json(output_path, convert_dates(result, self.dates))
+        self.table = None
+        self.batch = []
+
+    def get_state(self) -> dict:
+        self.flush()
+        return {"table": self.table}
+
+    def merge(self, state: dict):
+        self.flush()
+        self.table.merge(state["table"])
+
+
+class PosterStats(AuthorStats):
+    """
+    author stats (from raw submissions), see DataProcessor.export_poster_stats
+    """
+
+    fields = [
+        "id",
+        "author",
+        "created_utc",
+        "link_flair_text",
+        "removed_by_category",
+        "score",
+        "num_comments",
+        "upvote_ratio",
+    ]
+    text_fields = ["id", "author", "link_flair_text", "removed_by_category"]
+    modes = ["submissions"]
+    table_class = "PosterTable"
+
+    def output_name(self, filename: str) -> str:
+        if self.custom_filename:
+            return f"poster_stats_{filename}_(posts>={self.threshold})_{self.custom_filename}.json"
+        return f"poster_stats_{filename}_(posts>={self.threshold}).json"
+
+
+class CommenterStats(AuthorStats):
+    """
+    author stats (from processed comments), see DataProcessor.export_commenter_stats
+    """
+
+    fields = [
+        "comment_id",
+        "author",
+        "author_created_utc",
+        "created_utc",
+        "link_flair_text",
+        "is_submitter",
+        "score",
+        "banned_by",
+        "controversiality",
+    ]
+    text_fields = ["comment_id", "author", "link_flair_text", "banned_by"]
+    modes = ["comments"]
+    table_class = "CommenterTable"
+
+    def output_name(self, filename: str) -> str:
+        if self.custom_filename:
+            return f"commenter_stats_{filename}_(comments>={self.threshold})_{self.custom_filename}.json"
+        return f"commenter_stats_{filename}_(comments>={self.threshold}).json"
+
+
+class ProcessedLines(Aggregator):
+    """
+    processed lines with the default keys and/or custom keys, written as they come
+
+    without an author_dict the total posts/comments are counted in the same scan
+    and filled in by a second pass over the written chunk, so in chunked runs
+    they are the totals of each chunk, not of the whole time period
+
+    in parallel runs every worker writes its lines to a part file, the parts
+    are joined in data order when the chunk is finished
+
+    with text_features the token count, character count and normalized hash
+    of the body (comments) or selftext (submissions) are added, see features.py
+
+    the author_dict and id_dict can be dicts or tables looked up from disk
+    (DiskDict, see kvstore.py)
+    """
+
+    def __init__(
+        self,
+        author_dict: dict = None,
+        id_dict: dict = None,
+        default: bool = True,
+        custom_keys: list = None,
+        custom_filename: str = None,
+        text_features: bool = False,
+    ):
+        self.author_dict = author_dict
+        self.id_dict = id_dict
+        self.default = default
+        self.custom_keys = custom_keys
+        self.custom_filename = custom_filename
+        self.text_features = TextFeatures() if text_features else None
+        # set by parallel workers to write into part files
+        self.part_id = None
+
+    def setup(self, processor, sink: Sink = None):
+        super().setup(processor, sink)
+        if self.mode == "comments" and self.default:
+            assert self.id_dict is not None, "Comments need an id_dict of submissions."
+
+        # keys read by this export
+        if self.default:
+            if self.mode == "submissions":
+                fields = [
+                    "id",
+                    "author",
+                    "title",
+                    "selftext",
+                    "link_flair_text",
+                    "removed_by_category",
+                    "created_utc",
+                    "score",
+                    "upvote_ratio",
+                    "num_comments",
+                    "num_crossposts",
+                    "subreddit_subscribers",
+                ]
+            else:
+                fields = [
+                    "link_id",
+                    "id",
+                    "author",
+                    "author_created_utc",
+                    "body",
+                    "created_utc",
+                    "score",
+                    "no_follow",
+                    "collapsed_reason_code",
+                    "controversiality",
+                    "banned_by",
+                    "is_submitter",
+                ]
+        else:
+            fields = ["created_utc"]
+        if self.custom_keys:
+            fields = fields + [key for key in self.custom_keys if key not in fields]
+        self.text_key = "body" if self.mode == "comments" else "selftext"
+        if self.text_features is not None and self.text_key not in fields:
+            fields = fields + [self.text_key]
+        self.fields = fields
+
+        self.total_key = (
+            "total_posts" if self.mode == "submissions" else "total_comments"
+        )
+        self.fill_totals = self.default and self.author_dict is None
+        # lines that are already written cannot get new totals
+        self.incremental = not self.fill_totals
+
+    def output_path(self, filename: str) -> Path:
+        if self.custom_filename:
+            return (
+                Path(self.output_directory)
+                / f"processed_{filename}_{self.custom_filename}.jsonl"
+            )
+        return Path(self.output_directory) / f"processed_{filename}.jsonl"
+
+    def start(self, filename: str):
+        self.filename = filename
+        self.counts = {}
+        self.parts = []
+        self.path = None
+
+    def open(self):
+        path = self.output_path(self.filename)
+        if self.fill_totals or self.part_id is not None:
+            part_id = self.part_id or 0
+            path = path.with_name(f".{path.name}.{part_id}.part")
+            self.parts.append(path)
+            self.path = self.sink.open(path, mode="w")
+        else:
+            self.path = self.sink.open(path, mode="a+")
+
+    def close(self):
+        if self.path is not None:
+            self.sink.close(self.path)
+            self.path = None
+
+    def process(self, line: dict) -> dict:
+        newline = {}
+        if self.default:
+            # Post
+            if self.mode == "submissions":
+                # id
+                newline["post_id"] = line.get("id")
+                # author
+                author = line.get("author")
+                newline["author"] = author
+                # total_posts
+                newline["total_posts"] = (
+                    self.author_dict.get(author)
+                    if self.author_dict is not None
+                    else None
+                )
+                # title
+                newline["title"] = line.get("title")
+                # selftext
+                newline["selftext"] = line.get("selftext")
+                # flair
+                newline["link_flair_text"] = line.get("link_flair_text")
+                # removed_by_category
+                newline["removed_by_category"] = line.get("removed_by_category")
+                # utc
+                utc = line.get("created_utc")
+                newline["created_utc"] = utc
+                # date
+                date = self.dates.date(utc)
+                newline["date"] = date
+                # month
+                newline["month"] = date[:7] if date else None
+                # score
+                newline["score"] = line.get("score")
+                # upvote_ratio
+                newline["upvote_ratio"] = line.get("upvote_ratio")
+                # num_comments
+                newline["num_comments"] = line.get("num_comments")
+                # num_crossposts
+                newline["num_crossposts"] = line.get("num_crossposts")
+                # subreddit_subscribers
+                newline["subreddit_subscribers"] = line.get("subreddit_subscribers")
+
+            # Comment
+            if self.mode == "comments":
+                # id
+                post_id = line.get("link_id")
+                if post_id:
+                    newline["post_id"] = post_id.split("_")[1]
+                else:
+                    newline["post_id"] = None
+                newline["comment_id"] = line.get("id")
+                # author
+                author = line.get("author")
+                newline["author"] = author
+                # total_comments
+                newline["total_comments"] = (
+                    self.author_dict.get(author)
+                    if self.author_dict is not None
+                    else None
+                )
+                # author_created_utc
+                u = line.get("author_created_utc")
+                newline["author_created_utc"] = u
+                # author_created_date
+                newline["author_created_date"] = self.dates.date(u)
+                # body
+                newline["body"] = line.get("body")
+                # flair & post title
+                if post_id and not isinstance(self.id_dict, dict):
+                    # DiskDict of [flair, title]
+                    flair, title = self.id_dict.get(newline["post_id"], (None, None))
+                elif post_id:
+                    i = newline["post_id"]
+                    flair = self.id_dict["flair"].get(i)
+                    title = self.id_dict["title"].get(i)
+                else:
+                    flair = None
+                    title = None
+                newline["link_flair_text"] = flair
+                newline["title"] = title
+                # utc
+                utc = line.get("created_utc")
+                newline["created_utc"] = utc
+                # date
+                date = self.dates.date(utc)
+                newline["date"] = date
+                # month
+                newline["month"] = date[:7] if date else None
+                # score
+                newline["score"] = line.get("score")
+                # no_follow
+                newline["no_follow"] = line.get("no_follow")
+                # collapsed_reason_code
+                newline["collapsed_reason_code"] = line.get("collapsed_reason_code")
+                # controversiality
+                newline["controversiality"] = line.get("controversiality")
+                # banned_by
+                newline["banned_by"] = line.get("banned_by")
+                # is_submitter
+                newline["is_submitter"] = line.get("is_submitter")
+        if self.custom_keys:
+            for key in self.custom_keys:
+                newline[key] = line.get(key)
+        if self.text_features is not None:
+            newline.update(self.text_features.get(line.get(self.text_key)))
+        return newline
+
+    def update(self, line: dict):
+        if self.fill_totals:
+            author = line.get("author")
+            if author not in self.counts:
+                self.counts[author] = 1
+            else:
+                self.counts[author] += 1
+        newline = self.process(line)
+        json_record = json.dumps(newline, ensure_ascii=False)
+        if self.path is None:
+            self.open()
+        self.sink.write(self.path, json_record + "\n")
+
+    def finish(self, filename: str):
+        self.close()
+        if self.parts:
+            output_path = self.sink.open(self.output_path(filename), mode="a+")
+            for part_path in self.parts:
+                with part_path.open(mode="r", encoding="utf-8") as f_in:
+                    if self.fill_totals:
+                        # second pass over the written chunk to fill in the totals
+                        for record in f_in:
+                            newline = json.loads(record)
+                            newline[self.total_key] = self.counts.get(newline["author"])
+                            json_record = json.dumps(newline, ensure_ascii=False)
+                            self.sink.write(output_path, json_record + "\n")
+                    else:
+                        self.sink.flush(output_path)
+                        shutil.copyfileobj(f_in, self.sink.handles[output_path][0])
+                part_path.unlink()
+            self.sink.close(output_path)
+        self.counts = {}
+        self.parts = []
+
+    def get_state(self) -> dict:
+        self.close()
+        return {"parts": self.parts, "counts": self.counts}
+
+    def merge(self, state: dict):
+        self.parts += state["parts"]
+        add_counts(self.counts, state["counts"])
+
+
+class Corpus(Aggregator):
+    """
+    texts for AntConc, written one per line into txt files of max_lines entries,
+    the texts are chosen by a TextFilter (see keywords.py)
+
+    in parallel runs every worker writes its texts to a part file (one json
+    string per line), the parts are split into the txt files in data order
+    when the chunk is finished
+    """
+
+    incremental = False
+
+    def __init__(
+        self,
+        text_filter: TextFilter = None,
+        max_lines: int = 20000,
+        text_key: str = None,
+        custom_filename: str = None,
+    ):
+        self.text_filter = text_filter if text_filter is not None else TextFilter()
+        self.max_lines = max_lines
+        self.text_key = text_key
+        self.custom_filename = custom_filename
+        # set by parallel workers to write into part files
+        self.part_id = None
+
+    def setup(self, processor, sink: Sink = None):
+        super().setup(processor, sink)
+        if self.text_key is None:
+            self.text_key = "body" if self.mode == "comments" else "selftext"
+        self.fields = ["created_utc", self.text_key] + TextFilter.fields
+
+    def output_path(self, filename: str, number: int) -> Path:
+        name = f"corpus_{self.mode}_{filename}"
+        if self.custom_filename:
+            name = f"{name}_{self.custom_filename}"
+        return Path(self.output_directory) / f"{name}_{number}.txt"
+
+    def start(self, filename: str):
+        self.filename = filename
+        self.parts = []
+        self.path = None
+        # number of txt files and entries in the last one
+        self.number = 0
+        self.count = 0
+
+    def close(self):
+        if self.path is not None:
+            self.sink.close(self.path)
+            self.path = None
+
+    def write_entry(self, text: str):
+        if self.path is None or self.count >= self.max_lines:
+            self.close()
+            self.number += 1
+            self.path = self.sink.open(
+                self.output_path(self.filename, self.number), mode="w"
+            )
+            self.count = 0
+        self.sink.write(self.path, text + "\n")
+        self.count += 1
+
+    def update(self, line: dict):
+        text = self.text_filter.get_text(line, self.text_key)
+        if text is None:
+            return
+        if self.part_id is None:
+            self.write_entry(text)
+            return
+        if self.path is None:
+            path = self.output_path(self.filename, 0)
+            path = path.with_name(f".{path.name}.{self.part_id}.part")
+            self.parts.append(path)
+            self.path = self.sink.open(path, mode="w")
+        self.sink.write(self.path, json.dumps(text, ensure_ascii=False) + "\n")
+
+    def finish(self, filename: str):
+        self.close()
+        for part_path in self.parts:
+            with part_path.open(mode="r", encoding="utf-8") as f_in:
+                for record in f_in:
+                    self.write_entry(json.loads(record))
+            part_path.unlink()
+        self.close()
+        self.parts = []
+
+    def get_state(self) -> dict:
+        self.close()
+        return {"parts": self.parts}
+
+    def merge(self, state: dict):
+        self.parts += state["parts"]
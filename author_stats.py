@@ -0,0 +1,930 @@
+import gc
+import numpy as np
+
+
+class Interner:
+    """
+    map strings (or None) to consecutive int ids, in order of first appearance
+    """
+
+    def __init__(self, names=()):
+        self.names = list(dict.fromkeys(names))
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name) -> int:
+        i = self.ids.get(name)
+        if i is None:
+            i = len(self.names)
+            self.ids[name] = i
+            self.names.append(name)
+        return i
+
+    def intern_many(self, names) -> np.ndarray:
+        get = self.ids.get
+        intern = self.intern
+        ids = [get(name) for name in names]
+        if None in ids:
+            ids = [intern(name) if i is None else i for name, i in zip(names, ids)]
+        return np.array(ids, dtype=np.int32)
+
+    def lookup_many(self, names) -> np.ndarray:
+        """
+        like intern_many, but unknown names are -1
+        """
+        get = self.ids.get
+        return np.array([get(name, -1) for name in names], dtype=np.int32)
+
+
+def first_index(keys: np.ndarray):
+    """
+    return the unique keys and the index of their first appearance
+    """
+    return np.unique(keys, return_index=True)
+
+
+def last_index(keys: np.ndarray):
+    """
+    return the unique keys and the index of their last appearance
+    """
+    unique, index = np.unique(keys[::-1], return_index=True)
+    return unique, len(keys) - 1 - index
+
+
+def max_index(keys: np.ndarray, values: np.ndarray):
+    """
+    return the unique keys and the index of the first appearance of their maximum
+    """
+    order = np.lexsort((np.arange(len(keys)), -values, keys))
+    unique, index = np.unique(keys[order], return_index=True)
+    return unique, order[index]
+
+
+class StatsTable:
+    """
+    compact per-author accumulators of the poster and commenter stats
+
+    every author is interned to an int id, and the stats are numpy arrays
+    indexed by that id. Flairs (and remove categories) are interned too and
+    counted in small author x flair matrices, together with the position of
+    their first appearance so the ratios keep the order of the loop version.
+
+    lines are added in batches, each batch is reduced with numpy into a table
+    of its own and merged into this one. Tables of parallel workers are merged
+    the same way, in data order.
+    """
+
+    # {column: (dtype, fill value)}
+    columns = {}
+    # {matrix: (dtype, fill value, interner name)}
+    matrices = {}
+    # (count matrix, first position matrix) pairs
+    ratios = []
+    # columns kept as {link: maximum}
+    maxima = []
+
+    def __init__(self, authors: list = None):
+        """
+        :param authors
+        :type only keep these authors, None keeps every author
+        """
+        self.fixed = authors is not None
+        self.authors = Interner(authors if authors is not None else [])
+        self.flairs = Interner(["no_flair"])
+        self.n_seen = 0
+        self.cols = {
+            name: np.full(len(self.authors), fill, dtype=dtype)
+            for name, (dtype, fill) in self.columns.items()
+        }
+        self.mats = {
+            name: np.full((len(self.authors), 1), fill, dtype=dtype)
+            for name, (dtype, fill, _) in self.matrices.items()
+        }
+
+    def grow(self):
+        """
+        make room for newly interned authors and categories
+        """
+        n = len(self.authors)
+        for name, (dtype, fill) in self.columns.items():
+            col = self.cols[name]
+            if len(col) < n:
+                self.cols[name] = np.concatenate(
+                    [col, np.full(n - len(col), fill, dtype=dtype)]
+                )
+        for name, (dtype, fill, interner) in self.matrices.items():
+            mat = self.mats[name]
+            k = len(getattr(self, interner))
+            if mat.shape != (n, k):
+                new = np.full((n, k), fill, dtype=dtype)
+                new[: mat.shape[0], : mat.shape[1]] = mat
+                self.mats[name] = new
+
+    def get_author_ids(self, authors: list) -> np.ndarray:
+        if self.fixed:
+            return self.authors.lookup_many(authors)
+        return self.authors.intern_many(authors)
+
+    def add_batch(self, lines: list):
+        """
+        reduce a batch of lines and merge it into the table
+        """
+        if not lines:
+            return
+        batch = type(self)()
+        batch.reduce(lines, self)
+        self.merge(batch)
+
+    def reduce(self, lines: list, table):
+        """
+        fill this (empty) table with the stats of a batch of lines,
+        the authors are looked up in the table the batch will be merged into
+        """
+        raise NotImplementedError
+
+    def add_frame(self, df):
+        """
+        like add_batch, with the lines of the batch in a DataFrame
+        """
+        if len(df) == 0:
+            return
+        batch = type(self)()
+        batch.reduce_frame(df, self)
+        self.merge(batch)
+
+    def reduce_frame(self, df, table):
+        """
+        like reduce, with pandas groupby operations over a DataFrame of the batch
+        """
+        raise NotImplementedError
+
+    def frame_authors(self, df, table):
+        """
+        keep the lines of the authors of the table and add the local author id "a"
+        and the position "pos" of each line, return None if no line is kept
+        """
+        a = table.get_author_ids(df["author"].tolist())
+        keep = a >= 0
+        df = df[keep].reset_index(drop=True)
+        self.n_seen = len(df)
+        if not len(df):
+            return None
+        return df.assign(a=self.set_authors(a[keep], table), pos=np.arange(len(df)))
+
+    def frame_counts(self, count_name, first_name, df, codes, weights=None):
+        """
+        like add_counts, grouped by author and category with pandas
+        """
+        d = df[["a", "pos"]].assign(code=codes)
+        if weights is not None:
+            d["w"] = weights
+        g = d.groupby(["a", "code"], sort=False)
+        first = g["pos"].min()
+        sums = g["w"].sum() if weights is not None else g.size()
+        rows = first.index.get_level_values(0).to_numpy()
+        cols = first.index.get_level_values(1).to_numpy()
+        self.mats[count_name][rows, cols] += sums.to_numpy().astype(np.int64)
+        self.mats[first_name][rows, cols] = first.to_numpy()
+
+    def frame_sum(self, name, df, values, mask=None):
+        if mask is not None:
+            df, values = df[mask], values[mask]
+        sums = values.groupby(df["a"]).sum()
+        self.cols[name][sums.index.to_numpy()] += sums.to_numpy().astype(np.int64)
+
+    def frame_first_last(self, start_name, end_name, df, values, mask):
+        """
+        like set_first_last, with groupby first/last
+        """
+        g = values[mask].groupby(df["a"][mask])
+        first = g.first()
+        last = g.last()
+        self.cols[start_name][first.index.to_numpy()] = first.to_numpy()
+        self.cols[end_name][last.index.to_numpy()] = last.to_numpy()
+
+    def frame_max(self, name, df, values, links, mask):
+        """
+        like set_max, with groupby idxmax (the first maximum)
+        """
+        if not mask.any():
+            return
+        index = values[mask].groupby(df["a"][mask]).idxmax()
+        rows = index.index.to_numpy()
+        index = index.to_numpy()
+        self.cols[f"has_{name}"][rows] = True
+        self.cols[name][rows] = values.to_numpy()[index]
+        self.cols[f"{name}_link"][rows] = links[index]
+
+    def set_authors(self, a: np.ndarray, table) -> np.ndarray:
+        """
+        use the authors of the batch as the authors of this table,
+        return the local author id of each line
+        """
+        unique, local = np.unique(a, return_inverse=True)
+        names = table.authors.names
+        self.authors = Interner([names[i] for i in unique.tolist()])
+        self.grow()
+        return local
+
+    def set_categories(self, interner_name: str, values: list) -> np.ndarray:
+        """
+        intern the categories of a batch, return the category id of each line
+        """
+        interner = getattr(self, interner_name)
+        ids = interner.intern_many(values)
+        self.grow()
+        return ids
+
+    def add_counts(self, count_name, first_name, a, codes, pos, weights=None):
+        """
+        count (or sum) per author and category, and keep the first position
+        """
+        k = self.mats[count_name].shape[1]
+        keys = a.astype(np.int64) * k + codes
+        unique, index = first_index(keys)
+        sums = np.bincount(keys, weights=weights, minlength=len(self.authors) * k)
+        rows, cols = unique // k, unique % k
+        self.mats[count_name][rows, cols] += sums[unique].astype(np.int64)
+        self.mats[first_name][rows, cols] = pos[index]
+
+    def set_first_last(self, start_name, end_name, a, values, mask):
+        """
+        keep the first and last value of each author among the masked lines
+        """
+        unique, index = first_index(a[mask])
+        self.cols[start_name][unique] = values[mask][index]
+        unique, index = last_index(a[mask])
+        self.cols[end_name][unique] = values[mask][index]
+
+    def set_max(self, name, a, values, links, mask):
+        """
+        keep the first maximum value of each author among the masked lines, with its link
+        """
+        if not mask.any():
+            return
+        unique, index = max_index(a[mask], values[mask])
+        self.cols[f"has_{name}"][unique] = True
+        self.cols[name][unique] = values[mask][index]
+        self.cols[f"{name}_link"][unique] = links[mask][index]
+
+    def merge(self, other):
+        """
+        merge a table that comes after this one in the data
+        """
+        # map the ids of the other table to ids of this table
+        if self.fixed:
+            amap = self.authors.lookup_many(other.authors.names)
+        else:
+            amap = self.authors.intern_many(other.authors.names)
+        cmaps = {}
+        for _, _, interner in self.matrices.values():
+            if interner not in cmaps:
+                cmaps[interner] = getattr(self, interner).intern_many(
+                    getattr(other, interner).names
+                )
+        self.grow()
+        keep = amap >= 0
+        a = amap[keep]
+        o = {name: col[keep] for name, col in other.cols.items()}
+        s = {name: col[a] for name, col in self.cols.items()}
+
+        merged = self.merge_columns(s, o)
+        for name, values in merged.items():
+            self.cols[name][a] = values
+
+        # category matrices
+        for name, first_name in self.ratios:
+            interner = self.matrices[name][2]
+            counts = other.mats[name][keep]
+            firsts = other.mats[first_name][keep]
+            rows, cols = np.nonzero(firsts >= 0)
+            self_rows = a[rows]
+            self_cols = cmaps[interner][cols]
+            self.mats[name][self_rows, self_cols] += counts[rows, cols]
+            seen = self.mats[first_name][self_rows, self_cols]
+            self.mats[first_name][self_rows, self_cols] = np.where(
+                seen >= 0, seen, firsts[rows, cols] + self.n_seen
+            )
+
+        self.n_seen += other.n_seen
+
+    def merge_columns(self, s: dict, o: dict) -> dict:
+        """
+        merge the columns of the same authors, s comes before o in the data
+        """
+        merged = {"count": s["count"] + o["count"]}
+        merged["start_utc"] = np.where(
+            s["start_utc"] != 0, s["start_utc"], o["start_utc"]
+        )
+        merged["end_utc"] = np.where(o["end_utc"] != 0, o["end_utc"], s["end_utc"])
+        merged["total_score"] = s["total_score"] + o["total_score"]
+        merged.update(self.merge_max("max_score", s, o))
+        return merged
+
+    @staticmethod
+    def merge_max(name: str, s: dict, o: dict) -> dict:
+        take = o[f"has_{name}"] & (~s[f"has_{name}"] | (o[name] > s[name]))
+        return {
+            f"has_{name}": s[f"has_{name}"] | o[f"has_{name}"],
+            name: np.where(take, o[name], s[name]),
+            f"{name}_link": np.where(take, o[f"{name}_link"], s[f"{name}_link"]),
+        }
+
+    def ratio_dicts(
+        self, count_name: str, first_name: str, interner: Interner, ids: np.ndarray
+    ) -> list:
+        """
+        the ratio dicts of the authors: the default key first, then in order of appearance
+        """
+        counts = self.mats[count_name][ids]
+        firsts = self.mats[first_name][ids][:, 1:]
+        seen = (firsts >= 0).sum(axis=1).tolist()
+        order = np.argsort(
+            np.where(firsts >= 0, firsts, np.iinfo(np.int64).max), axis=1, kind="stable"
+        )
+        order = (order + 1).tolist()
+        names = interner.names
+        dicts = []
+        for row, o, n in zip(counts.tolist(), order, seen):
+            d = {names[0]: row[0]}
+            for j in o[:n]:
+                d[names[j]] = row[j]
+            dicts.append(d)
+        return dicts
+
+    @staticmethod
+    def max_dicts(values: dict, name: str) -> list:
+        """
+        the {link: maximum} dicts of the exported authors
+        """
+        return [
+            {link: value} if has else {}
+            for has, value, link in zip(
+                values[f"has_{name}"], values[name], values[f"{name}_link"]
+            )
+        ]
+
+    def get_order(self, threshold: int) -> list:
+        """
+        return (author id, total) of the authors counted in this table at or above
+        the threshold, sorted by total like sort_dict
+        """
+        counts = self.cols["count"]
+        order = np.argsort(-counts, kind="stable")
+        if threshold > 1:
+            order = order[counts[order] >= threshold]
+        else:
+            order = order[counts[order] > 0]
+        return [(int(i), int(counts[i])) for i in order]
+
+    def entry(self, i: int, total, values: dict, ratios: dict, k: int) -> dict:
+        """
+        the nested dict of author i, the k-th exported author
+
+        :param values
+        :type {column: list of the values of the exported authors}
+
+        :param ratios
+        :type {count matrix: list of the ratio dicts of the exported authors}
+        """
+        raise NotImplementedError
+
+    def to_result(self, order: list) -> dict:
+        """
+        materialize the nested dicts of the authors in order
+
+        :param order
+        :type list of (author id, total)
+        """
+        # the dicts have no reference cycles, building them would only
+        # trigger full collections over a large heap
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            ids = np.array([i for i, _ in order], dtype=np.int64)
+            values = {name: col[ids].tolist() for name, col in self.cols.items()}
+            for name in self.maxima:
+                values[f"{name}_dict"] = self.max_dicts(values, name)
+            ratios = {
+                count_name: self.ratio_dicts(
+                    count_name,
+                    first_name,
+                    getattr(self, self.matrices[count_name][2]),
+                    ids,
+                )
+                for count_name, first_name in self.ratios
+            }
+            result = {}
+            for k, (i, total) in enumerate(order):
+                result[self.authors.names[i]] = self.entry(i, total, values, ratios, k)
+        finally:
+            if enabled:
+                gc.enable()
+        return result
+
+
+class PosterTable(StatsTable):
+    """
+    accumulators of DataProcessor.export_poster_stats
+    """
+
+    columns = {
+        "count": (np.int64, 0),
+        "start_utc": (np.int64, 0),
+        "end_utc": (np.int64, 0),
+        "total_score": (np.int64, 0),
+        "has_max_score": (bool, False),
+        "max_score": (np.int64, 0),
+        "max_score_link": (object, None),
+        "total_comments": (np.int64, 0),
+        "has_max_comments": (bool, False),
+        "max_comments": (np.int64, 0),
+        "max_comments_link": (object, None),
+        # upvote ratios that are not 1.0: the first one, the initial run of equal
+        # ratios, the lowest ratio and its last line, the highest ratio and its
+        # last line after the initial run
+        "has_upvote": (bool, False),
+        "upvote_first": (np.float64, 0.0),
+        "upvote_first_link": (object, None),
+        "upvote_run_all": (bool, True),
+        "upvote_run_last_link": (object, None),
+        "upvote_min": (np.float64, 0.0),
+        "upvote_min_link": (object, None),
+        "upvote_max": (np.float64, 0.0),
+        "has_upvote_max_link": (bool, False),
+        "upvote_max_link": (object, None),
+    }
+    matrices = {
+        "flair_count": (np.int64, 0, "flairs"),
+        "flair_first": (np.int64, -1, "flairs"),
+        "remove_count": (np.int64, 0, "removes"),
+        "remove_first": (np.int64, -1, "removes"),
+        "comment_sum": (np.int64, 0, "flairs"),
+        "comment_first": (np.int64, -1, "flairs"),
+    }
+    ratios = [
+        ("flair_count", "flair_first"),
+        ("remove_count", "remove_first"),
+        ("comment_sum", "comment_first"),
+    ]
+    maxima = ["max_score", "max_comments"]
+
+    def __init__(self, authors: list = None):
+        self.removes = Interner(["exist"])
+        super().__init__(authors)
+
+    def reduce(self, lines: list, table):
+        a = table.get_author_ids([line.get("author") for line in lines])
+        keep = a >= 0
+        if not keep.all():
+            lines = [line for line, k in zip(lines, keep) if k]
+            a = a[keep]
+        self.n_seen = len(lines)
+        if not lines:
+            return
+        a = self.set_authors(a, table)
+        n = len(lines)
+        pos = np.arange(n, dtype=np.int64)
+        links = np.empty(n, dtype=object)
+        links[:] = [line.get("id") for line in lines]
+
+        # posts
+        self.cols["count"] += np.bincount(a, minlength=len(self.authors))
+
+        # dates
+        utc = np.array([line.get("created_utc") or 0 for line in lines], dtype=np.int64)
+        self.set_first_last("start_utc", "end_utc", a, utc, utc != 0)
+
+        # flairs
+        flairs = [line.get("link_flair_text") or "no_flair" for line in lines]
+        f = self.set_categories("flairs", flairs)
+        self.add_counts("flair_count", "flair_first", a, f, pos)
+
+        # removes
+        removes = [line.get("removed_by_category") or "exist" for line in lines]
+        r = self.set_categories("removes", removes)
+        self.add_counts("remove_count", "remove_first", a, r, pos)
+
+        # scores, without the one self upvote
+        score = np.array([line.get("score") - 1 for line in lines], dtype=np.int64)
+        has_score = score != 0
+        self.cols["total_score"] += np.bincount(
+            a[has_score], weights=score[has_score], minlength=len(self.authors)
+        ).astype(np.int64)
+        self.set_max("max_score", a, score, links, has_score)
+
+        # comments
+        c = np.array([line.get("num_comments") or 0 for line in lines], dtype=np.int64)
+        has_c = c != 0
+        self.cols["total_comments"] += np.bincount(
+            a[has_c], weights=c[has_c], minlength=len(self.authors)
+        ).astype(np.int64)
+        self.set_max("max_comments", a, c, links, has_c)
+        if has_c.any():
+            self.add_counts(
+                "comment_sum", "comment_first", a[has_c], f[has_c], pos[has_c], c[has_c]
+            )
+
+        # upvote ratios
+        ratios = [line.get("upvote_ratio") for line in lines]
+        has_r = np.array([x is not None and x != 1.0 for x in ratios], dtype=bool)
+        if has_r.any():
+            r = np.array([x for x, h in zip(ratios, has_r) if h], dtype=np.float64)
+            self.reduce_upvote(a[has_r], r, links[has_r])
+
+    def reduce_upvote(self, a, r, links):
+        order = np.argsort(a, kind="stable")
+        a, r, links = a[order], r[order], links[order]
+        unique, starts = np.unique(a, return_index=True)
+        ends = np.append(starts[1:], len(a))
+        group = np.repeat(np.arange(len(unique)), ends - starts)
+        index = np.arange(len(a))
+
+        first = r[starts]
+        low = np.minimum.reduceat(r, starts)
+        high = np.maximum.reduceat(r, starts)
+        # last line at the lowest ratio
+        low_index = np.maximum.reduceat(np.where(r == low[group], index, -1), starts)
+        # end of the initial run of ratios equal to the first one
+        big = len(a)
+        run_break = np.minimum.reduceat(np.where(r != first[group], index, big), starts)
+        run_all = run_break == big
+        run_last = np.where(run_all, ends - 1, run_break - 1)
+        # last line at the highest ratio after the initial run
+        high_index = np.maximum.reduceat(
+            np.where((r == high[group]) & (index >= run_break[group]), index, -1),
+            starts,
+        )
+
+        cols = self.cols
+        cols["has_upvote"][unique] = True
+        cols["upvote_first"][unique] = first
+        cols["upvote_first_link"][unique] = links[starts]
+        cols["upvote_run_all"][unique] = run_all
+        cols["upvote_run_last_link"][unique] = links[run_last]
+        cols["upvote_min"][unique] = low
+        cols["upvote_min_link"][unique] = links[low_index]
+        cols["upvote_max"][unique] = high
+        cols["has_upvote_max_link"][unique] = high_index >= 0
+        cols["upvote_max_link"][unique] = links[np.maximum(high_index, 0)]
+
+    def reduce_frame(self, df, table):
+        df = self.frame_authors(df, table)
+        if df is None:
+            return
+        links = df["id"].to_numpy(dtype=object)
+
+        # posts
+        size = df.groupby("a").size()
+        self.cols["count"][size.index.to_numpy()] += size.to_numpy()
+
+        # dates
+        utc = df["created_utc"].fillna(0).astype(np.int64)
+        self.frame_first_last("start_utc", "end_utc", df, utc, utc != 0)
+
+        # flairs
+        flair = df["link_flair_text"]
+        flair = flair.where(flair.notna() & (flair != ""), "no_flair")
+        f = self.set_categories("flairs", flair.tolist())
+        self.frame_counts("flair_count", "flair_first", df, f)
+
+        # removes
+        remove = df["removed_by_category"]
+        remove = remove.where(remove.notna() & (remove != ""), "exist")
+        r = self.set_categories("removes", remove.tolist())
+        self.frame_counts("remove_count", "remove_first", df, r)
+
+        # scores, without the one self upvote
+        score = df["score"].astype(np.int64) - 1
+        has_score = score != 0
+        self.frame_sum("total_score", df, score, has_score)
+        self.frame_max("max_score", df, score, links, has_score)
+
+        # comments
+        c = df["num_comments"].fillna(0).astype(np.int64)
+        has_c = c != 0
+        self.frame_sum("total_comments", df, c, has_c)
+        self.frame_max("max_comments", df, c, links, has_c)
+        if has_c.any():
+            self.frame_counts(
+                "comment_sum",
+                "comment_first",
+                df[has_c],
+                f[has_c.to_numpy()],
+                c[has_c],
+            )
+
+        # upvote ratios
+        ratio = df["upvote_ratio"]
+        has_r = ratio.notna() & (ratio != 1.0)
+        if has_r.any():
+            self.reduce_upvote_frame(
+                df[has_r].assign(r=ratio[has_r].astype(np.float64)), links
+            )
+
+    def reduce_upvote_frame(self, d, links):
+        """
+        like reduce_upvote, with groupby transforms
+        """
+        import pandas as pd
+
+        a, r, pos = d["a"], d["r"], d["pos"]
+        g = r.groupby(a)
+        first = g.transform("first")
+        low = g.transform("min")
+        high = g.transform("max")
+        big = len(links)
+        run_break = pos.where(r != first, big).groupby(a).transform("min")
+        is_low = r == low
+        in_run = pos < run_break
+        is_high = (r == high) & ~in_run
+        stats = pd.DataFrame(
+            {
+                "first_pos": pos.groupby(a).min(),
+                "first": g.first(),
+                "low": g.min(),
+                "high": g.max(),
+                "low_pos": pos[is_low].groupby(a[is_low]).max(),
+                "run_all": (run_break == big).groupby(a).first(),
+                "run_last": pos[in_run].groupby(a[in_run]).max(),
+                "high_pos": pos[is_high].groupby(a[is_high]).max(),
+            }
+        )
+        rows = stats.index.to_numpy()
+        has_high = stats["high_pos"].notna().to_numpy()
+        cols = self.cols
+        cols["has_upvote"][rows] = True
+        cols["upvote_first"][rows] = stats["first"].to_numpy()
+        cols["upvote_first_link"][rows] = links[stats["first_pos"].to_numpy()]
+        cols["upvote_run_all"][rows] = stats["run_all"].to_numpy(dtype=bool)
+        cols["upvote_run_last_link"][rows] = links[stats["run_last"].to_numpy()]
+        cols["upvote_min"][rows] = stats["low"].to_numpy()
+        cols["upvote_min_link"][rows] = links[stats["low_pos"].to_numpy()]
+        cols["upvote_max"][rows] = stats["high"].to_numpy()
+        cols["has_upvote_max_link"][rows] = has_high
+        cols["upvote_max_link"][rows] = links[
+            stats["high_pos"].fillna(0).to_numpy(dtype=np.int64)
+        ]
+
+    def merge_columns(self, s: dict, o: dict) -> dict:
+        merged = super().merge_columns(s, o)
+        merged["total_comments"] = s["total_comments"] + o["total_comments"]
+        merged.update(self.merge_max("max_comments", s, o))
+
+        # upvote ratios
+        both = s["has_upvote"] & o["has_upvote"]
+        only_o = o["has_upvote"] & ~s["has_upvote"]
+        high = np.maximum(s["upvote_max"], o["upvote_max"])
+        extends = s["upvote_run_all"] & (o["upvote_first"] == s["upvote_first"])
+        from_o = o["has_upvote_max_link"] & (o["upvote_max"] == high)
+        from_o_run = ~from_o & (o["upvote_first"] == high) & ~extends
+        from_s = (
+            ~from_o & ~from_o_run & s["has_upvote_max_link"] & (s["upvote_max"] == high)
+        )
+        max_link = np.where(
+            from_o,
+            o["upvote_max_link"],
+            np.where(from_o_run, o["upvote_run_last_link"], s["upvote_max_link"]),
+        )
+        lower = o["upvote_min"] <= s["upvote_min"]
+
+        def pick(both_values, name):
+            return np.where(only_o, o[name], np.where(both, both_values, s[name]))
+
+        merged["has_upvote"] = s["has_upvote"] | o["has_upvote"]
+        merged["upvote_first"] = pick(s["upvote_first"], "upvote_first")
+        merged["upvote_first_link"] = pick(s["upvote_first_link"], "upvote_first_link")
+        merged["upvote_run_all"] = pick(
+            s["upvote_run_all"] & o["upvote_run_all"] & extends, "upvote_run_all"
+        )
+        merged["upvote_run_last_link"] = pick(
+            np.where(extends, o["upvote_run_last_link"], s["upvote_run_last_link"]),
+            "upvote_run_last_link",
+        )
+        merged["upvote_min"] = pick(
+            np.where(lower, o["upvote_min"], s["upvote_min"]), "upvote_min"
+        )
+        merged["upvote_min_link"] = pick(
+            np.where(lower, o["upvote_min_link"], s["upvote_min_link"]),
+            "upvote_min_link",
+        )
+        merged["upvote_max"] = pick(high, "upvote_max")
+        merged["has_upvote_max_link"] = pick(
+            from_o | from_o_run | from_s, "has_upvote_max_link"
+        )
+        merged["upvote_max_link"] = pick(max_link, "upvote_max_link")
+        return merged
+
+    def entry(self, i: int, total, values: dict, ratios: dict, k: int) -> dict:
+        upvote_ratio = {"highest": {}, "lowest": {}}
+        if values["has_upvote"][k]:
+            if values["has_upvote_max_link"][k]:
+                upvote_ratio["highest"] = {
+                    values["upvote_max_link"][k]: values["upvote_max"][k]
+                }
+            else:
+                upvote_ratio["highest"] = {
+                    values["upvote_first_link"][k]: values["upvote_first"][k]
+                }
+            upvote_ratio["lowest"] = {
+                values["upvote_min_link"][k]: values["upvote_min"][k]
+            }
+        return {
+            "author": self.authors.names[i],
+            "active_period": {
+                "start_date": values["start_utc"][k],
+                "end_date": values["end_utc"][k],
+            },
+            "active_span": 0,
+            "flair_ratio": ratios["flair_count"][k],
+            "remove_ratio": ratios["remove_count"][k],
+            "total_posts": total,
+            "total_score": values["total_score"][k],
+            "max_score": values["max_score_dict"][k],
+            "total_comments": values["total_comments"][k],
+            "comment_ratio": ratios["comment_sum"][k],
+            "max_comments": values["max_comments_dict"][k],
+            "upvote_ratio": upvote_ratio,
+        }
+
+
+class CommenterTable(StatsTable):
+    """
+    accumulators of DataProcessor.export_commenter_stats
+    """
+
+    columns = {
+        "count": (np.int64, 0),
+        "author_created_utc": (np.int64, 0),
+        "start_utc": (np.int64, 0),
+        "end_utc": (np.int64, 0),
+        "total_comments_as_submitter": (np.int64, 0),
+        "total_score": (np.int64, 0),
+        "has_max_score": (bool, False),
+        "max_score": (np.int64, 0),
+        "max_score_link": (object, None),
+        "controversiality": (np.int64, 0),
+    }
+    matrices = {
+        "flair_count": (np.int64, 0, "flairs"),
+        "flair_first": (np.int64, -1, "flairs"),
+    }
+    ratios = [("flair_count", "flair_first")]
+    maxima = ["max_score"]
+
+    def __init__(self, authors: list = None):
+        super().__init__(authors)
+        # {author id: [banned_by, ...]}, bans are rare
+        self.banned_by = {}
+
+    def reduce(self, lines: list, table):
+        a = table.get_author_ids([line.get("author") for line in lines])
+        keep = a >= 0
+        if not keep.all():
+            lines = [line for line, k in zip(lines, keep) if k]
+            a = a[keep]
+        self.n_seen = len(lines)
+        if not lines:
+            return
+        a = self.set_authors(a, table)
+        n = len(lines)
+        pos = np.arange(n, dtype=np.int64)
+        links = np.empty(n, dtype=object)
+        links[:] = [line.get("comment_id") for line in lines]
+
+        # comments
+        self.cols["count"] += np.bincount(a, minlength=len(self.authors))
+
+        # author birth
+        b = np.array(
+            [line.get("author_created_utc") or 0 for line in lines], dtype=np.int64
+        )
+        unique, index = last_index(a[b != 0])
+        self.cols["author_created_utc"][unique] = b[b != 0][index]
+
+        # dates
+        utc = np.array([line.get("created_utc") or 0 for line in lines], dtype=np.int64)
+        self.set_first_last("start_utc", "end_utc", a, utc, utc != 0)
+
+        # flairs
+        flairs = [line.get("link_flair_text") or "no_flair" for line in lines]
+        f = self.set_categories("flairs", flairs)
+        self.add_counts("flair_count", "flair_first", a, f, pos)
+
+        # comments as submitter
+        s = np.array([line.get("is_submitter") is True for line in lines], dtype=bool)
+        self.cols["total_comments_as_submitter"] += np.bincount(
+            a[s], minlength=len(self.authors)
+        )
+
+        # scores
+        score = np.array([line.get("score") - 1 for line in lines], dtype=np.int64)
+        has_score = score != 0
+        self.cols["total_score"] += np.bincount(
+            a[has_score], weights=score[has_score], minlength=len(self.authors)
+        ).astype(np.int64)
+        self.set_max("max_score", a, score, links, has_score)
+
+        # banning
+        for i, line in zip(a.tolist(), lines):
+            ban = line.get("banned_by")
+            if ban:
+                self.banned_by.setdefault(i, []).append(ban)
+
+        # controversiality
+        c = np.array(
+            [line.get("controversiality") or 0 for line in lines], dtype=np.int64
+        )
+        self.cols["controversiality"] += np.bincount(
+            a, weights=c, minlength=len(self.authors)
+        ).astype(np.int64)
+
+    def reduce_frame(self, df, table):
+        df = self.frame_authors(df, table)
+        if df is None:
+            return
+        links = df["comment_id"].to_numpy(dtype=object)
+
+        # comments
+        size = df.groupby("a").size()
+        self.cols["count"][size.index.to_numpy()] += size.to_numpy()
+
+        # author birth
+        b = df["author_created_utc"].fillna(0).astype(np.int64)
+        last = b[b != 0].groupby(df["a"][b != 0]).last()
+        self.cols["author_created_utc"][last.index.to_numpy()] = last.to_numpy()
+
+        # dates
+        utc = df["created_utc"].fillna(0).astype(np.int64)
+        self.frame_first_last("start_utc", "end_utc", df, utc, utc != 0)
+
+        # flairs
+        flair = df["link_flair_text"]
+        flair = flair.where(flair.notna() & (flair != ""), "no_flair")
+        f = self.set_categories("flairs", flair.tolist())
+        self.frame_counts("flair_count", "flair_first", df, f)
+
+        # comments as submitter
+        self.frame_sum(
+            "total_comments_as_submitter", df, df["is_submitter"].eq(True).astype(int)
+        )
+
+        # scores
+        score = df["score"].astype(np.int64) - 1
+        has_score = score != 0
+        self.frame_sum("total_score", df, score, has_score)
+        self.frame_max("max_score", df, score, links, has_score)
+
+        # banning
+        ban = df["banned_by"]
+        has_ban = ban.notna() & (ban != "")
+        for i, b in zip(df["a"][has_ban].tolist(), ban[has_ban].tolist()):
+            self.banned_by.setdefault(i, []).append(b)
+
+        # controversiality
+        c = df["controversiality"].fillna(0).astype(np.int64)
+        self.frame_sum("controversiality", df, c)
+
+    def merge(self, other):
+        # banned_by is kept outside of the columns
+        bans = {other.authors.names[i]: v for i, v in other.banned_by.items()}
+        super().merge(other)
+        for author, ban in bans.items():
+            i = self.authors.ids.get(author)
+            if i is not None:
+                self.banned_by.setdefault(i, []).extend(ban)
+
+    def merge_columns(self, s: dict, o: dict) -> dict:
+        merged = super().merge_columns(s, o)
+        merged["author_created_utc"] = np.where(
+            o["author_created_utc"] != 0,
+            o["author_created_utc"],
+            s["author_created_utc"],
+        )
+        merged["total_comments_as_submitter"] = (
+            s["total_comments_as_submitter"] + o["total_comments_as_submitter"]
+        )
+        merged["controversiality"] = s["controversiality"] + o["controversiality"]
+        return merged
+
+    def entry(self, i: int, total, values: dict, ratios: dict, k: int) -> dict:
+        b = values["author_created_utc"][k]
+        return {
+            "author": self.authors.names[i],
+            # epoch, a date after convert_dates
+            "author_created_date": b,
+            "active_period": {
+                "start_date": values["start_utc"][k],
+                "end_date": values["end_utc"][k],
+            },
+            "active_span": 0,
+            "flair_ratio": ratios["flair_count"][k],
+            "total_comments": total,
+            "total_comments_as_submitter": values["total_comments_as_submitter"][k],
+            "total_score": values["total_score"][k],
+            "max_score": values["max_score_dict"][k],
+            "banned_by": list(self.banned_by.get(i, [])),
+            "controversiality": values["controversiality"][k],
+        }
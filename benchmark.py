@@ -0,0 +1,429 @@
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import platform
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from synthetic import SyntheticCorpus
+
+# lines per second below (1 - tolerance) or peak RSS above (1 + tolerance)
+# times the baseline are regressions
+TOLERANCE = 0.2
+# seconds a short command-line export may take on top of the interpreter start
+STARTUP_BUDGET = 0.3
+# modules the command line must not import for an author dict
+HEAVY_MODULES = ["nltk", "pandas", "numpy", "scipy", "tqdm", "jsonlines"]
+
+
+def read_io() -> dict:
+    """
+    the io counters of this process and its finished children (Linux only)
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except OSError:
+        return {}
+
+
+def peak_rss() -> int:
+    """
+    peak resident memory in bytes of this process or one of its children
+    """
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def read_lines(input_path, output_directory, **kwargs) -> int:
+    from process_data import DataHandler
+
+    return sum(1 for _ in DataHandler(input_path).get_generator(**kwargs))
+
+
+def export(input_path, output_directory, mode: str, method: str, **kwargs):
+    from process_data import DataProcessor
+
+    processor = DataProcessor(input_path, output_directory, mode)
+    getattr(processor, method)(**kwargs)
+
+
+def imported_modules(command: list) -> set:
+    """
+    the top-level names of the modules a python command imports
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *command],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    return {
+        line.split("|")[-1].strip().split(".")[0]
+        for line in stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+
+def wall_seconds(command: list, repeat: int) -> float:
+    """
+    the fastest of repeat runs of a python command
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], check=True, capture_output=True)
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def measure(function, input_path, n_lines: int, kwargs: dict) -> dict:
+    """
+    run one benchmark, called in a new process so the peak memory is its own
+    """
+    import process_data  # noqa: F401, imports are not timed
+
+    output_directory = tempfile.mkdtemp(prefix="benchmark_")
+    io = read_io()
+    start = time.perf_counter()
+    lines = function(input_path, output_directory, **kwargs)
+    seconds = time.perf_counter() - start
+    bytes_read = read_io().get("rchar", 0) - io.get("rchar", 0) if io else None
+    shutil.rmtree(output_directory)
+    lines = n_lines if lines is None else lines
+    return {
+        "lines": lines,
+        "seconds": round(seconds, 3),
+        "lines_per_second": round(lines / seconds) if seconds else None,
+        "peak_rss": peak_rss(),
+        "bytes_read": bytes_read,
+    }
+
+
+class Benchmarks:
+    """
+    throughput of the read paths and exports on a synthetic corpus (see synthetic.py)
+
+    the corpus and the inputs the exports need (author and id dicts, processed
+    lines) are written once into a directory and kept for later runs with the
+    same settings. every benchmark runs in a new process and reports lines per
+    second, peak RSS and the bytes read, and the results can be saved as a
+    baseline that later runs are compared with
+    """
+
+    def __init__(
+        self,
+        directory,
+        n_submissions: int = 100000,
+        n_comments: int = 1000000,
+        n_shards: int = 4,
+        compression: str = None,
+        workers: int = 4,
+        seed: int = 0,
+    ):
+        self.directory = Path(directory)
+        self.settings = {
+            "n_submissions": n_submissions,
+            "n_comments": n_comments,
+            "n_shards": n_shards,
+            "compression": compression,
+            "workers": workers,
+            "seed": seed,
+        }
+        self.corpus = SyntheticCorpus(
+            n_submissions=n_submissions, n_comments=n_comments, seed=seed
+        )
+        self.paths = {
+            "submissions": self.directory / "submissions",
+            "comments": self.directory / "comments",
+            "processed_comments": self.directory / "processed_comments",
+            "dicts": self.directory / "dicts",
+        }
+
+    def prepare(self):
+        """
+        write the corpus and the inputs of the exports unless they are up to date
+        """
+        settings_path = self.directory / "settings.json"
+        if settings_path.exists():
+            with settings_path.open("r", encoding="utf-8") as f:
+                if json.load(f) == self.settings:
+                    return
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+        for mode in ["submissions", "comments"]:
+            self.corpus.write(
+                self.paths[mode],
+                mode,
+                n_shards=self.settings["n_shards"],
+                compression=self.settings["compression"],
+            )
+
+        from process_data import DataProcessor
+
+        dicts = self.paths["dicts"]
+        dicts.mkdir()
+        submissions = DataProcessor(self.paths["submissions"], dicts, "submissions")
+        submissions.export_author_dict()
+        submissions.export_id_dict()
+        comments = DataProcessor(self.paths["comments"], dicts, "comments")
+        comments.export_author_dict()
+        self.paths["processed_comments"].mkdir()
+        comments.output_directory = self.paths["processed_comments"]
+        comments.export_processed_jsonl(
+            author_dict_path=dicts / "author_dict_comments_all.json",
+            id_dict_path=dicts / "id_dict_submissions_all.json",
+        )
+        with settings_path.open("w", encoding="utf-8") as f:
+            json.dump(self.settings, f)
+
+    def get_benchmarks(self) -> dict:
+        """
+        {name: (input, function, keyword arguments)}
+        """
+        dicts = self.paths["dicts"]
+        submission_dict = str(dicts / "author_dict_submissions_all.json")
+        comment_dict = str(dicts / "author_dict_comments_all.json")
+        id_dict = str(dicts / "id_dict_submissions_all.json")
+        # the middle half of the time period
+        span = self.corpus.end - self.corpus.start
+        time_period = tuple(
+            time.strftime("%Y%m%d %H:%M:%S", time.localtime(self.corpus.start + x))
+            for x in [span // 4, span * 3 // 4]
+        )
+        workers = self.settings["workers"]
+
+        def comments(method, **kwargs):
+            return "comments", export, {"mode": "comments", "method": method, **kwargs}
+
+        def submissions(method, **kwargs):
+            return (
+                "submissions",
+                export,
+                {"mode": "submissions", "method": method, **kwargs},
+            )
+
+        return {
+            "read_submissions": ("submissions", read_lines, {}),
+            "read_comments": ("comments", read_lines, {}),
+            "read_comments_fields": (
+                "comments",
+                read_lines,
+                {"fields": ["author", "created_utc"]},
+            ),
+            "read_comments_time_period": (
+                "comments",
+                read_lines,
+                {"time_period": time_period},
+            ),
+            "author_dict": comments("export_author_dict"),
+            "author_dict_parallel": comments("export_author_dict", workers=workers),
+            "id_dict": submissions("export_id_dict"),
+            "processed_submissions": submissions(
+                "export_processed_jsonl", author_dict_path=submission_dict
+            ),
+            "processed_comments": comments(
+                "export_processed_jsonl",
+                author_dict_path=comment_dict,
+                id_dict_path=id_dict,
+            ),
+            "poster_stats": submissions(
+                "export_poster_stats", author_dict_path=submission_dict, minpost=2
+            ),
+            "commenter_stats": (
+                "processed_comments",
+                export,
+                {
+                    "mode": "comments",
+                    "method": "export_commenter_stats",
+                    "author_dict_path": comment_dict,
+                    "mincom": 2,
+                },
+            ),
+            "corpus": comments(
+                "export_corpus", keywords=["community", "communities"], min_tokens=5
+            ),
+            "frequent_authors": comments("export_frequent_authors", min_count=100),
+            "columnar": comments("export_columnar"),
+        }
+
+    def run(self, names: list = None) -> dict:
+        """
+        run the benchmarks (all if names is None) and return {name: result}
+        """
+        self.prepare()
+        n_lines = {
+            "submissions": self.settings["n_submissions"],
+            "comments": self.settings["n_comments"],
+            "processed_comments": self.settings["n_comments"],
+        }
+        results = {}
+        for name, (input, function, kwargs) in self.get_benchmarks().items():
+            if names and name not in names:
+                continue
+            # spawned, a forked process would start with the peak memory of this one
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results[name] = executor.submit(
+                    measure, function, str(self.paths[input]), n_lines[input], kwargs
+                ).result()
+        return results
+
+    def startup(self, repeat: int = 5) -> dict:
+        """
+        time a cron-sized invocation of cli.py (an author dict of 100 lines)
+        against the start of a bare interpreter, and list the heavy modules it
+        imported. the 100 submissions are written on their own, the corpus of
+        the other benchmarks is not needed
+        """
+        directory = Path(tempfile.mkdtemp(prefix="benchmark_"))
+        corpus = SyntheticCorpus(
+            n_submissions=100, n_comments=0, seed=self.settings["seed"]
+        )
+        corpus.write(directory / "submissions", "submissions")
+        command = [
+            str(Path(__file__).parent / "cli.py"),
+            "author-dict",
+            str(directory / "submissions"),
+            str(directory / "output"),
+            "submissions",
+            "--n-items",
+            "100",
+            "--quiet",
+        ]
+        interpreter = wall_seconds(["-c", "pass"], repeat)
+        seconds = wall_seconds(command, repeat)
+        heavy = sorted(imported_modules(command) & set(HEAVY_MODULES))
+        shutil.rmtree(directory)
+        return {
+            "interpreter_seconds": round(interpreter, 3),
+            "seconds": round(seconds, 3),
+            "heavy_modules": heavy,
+        }
+
+    @staticmethod
+    def check_startup(result: dict, budget: float = STARTUP_BUDGET) -> list:
+        """
+        return the violations of the startup budget as messages
+        """
+        messages = []
+        overhead = result["seconds"] - result["interpreter_seconds"]
+        if overhead > budget:
+            messages.append(
+                f"startup: {overhead:.3f} s on top of the interpreter, "
+                f"budget {budget} s"
+            )
+        if result["heavy_modules"]:
+            messages.append(f"startup: imported {', '.join(result['heavy_modules'])}")
+        return messages
+
+    def save(self, results: dict, baseline_path):
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "settings": self.settings,
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    def compare(self, results: dict, baseline_path, tolerance: float = TOLERANCE):
+        """
+        return the regressions against a saved baseline as messages
+        """
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["settings"] != self.settings:
+            return [f"{baseline_path} has other settings: {baseline['settings']}"]
+        regressions = []
+        for name, result in results.items():
+            base = baseline["results"].get(name)
+            if base is None:
+                continue
+            if result["lines_per_second"] < base["lines_per_second"] * (1 - tolerance):
+                regressions.append(
+                    f"{name}: {result['lines_per_second']} lines/s, "
+                    f"baseline {base['lines_per_second']}"
+                )
+            if result["peak_rss"] > base["peak_rss"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: peak RSS {result['peak_rss'] / 2**20:.0f} MB, "
+                    f"baseline {base['peak_rss'] / 2**20:.0f} MB"
+                )
+        return regressions
+
+
+def print_results(results: dict):
+    print(
+        f"{'benchmark':<28}{'lines':>10}{'seconds':>10}{'lines/s':>12}"
+        f"{'peak MB':>10}{'read MB':>10}"
+    )
+    for name, r in results.items():
+        bytes_read = f"{r['bytes_read'] / 2**20:.0f}" if r["bytes_read"] else "-"
+        print(
+            f"{name:<28}{r['lines']:>10}{r['seconds']:>10}{r['lines_per_second']:>12}"
+            f"{r['peak_rss'] / 2**20:>10.0f}{bytes_read:>10}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="benchmark the read paths and exports on a synthetic corpus"
+    )
+    parser.add_argument("--directory", default="./benchmark-data")
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--only", nargs="*", help="names of the benchmarks to run, or startup"
+    )
+    parser.add_argument("--baseline", help="json file of the baseline results")
+    parser.add_argument(
+        "--save", action="store_true", help="save the results as the baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET)
+    args = parser.parse_args()
+
+    benchmarks = Benchmarks(
+        args.directory,
+        n_submissions=args.submissions,
+        n_comments=args.comments,
+        n_shards=args.shards,
+        compression=args.compression,
+        workers=args.workers,
+        seed=args.seed,
+    )
+    regressions = []
+    names = [name for name in args.only or [] if name != "startup"]
+    if not args.only or names:
+        results = benchmarks.run(names)
+        print_results(results)
+        if args.baseline and args.save:
+            benchmarks.save(results, args.baseline)
+        elif args.baseline:
+            regressions += benchmarks.compare(results, args.baseline, args.tolerance)
+    if not args.only or "startup" in args.only:
+        startup = benchmarks.startup()
+        print(
+            f"startup: {startup['seconds']} s, "
+            f"interpreter {startup['interpreter_seconds']} s"
+        )
+        regressions += benchmarks.check_startup(startup, args.startup_budget)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,144 @@
+import os
+import json
+import pickle
+import hashlib
+from pathlib import Path
+from shard_io import get_compression, open_shard
+
+
+def complete_size(jsonl_path, block_size: int = 64 * 1024) -> int:
+    """
+    size of a jsonl file up to the end of its last complete line,
+    a line that is still being written (no newline yet) is left for the next run
+
+    compressed files are decompressed to find their size, a gzip member or
+    zstd frame that is still being written ends the file
+    """
+    if get_compression(jsonl_path) is not None:
+        size = 0
+        last_line_end = 0
+        with open_shard(jsonl_path) as f:
+            try:
+                while True:
+                    block = f.read(block_size)
+                    if not block:
+                        break
+                    i = block.rfind(b"\n")
+                    if i >= 0:
+                        last_line_end = size + i + 1
+                    size += len(block)
+            except EOFError:
+                pass
+        return last_line_end
+
+    size = os.path.getsize(jsonl_path)
+    with open(jsonl_path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            block = f.read(end - start)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                return start + i + 1
+            end = start
+    return 0
+
+
+def head_hash(jsonl_path, offset: int, head_size: int = 64 * 1024) -> str:
+    """
+    hash of the first bytes of a file before an offset
+    """
+    with open_shard(jsonl_path) as f:
+        return hashlib.sha1(f.read(min(offset, head_size))).hexdigest()
+
+
+class Checkpoint:
+    """
+    state of an incremental export, kept in a directory:
+    - state.pkl: the manifest and the states of the aggregators, replaced after every run
+    - manifest.json: a readable copy of the manifest
+
+    the manifest records for every shard the byte offset up to which its lines
+    were consumed, with a hash of the first bytes to notice rewritten shards.
+    shards that collect_data appends to are read from where the last run stopped
+    and new shards are read from the start. compressed shards whose file size
+    did not change are not opened
+    """
+
+    def __init__(self, directory, key: dict):
+        """
+        :param key
+        :type description of the export, a checkpoint is only reused by the same export
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.directory / "state.pkl"
+        self.manifest_path = self.directory / "manifest.json"
+        self.key = key
+        # {shard path: {"offset": x, "hash": x, "size": x}}
+        self.shards = {}
+        self.states = None
+        # {shard path: file size when its range was planned}
+        self.sizes = {}
+        self.load()
+
+    def load(self):
+        if not self.state_path.exists():
+            return
+        with self.state_path.open("rb") as f:
+            checkpoint = pickle.load(f)
+        if checkpoint["key"] != self.key:
+            raise Exception(
+                f"The checkpoint in {self.directory} belongs to another export, use another directory."
+            )
+        self.shards = checkpoint["shards"]
+        self.states = checkpoint["states"]
+
+    def get_ranges(self, jsonl_paths: list) -> list:
+        """
+        return the (jsonl_path, start, end) byte ranges that were not consumed yet
+        """
+        ranges = []
+        for jsonl_path in jsonl_paths:
+            start = 0
+            size = os.path.getsize(jsonl_path)
+            done = self.shards.get(str(jsonl_path))
+            if done is not None:
+                if get_compression(jsonl_path) is not None and size == done.get("size"):
+                    continue
+                start = done["offset"]
+                if (
+                    size < done.get("size", start)
+                    or head_hash(jsonl_path, start) != done["hash"]
+                ):
+                    raise Exception(
+                        f"{jsonl_path} has changed since the last run, remove {self.directory} to start over."
+                    )
+            end = complete_size(jsonl_path)
+            if end > start:
+                ranges.append((str(jsonl_path), start, end))
+                self.sizes[str(jsonl_path)] = size
+        return ranges
+
+    def save(self, ranges: list, states: list):
+        """
+        record the consumed ranges and the states of the aggregators after them
+        """
+        for jsonl_path, _, end in ranges:
+            self.shards[jsonl_path] = {
+                "offset": end,
+                "hash": head_hash(jsonl_path, end),
+                "size": self.sizes[jsonl_path],
+            }
+        self.states = states
+        checkpoint = {"key": self.key, "shards": self.shards, "states": states}
+
+        # replace the old state only once the new one is written
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.state_path)
+
+        with self.manifest_path.open("w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "shards": self.shards}, f, indent=2)
@@ -0,0 +1,267 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# options of the subcommands: {dest: (flag, argparse keyword arguments)}
+# an option that is not given (None) is not passed, so the defaults of the
+# DataProcessor methods apply
+OPTIONS = {
+    # scan
+    "n_items": ("--n-items", {"type": int, "help": "first n lines only"}),
+    "time_period": (
+        "--time-period",
+        {
+            "nargs": 2,
+            "metavar": ("START", 'END, as "%Y%m%d %H:%M:%S"'),
+            "help": "lines created in a time period",
+        },
+    ),
+    "chunk": (
+        "--chunk",
+        {"type": float, "help": "split the time period into chunks of n months"},
+    ),
+    "workers": ("--workers", {"type": int, "help": "number of processes"}),
+    "checkpoint": (
+        "--checkpoint",
+        {"help": "directory of the checkpoint, only new lines are read"},
+    ),
+    "custom_filename": ("--custom-filename", {}),
+    # dicts
+    "author_dict_path": (
+        "--author-dict",
+        {"help": "json file or table directory, counted in the same scan if not given"},
+    ),
+    "id_dict_path": ("--id-dict", {"help": "json file or table directory"}),
+    "table": (
+        "--table",
+        {"action": "store_true", "default": None, "help": "write a table directory"},
+    ),
+    # processed lines
+    "default": (
+        "--no-default-keys",
+        {"action": "store_false", "default": None, "help": "custom keys only"},
+    ),
+    "custom_keys": ("--custom-keys", {"nargs": "+"}),
+    "text_features": ("--text-features", {"action": "store_true", "default": None}),
+    # stats
+    "minpost": ("--minpost", {"type": int, "default": 1}),
+    "mincom": ("--mincom", {"type": int, "default": 1}),
+    "engine": ("--engine", {"choices": ["numpy", "pandas"]}),
+    # texts
+    "keywords": ("--keywords", {"nargs": "+"}),
+    "regex": ("--regex", {"nargs": "+"}),
+    "ignore_case": ("--ignore-case", {"action": "store_true", "default": None}),
+    "min_tokens": ("--min-tokens", {"type": int}),
+    "max_tokens": ("--max-tokens", {"type": int}),
+    "exclude_authors": ("--exclude-authors", {"nargs": "+"}),
+    "text_key": ("--text-key", {}),
+    "max_lines": ("--max-lines", {"type": int}),
+    "top_n": ("--top-n", {"type": int}),
+    "hashing": ("--hashing", {"action": "store_true", "default": None}),
+    # frequent authors
+    "min_count": ("--min-count", {"type": int}),
+    "exact": (
+        "--estimates",
+        {"action": "store_false", "default": None, "help": "skip the exact scan"},
+    ),
+    # other outputs
+    "database_path": ("--database", {"help": "path of the database"}),
+    "key": ("--key", {"choices": ["id", "content"]}),
+}
+
+# options without a default in the DataProcessor methods, passed as None if
+# they are not given (the stats count the lines in the same scan)
+POSITIONAL = ["author_dict_path"]
+
+SCAN = ["n_items", "time_period", "chunk", "workers", "checkpoint"]
+TEXTS = [
+    "keywords",
+    "regex",
+    "ignore_case",
+    "min_tokens",
+    "max_tokens",
+    "exclude_authors",
+    "text_key",
+]
+
+# {subcommand: (DataProcessor method, help, options)}
+EXPORTS = {
+    "author-dict": (
+        "export_author_dict",
+        "{author: number of posts/comments}",
+        SCAN + ["table"],
+    ),
+    "id-dict": (
+        "export_id_dict",
+        "flairs and titles of the posts (submissions)",
+        SCAN + ["table"],
+    ),
+    "processed": (
+        "export_processed_jsonl",
+        "processed lines",
+        SCAN
+        + [
+            "author_dict_path",
+            "id_dict_path",
+            "default",
+            "custom_keys",
+            "text_features",
+            "custom_filename",
+        ],
+    ),
+    "poster-stats": (
+        "export_poster_stats",
+        "author stats of the raw submissions",
+        ["n_items", "time_period", "workers", "checkpoint"]
+        + ["author_dict_path", "minpost", "engine", "custom_filename"],
+    ),
+    "commenter-stats": (
+        "export_commenter_stats",
+        "author stats of the processed comments",
+        SCAN + ["author_dict_path", "mincom", "engine", "custom_filename"],
+    ),
+    "corpus": (
+        "export_corpus",
+        "texts for AntConc",
+        ["n_items", "time_period", "chunk", "workers"]
+        + TEXTS
+        + ["max_lines", "custom_filename"],
+    ),
+    "top-terms": (
+        "export_top_terms",
+        "top tf-idf terms of every text and month",
+        ["n_items", "time_period"] + TEXTS + ["top_n", "hashing", "custom_filename"],
+    ),
+    "frequent-authors": (
+        "export_frequent_authors",
+        "authors with at least min-count lines or the top-n, in fixed memory",
+        ["n_items", "time_period", "chunk", "workers", "min_count", "top_n", "exact"],
+    ),
+    "columnar": (
+        "export_columnar",
+        "column store that can be used as input",
+        ["n_items", "time_period", "custom_filename"],
+    ),
+    "database": (
+        "export_database",
+        "SQLite database that can be used as input",
+        ["database_path"],
+    ),
+    "deduplicated": (
+        "export_deduplicated",
+        "jsonl files without duplicated lines",
+        ["key"],
+    ),
+    "text-index": (
+        "export_text_index",
+        "inverted index of the texts",
+        ["text_key"],
+    ),
+}
+
+
+def get_chunk(chunk: float):
+    """
+    whole months are integers, 0.5 splits into half months (see get_periods)
+    """
+    return int(chunk) if chunk is not None and chunk == int(chunk) else chunk
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="export and collect Reddit data"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, (method, help, options) in EXPORTS.items():
+        subparser = subparsers.add_parser(command, help=help)
+        subparser.set_defaults(method=method, options=options)
+        subparser.add_argument(
+            "input_path", help="jsonl file, directory, column store or database"
+        )
+        subparser.add_argument("output_directory", help="created if it does not exist")
+        subparser.add_argument("mode", choices=["submissions", "comments"])
+        for name in options:
+            flag, kwargs = OPTIONS[name]
+            subparser.add_argument(flag, dest=name, **kwargs)
+        subparser.add_argument("--decoder", choices=["orjson", "ujson", "json"])
+        subparser.add_argument(
+            "--timezone", help='of the time period and dates, "UTC" or an IANA name'
+        )
+        subparser.add_argument(
+            "--metrics", action="store_true", help="write a run report"
+        )
+        subparser.add_argument("--quiet", action="store_true", help="no progress bars")
+
+    collect = subparsers.add_parser(
+        "collect", help="collect the lines of a subreddit from Pushshift"
+    )
+    collect.add_argument("kind", choices=["submissions", "comments"])
+    collect.add_argument("subreddit")
+    collect.add_argument("output_directory")
+    collect.add_argument("--start", required=True, help='"%%Y-%%m-%%d %%H:%%M:%%S"')
+    collect.add_argument("--end", required=True, help='"%%Y-%%m-%%d %%H:%%M:%%S"')
+    collect.add_argument("--slice-seconds", type=int, default=86400)
+    collect.add_argument("--workers", type=int, default=4)
+    collect.add_argument("--compression", choices=["gzip", "zstd"])
+    collect.add_argument("--base-url", default="https://api.pushshift.io")
+    return parser
+
+
+def run_export(args):
+    from process_data import DataProcessor
+
+    Path(args.output_directory).mkdir(parents=True, exist_ok=True)
+    processor = DataProcessor(
+        args.input_path,
+        args.output_directory,
+        args.mode,
+        decoder=args.decoder,
+        metrics=args.metrics,
+        progress=not args.quiet,
+        timezone=args.timezone,
+    )
+    kwargs = {
+        name: getattr(args, name)
+        for name in args.options
+        if getattr(args, name) is not None or name in POSITIONAL
+    }
+    if "time_period" in kwargs:
+        kwargs["time_period"] = tuple(kwargs["time_period"])
+    if "chunk" in kwargs:
+        kwargs["chunk"] = get_chunk(kwargs["chunk"])
+    return getattr(processor, args.method)(**kwargs)
+
+
+def run_collect(args):
+    from collect_data import PushshiftClient, SliceCollector, get_start_epoch
+
+    collector = SliceCollector(
+        PushshiftClient(base_url=args.base_url),
+        args.kind,
+        args.subreddit,
+        args.output_directory,
+        workers=args.workers,
+        compression=args.compression,
+    )
+    return collector.collect(
+        get_start_epoch(time=args.start),
+        get_start_epoch(time=args.end),
+        slice_seconds=args.slice_seconds,
+    )
+
+
+def main(argv: list = None) -> int:
+    args = get_parser().parse_args(argv)
+    if args.command == "collect":
+        result = run_collect(args)
+    else:
+        result = run_export(args)
+    if result is not None:
+        print(json.dumps(result, indent=2, ensure_ascii=False, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,15 @@
 import json
-from psaw import PushshiftAPI
+import time
+import random
+import threading
+import urllib.parse
+import urllib.request
+import urllib.error
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import datetime as dt
 from tqdm import tqdm
+from shard_io import COMPRESSION_SUFFIXES, open_shard
 
 
 def get_start_epoch(path=None, time=None) -> int:
@@ -25,103 +33,464 @@ def append_last_epoch(output_path, last_epoch: int):
         f.write(str(last_epoch) + "\n")
 
 
+def write_search(gen, writer, start_epoch: int) -> int:
+    """
+    write the items of a psaw search with a ShardWriter, return the
+    created_utc of the last one (start_epoch if there were none)
+    """
+    last_epoch = start_epoch
+    with writer:
+        for c in tqdm(gen):
+            writer.write([c.d_])
+            last_epoch = c.d_["created_utc"]
+    return last_epoch
+
+
 def get_comments_by_subreddit(
     api,
     start_epoch: int,
     subreddit: str,
-    output_path,
+    output_directory,
+    compression: str = None,
+    max_lines: int = 500000,
 ):
+    """
+    write the comments created after start_epoch into
+    "<subreddit>_comments_<i>.jsonl[.gz|.zst]" shards of max_lines lines,
+    see ShardWriter
+    """
     gen = api.search_comments(
         subreddit=subreddit,
         sort="asc",
         after=start_epoch,
         metadata=True,
     )
-
-    max_response_cache = 1000
-    max_json_lines = 100000
-    data = []
-    lines = 0
-
-    for c in tqdm(gen):
-        data.append(c.d_)
-        lines += 1
-        # shards_status = api.metadata_.get("shards")
-        try:
-            if len(data) >= max_response_cache:
-                dump_jsonl(data, output_path)
-                data = []
-            if lines >= max_json_lines:
-                last_epoch = c.d_["created_utc"]
-                break
-        except StopIteration:
-            pass
-            last_epoch = c.d_["created_utc"]
-    return last_epoch
+    writer = ShardWriter(
+        output_directory,
+        f"{subreddit}_comments",
+        compression=compression,
+        max_lines=max_lines,
+    )
+    return write_search(gen, writer, start_epoch)
 
 
 def get_submissions_by_subreddit(
     api,
     start_epoch: int,
     subreddit: str,
-    output_path,
+    output_directory,
+    compression: str = None,
+    max_lines: int = 500000,
 ):
+    """
+    write the submissions created after start_epoch into
+    "<subreddit>_submissions_<i>.jsonl[.gz|.zst]" shards of max_lines lines,
+    see ShardWriter
+    """
     gen = api.search_submissions(
         subreddit=subreddit,
         sort="asc",
         after=start_epoch,
         metadata=True,
     )
+    writer = ShardWriter(
+        output_directory,
+        f"{subreddit}_submissions",
+        compression=compression,
+        max_lines=max_lines,
+    )
+    return write_search(gen, writer, start_epoch)
 
-    max_response_cache = 10
-    max_json_lines = 100000
-    data = []
-    lines = 0
 
-    for c in tqdm(gen):
-        data.append(c.d_)
-        lines += 1
-        # shards_status = api.metadata_.get("shards")
-        try:
-            if len(data) >= max_response_cache:
-                dump_jsonl(data, output_path)
-                data = []
-            if lines >= max_json_lines:
-                last_epoch = c.d_["created_utc"]
-                break
-        except StopIteration:
-            pass
-            last_epoch = c.d_["created_utc"]
-    return last_epoch
+def encode_line(line: dict) -> bytes:
+    return (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
 
 
 def dump_jsonl(data, output_path, append=True):
     """
     Write list of objects to a JSON lines file.
     """
-    mode = "a+" if append else "w"
-    with open(output_path, mode, encoding="utf-8") as f:
+    mode = "ab" if append else "wb"
+    with open_shard(output_path, mode) as f:
         for line in data:
-            json_record = json.dumps(line, ensure_ascii=False)
-            f.write(json_record + "\n")
+            f.write(encode_line(line))
+
+
+class ShardWriter:
+    """
+    jsonl output that keeps one handle open and starts a new shard
+    "<name>_<i>.jsonl[.gz|.zst]" every max_lines lines
+
+    a writer for a name that already has shards starts after the last one
+    """
+
+    def __init__(
+        self,
+        output_directory,
+        name: str,
+        compression: str = None,
+        max_lines: int = 500000,
+    ):
+        """
+        :param compression
+        :type "gzip", "zstd" or None
+        """
+        assert compression in [
+            None,
+            "gzip",
+            "zstd",
+        ], f"{compression} must be 'gzip', 'zstd' or None."
+        self.output_directory = Path(output_directory)
+        self.name = name
+        self.suffix = COMPRESSION_SUFFIXES[compression]
+        self.max_lines = max_lines
+        self.paths = []
+        while self.shard_path(len(self.paths)).exists():
+            self.paths.append(self.shard_path(len(self.paths)))
+        self.f = None
+        self.lines = 0
+
+    def shard_path(self, i: int) -> Path:
+        return self.output_directory / f"{self.name}_{i}{self.suffix}"
+
+    def rotate(self):
+        self.close()
+        path = self.shard_path(len(self.paths))
+        self.paths.append(path)
+        self.f = open_shard(path, "wb")
+        self.lines = 0
+
+    def write(self, items: list):
+        for item in items:
+            if self.f is None or self.lines >= self.max_lines:
+                self.rotate()
+            self.f.write(encode_line(item))
+            self.lines += 1
+
+    def flush(self):
+        if self.f is not None:
+            self.f.flush()
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class RateLimitError(Exception):
+    """
+    raised by a client when the API asks to slow down
+    """
+
+    def __init__(self, retry_after: float = None):
+        super().__init__("The API rate limit was reached.")
+        self.retry_after = retry_after
+
+
+class PushshiftClient:
+    """
+    client of the PushShift search endpoints
+
+    a client only needs fetch(), so a local stand-in server (through base_url)
+    or a ListClient can be used by SliceCollector instead
+    """
+
+    def __init__(
+        self,
+        base_url: str = "https://api.pushshift.io",
+        timeout: float = 60,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def fetch(
+        self, kind: str, subreddit: str, after: int, before: int, size: int
+    ) -> list:
+        """
+        return up to size items with after < created_utc < before, oldest first
+        """
+        params = urllib.parse.urlencode(
+            {
+                "subreddit": subreddit,
+                "after": after,
+                "before": before,
+                "sort": "asc",
+                "sort_type": "created_utc",
+                "size": size,
+            }
+        )
+        # "comments" -> /reddit/search/comment/
+        url = f"{self.base_url}/reddit/search/{kind[:-1]}/?{params}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.load(response)["data"]
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                retry_after = e.headers.get("Retry-After")
+                raise RateLimitError(float(retry_after) if retry_after else None)
+            raise
+
+
+class ListClient:
+    """
+    client that serves a list of items from memory, for tests and dry runs
+    """
+
+    def __init__(self, items: list):
+        self.items = sorted(items, key=lambda item: item["created_utc"])
+
+    def fetch(
+        self, kind: str, subreddit: str, after: int, before: int, size: int
+    ) -> list:
+        return [
+            item
+            for item in self.items
+            if after < item["created_utc"] < before
+            and item.get("subreddit", subreddit) == subreddit
+        ][:size]
+
+
+def get_slices(start_epoch: int, end_epoch: int, slice_seconds: int) -> list:
+    """
+    split start_epoch < created_utc <= end_epoch into disjoint (after, before) slices
+    """
+    slices = []
+    after = start_epoch
+    while after < end_epoch:
+        before = min(after + slice_seconds, end_epoch)
+        slices.append((after, before))
+        after = before
+    return slices
+
+
+class SliceCollector:
+    """
+    collect the submissions or comments of a subreddit in a time range
+
+    the range is split into time slices that are fetched by a thread pool,
+    every slice is written to its own jsonl shards in the output directory.
+    the progress of every slice is kept in slices.json, so an interrupted run
+    only fetches the rest of the unfinished slices when it is started again.
+    the requests of all threads are spaced by min_interval seconds, a rate
+    limited request is retried after an exponential backoff
+    """
+
+    def __init__(
+        self,
+        client,
+        kind: str,
+        subreddit: str,
+        output_directory: str,
+        workers: int = 4,
+        page_size: int = 100,
+        min_interval: float = 1.0,
+        max_retries: int = 8,
+        backoff: float = 2.0,
+        compression: str = None,
+        max_lines: int = 500000,
+    ):
+        """
+        :param client
+        :type PushshiftClient, ListClient or any object with the same fetch()
+
+        :param kind
+        :type either "comments" or "submissions"
+
+        :param compression
+        :type "gzip", "zstd" or None, see ShardWriter
+
+        :param max_lines
+        :type maximum number of lines of one shard
+        """
+        assert kind in [
+            "submissions",
+            "comments",
+        ], f"{kind} must be 'comments' or 'submissions'."
+        self.client = client
+        self.kind = kind
+        self.subreddit = subreddit
+        self.output_directory = Path(output_directory)
+        self.output_directory.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.page_size = page_size
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.compression = compression
+        self.max_lines = max_lines
+
+        self.checkpoint_path = self.output_directory / "slices.json"
+        self.lock = threading.Lock()
+        self.next_request = 0.0
+        # {slice name: {"after": x, "before": x, "cursor": x, "done": bool}}
+        self.slices = {}
+        if self.checkpoint_path.exists():
+            with self.checkpoint_path.open("r", encoding="utf-8") as f:
+                self.slices = json.load(f)
+
+    def slice_name(self, after: int, before: int) -> str:
+        return f"{self.subreddit}_{self.kind}_{after}_{before}"
+
+    def save(self):
+        # called with the lock held
+        tmp_path = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.slices, f, indent=2)
+        tmp_path.replace(self.checkpoint_path)
+
+    def wait_turn(self):
+        """
+        space the requests of all threads by min_interval
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_request - now
+            self.next_request = max(now, self.next_request) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def fetch(self, after: int, before: int, size: int = None) -> list:
+        for attempt in range(self.max_retries + 1):
+            self.wait_turn()
+            try:
+                return self.client.fetch(
+                    self.kind, self.subreddit, after, before, size or self.page_size
+                )
+            except RateLimitError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = e.retry_after
+                if delay is None:
+                    delay = self.backoff * 2**attempt * (1 + random.random())
+                # the other threads wait as well
+                with self.lock:
+                    self.next_request = max(
+                        self.next_request, time.monotonic() + delay
+                    )
+
+    def collect_slice(self, name: str) -> int:
+        """
+        fetch one slice from its cursor on, return the number of new items
+
+        the API pages by created_utc only, so the next page starts at the
+        second of the last item (the cursor) and the items of that second that
+        were written already are left out. a page of only such items is fetched
+        again with twice the size, and once a shorter page shows that the second
+        is complete the next page starts after it. the slice ends with an empty page.
+
+        the written shards are the checkpoint of the items: the cursor and its
+        ids are read back from them when a slice is resumed, so items written
+        before a crash are not fetched twice
+        """
+        state = self.slices[name]
+        cursor = state["cursor"]
+        before = state["before"] + 1
+        writer = ShardWriter(
+            self.output_directory,
+            name,
+            compression=self.compression,
+            max_lines=self.max_lines,
+        )
+        # ids at the cursor epoch, a page can end in the middle of one second
+        boundary_ids = set()
+        for path in writer.paths:
+            with open_shard(path) as f:
+                try:
+                    for record in f:
+                        item = json.loads(record)
+                        if item["created_utc"] > cursor:
+                            cursor = item["created_utc"]
+                            boundary_ids = set()
+                        if item["created_utc"] == cursor:
+                            boundary_ids.add(item["id"])
+                except (EOFError, ValueError):
+                    # the end of a shard that was being written
+                    pass
+        n = 0
+        size = self.page_size
+        with writer:
+            while True:
+                raw_page = self.fetch(
+                    cursor - 1 if boundary_ids else cursor, before, size
+                )
+                if not raw_page:
+                    break
+                page = [item for item in raw_page if item["id"] not in boundary_ids]
+                if not page:
+                    if len(raw_page) >= size:
+                        # at least size items in the cursor second
+                        size *= 2
+                    else:
+                        # every item of the cursor second is written
+                        boundary_ids = set()
+                    continue
+                size = self.page_size
+                writer.write(page)
+                writer.flush()
+                n += len(page)
+                if page[-1]["created_utc"] != cursor:
+                    boundary_ids = set()
+                cursor = page[-1]["created_utc"]
+                boundary_ids.update(
+                    item["id"] for item in page if item["created_utc"] == cursor
+                )
+                with self.lock:
+                    state["cursor"] = cursor
+                    self.save()
+        with self.lock:
+            state["done"] = True
+            self.save()
+        return n
+
+    def collect(self, start_epoch: int, end_epoch: int, slice_seconds: int = 86400):
+        """
+        collect start_epoch < created_utc <= end_epoch, return the number of new items
+        """
+        for after, before in get_slices(start_epoch, end_epoch, slice_seconds):
+            name = self.slice_name(after, before)
+            if name not in self.slices:
+                self.slices[name] = {
+                    "after": after,
+                    "before": before,
+                    "cursor": after,
+                    "done": False,
+                }
+        self.save()
+        todo = [
+            name
+            for name, state in self.slices.items()
+            if not state["done"]
+            and state["after"] >= start_epoch
+            and state["before"] <= end_epoch
+        ]
+
+        n = 0
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = [pool.submit(self.collect_slice, name) for name in todo]
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                n += future.result()
+        return n
 
 
 if __name__ == "__main__":
-    api = PushshiftAPI()
     get = "comments"
-    if get == "comments":
-        last_epoch_path = "/Users/pipchang/Documents/VSC/Projects/Corpus_Linguistics/Reddit_Corpus/tata_com/last_epoch_comments.txt"
-        start_epoch = get_start_epoch(last_epoch_path)
-        subreddit = "TooAfraidToAsk"
-        output_path = "/Users/pipchang/Documents/VSC/Projects/Corpus_Linguistics/Reddit_Corpus/tata_com/tata_comments_18.jsonl"
-        last_epoch = get_comments_by_subreddit(api, start_epoch, subreddit, output_path)
-        append_last_epoch(last_epoch_path, last_epoch)
-    if get == "submissions":
-        last_epoch_path = "/Users/pipchang/Documents/VSC/Projects/Corpus_Linguistics/Reddit_Corpus/tata_post/last_epoch_submissions.txt"
-        start_epoch = get_start_epoch(last_epoch_path)
-        subreddit = "TooAfraidToAsk"
-        output_path = "/Users/pipchang/Documents/VSC/Projects/Corpus_Linguistics/Reddit_Corpus/tata_post/tata_submissions_3.jsonl"
-        last_epoch = get_submissions_by_subreddit(
-            api, start_epoch, subreddit, output_path
-        )
-        append_last_epoch(last_epoch_path, last_epoch)
+    subreddit = "TooAfraidToAsk"
+    output_directory = f"/Users/pipchang/Documents/VSC/Projects/Corpus_Linguistics/Reddit_Corpus/tata_{get}"
+    start_epoch = get_start_epoch(time="2013-01-01 00:00:00")
+    end_epoch = get_start_epoch(time="2020-12-31 23:59:59")
+
+    collector = SliceCollector(
+        PushshiftClient(),
+        get,
+        subreddit,
+        output_directory,
+        workers=4,
+        compression="zstd",
+    )
+    collector.collect(start_epoch, end_epoch, slice_seconds=7 * 86400)
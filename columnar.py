@@ -0,0 +1,414 @@
+import json
+import numpy as np
+from pathlib import Path
+
+# column types:
+# - "int": int64 with a null mask
+# - "float": float64, None is NaN
+# - "bool": int8, -1 is None
+# - "category": dictionary encoded int32 codes, -1 is None
+# - "text": utf-8 bytes with int64 offsets and a null mask
+DEFAULT_COLUMNS = {
+    "submissions": {
+        "id": "text",
+        "post_id": "text",
+        "author": "category",
+        "total_posts": "int",
+        "title": "text",
+        "selftext": "text",
+        "link_flair_text": "category",
+        "removed_by_category": "category",
+        "created_utc": "int",
+        "month": "category",
+        "score": "int",
+        "upvote_ratio": "float",
+        "num_comments": "int",
+        "num_crossposts": "int",
+        "subreddit_subscribers": "int",
+        "token_count": "int",
+        "char_count": "int",
+        "text_hash": "text",
+    },
+    "comments": {
+        "id": "text",
+        "comment_id": "text",
+        "link_id": "text",
+        "post_id": "text",
+        "author": "category",
+        "total_comments": "int",
+        "author_created_utc": "int",
+        "body": "text",
+        "link_flair_text": "category",
+        "title": "text",
+        "created_utc": "int",
+        "month": "category",
+        "score": "int",
+        "no_follow": "bool",
+        "collapsed_reason_code": "category",
+        "controversiality": "int",
+        "banned_by": "category",
+        "is_submitter": "bool",
+        "token_count": "int",
+        "char_count": "int",
+        "text_hash": "text",
+    },
+}
+
+
+class ColumnWriter:
+    """
+    append batches of values of one column to its files
+    """
+
+    def __init__(self, directory: Path, name: str, type: str):
+        assert type in [
+            "int",
+            "float",
+            "bool",
+            "category",
+            "text",
+        ], f"{type} is not a column type."
+        self.directory = directory
+        self.name = name
+        self.type = type
+        self.has_values = False
+        self.has_nulls = False
+        self.categories = {}
+        self.text_offset = 0
+
+        self.f = (directory / f"{name}.bin").open("wb")
+        self.f_null = None
+        self.f_data = None
+        if type in ["int", "text"]:
+            self.f_null = (directory / f"{name}.null.bin").open("wb")
+        if type == "text":
+            self.f_data = (directory / f"{name}.data.bin").open("wb")
+            np.array([0], dtype=np.int64).tofile(self.f)
+
+    def append(self, values: list):
+        null = np.array([v is None for v in values], dtype=bool)
+        if not null.all():
+            self.has_values = True
+        if null.any():
+            self.has_nulls = True
+
+        if self.type == "int":
+            array = np.array([0 if v is None else v for v in values], dtype=np.int64)
+            null.tofile(self.f_null)
+        elif self.type == "float":
+            array = np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+        elif self.type == "bool":
+            array = np.array(
+                [-1 if v is None else int(bool(v)) for v in values], dtype=np.int8
+            )
+        elif self.type == "category":
+            codes = []
+            for v in values:
+                if v is None:
+                    codes.append(-1)
+                else:
+                    v = str(v)
+                    if v not in self.categories:
+                        self.categories[v] = len(self.categories)
+                    codes.append(self.categories[v])
+            array = np.array(codes, dtype=np.int32)
+        else:
+            encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+            lengths = np.array([len(b) for b in encoded], dtype=np.int64)
+            array = self.text_offset + np.cumsum(lengths)
+            if len(array):
+                self.text_offset = int(array[-1])
+            self.f_data.write(b"".join(encoded))
+            null.tofile(self.f_null)
+        array.tofile(self.f)
+
+    def close(self) -> dict:
+        """
+        close the files, drop the null mask if there are no nulls
+        """
+        for f in [self.f, self.f_null, self.f_data]:
+            if f is not None:
+                f.close()
+        if self.f_null is not None and not self.has_nulls:
+            Path(self.f_null.name).unlink()
+        meta = {"type": self.type, "has_nulls": self.has_nulls}
+        if self.type == "category":
+            meta["categories"] = list(self.categories)
+        return meta
+
+    def remove(self):
+        for f in [self.f, self.f_null, self.f_data]:
+            if f is not None:
+                f.close()
+                Path(f.name).unlink(missing_ok=True)
+
+
+def write_store(
+    lines,
+    output_path,
+    columns: dict,
+    batch_size: int = 100000,
+    shard_names: list = None,
+):
+    """
+    write the lines of an iterable into a column store directory
+
+    :param lines
+    :type iterable of (shard index, line) pairs
+
+    :param columns
+    :type {column name: column type}, see DEFAULT_COLUMNS
+
+    columns that are None in every line are dropped
+    """
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+    writers = {
+        name: ColumnWriter(output_path, name, type) for name, type in columns.items()
+    }
+
+    rows = 0
+    row_groups = []
+    shards = []
+    batch = []
+
+    def flush():
+        nonlocal rows
+        if not batch:
+            return
+        for name, writer in writers.items():
+            writer.append([line.get(name) for line in batch])
+        utcs = [line.get("created_utc") for line in batch]
+        utcs = [u for u in utcs if u is not None]
+        row_groups.append(
+            {
+                "start": rows,
+                "end": rows + len(batch),
+                "min_utc": min(utcs) if utcs else None,
+                "max_utc": max(utcs) if utcs else None,
+            }
+        )
+        rows += len(batch)
+        batch.clear()
+
+    for shard, line in lines:
+        # start a new row group for every shard
+        if not shards or shards[-1]["shard"] != shard:
+            flush()
+            shards.append({"shard": shard, "start": rows, "end": rows})
+        batch.append(line)
+        shards[-1]["end"] = rows + len(batch)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    # drop empty columns
+    meta = {}
+    for name, writer in writers.items():
+        if writer.has_values:
+            meta[name] = writer.close()
+        else:
+            writer.remove()
+
+    if shard_names is not None:
+        for shard in shards:
+            shard["shard"] = shard_names[shard["shard"]]
+    store = {
+        "rows": rows,
+        "columns": meta,
+        "row_groups": row_groups,
+        "shards": shards,
+    }
+    with (output_path / "store.json").open("w", encoding="utf-8") as f:
+        json.dump(store, f, ensure_ascii=False)
+
+
+class ColumnStore:
+    """
+    read a column store written by write_store with memory mapped columns,
+    only the chosen columns and the row groups in the time period are read
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with (self.path / "store.json").open("r", encoding="utf-8") as f:
+            store = json.load(f)
+        self.rows = store["rows"]
+        self.columns = store["columns"]
+        self.row_groups = store["row_groups"]
+        self.shards = store["shards"]
+
+    @staticmethod
+    def is_store(path) -> bool:
+        return Path(path).is_dir() and (Path(path) / "store.json").exists()
+
+    def _memmap(self, name: str, dtype):
+        path = self.path / name
+        if path.stat().st_size == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def read_column(self, name: str, start: int, end: int, decode: bool = True):
+        """
+        return the values of rows [start, end) of a column as a numpy array
+
+        nulls are NaN for int and float columns, -1 for bool columns,
+        category codes are -1 for nulls and decoded into an object array if decode is True,
+        text columns are decoded into an object array with None for nulls
+        """
+        meta = self.columns[name]
+        type = meta["type"]
+        if type == "int":
+            values = np.asarray(self._memmap(f"{name}.bin", np.int64)[start:end])
+            if meta["has_nulls"]:
+                null = self._memmap(f"{name}.null.bin", bool)[start:end]
+                values = values.astype(np.float64)
+                values[null] = np.nan
+            return values
+        if type == "float":
+            return np.asarray(self._memmap(f"{name}.bin", np.float64)[start:end])
+        if type == "bool":
+            return np.asarray(self._memmap(f"{name}.bin", np.int8)[start:end])
+        if type == "category":
+            codes = np.asarray(self._memmap(f"{name}.bin", np.int32)[start:end])
+            if not decode:
+                return codes
+            categories = np.array(meta["categories"] + [None], dtype=object)
+            return categories[codes]
+        offsets = self._memmap(f"{name}.bin", np.int64)[start : end + 1]
+        values = np.empty(end - start, dtype=object)
+        if end <= start:
+            return values
+        data = self._memmap(f"{name}.data.bin", np.uint8)[offsets[0] : offsets[-1]]
+        data = bytes(data)
+        base = offsets[0]
+        for i in range(end - start):
+            values[i] = data[offsets[i] - base : offsets[i + 1] - base].decode("utf-8")
+        if meta["has_nulls"]:
+            null = self._memmap(f"{name}.null.bin", bool)[start:end]
+            values[null] = None
+        return values
+
+    def get_ranges(self, time_period_epochs: tuple = None, n_items: int = None) -> list:
+        """
+        return the (start, end, mask needed) row ranges to read
+
+        row groups outside the time period are skipped,
+        without a time period n_items keeps the first n_items rows of each shard
+        (the time period wins like for jsonl files)
+        """
+        ranges = []
+        if n_items and time_period_epochs is None:
+            for shard in self.shards:
+                ranges.append(
+                    (shard["start"], min(shard["end"], shard["start"] + n_items), False)
+                )
+            return ranges
+        for group in self.row_groups:
+            if time_period_epochs is None:
+                ranges.append((group["start"], group["end"], False))
+                continue
+            start_epoch, end_epoch = time_period_epochs
+            if group["min_utc"] is None:
+                continue
+            if group["max_utc"] <= start_epoch or group["min_utc"] > end_epoch:
+                continue
+            inside = group["min_utc"] > start_epoch and group["max_utc"] <= end_epoch
+            ranges.append((group["start"], group["end"], not inside))
+        return ranges
+
+    def read(
+        self,
+        columns: list = None,
+        time_period_epochs: tuple = None,
+        n_items: int = None,
+        decode: bool = True,
+    ):
+        """
+        yield batches {column: numpy array} of the chosen columns, one per row range
+        """
+        if columns is None:
+            columns = list(self.columns)
+        columns = [c for c in columns if c in self.columns]
+        for start, end, needs_mask in self.get_ranges(time_period_epochs, n_items):
+            batch = {
+                name: self.read_column(name, start, end, decode) for name in columns
+            }
+            if needs_mask:
+                utc = self.read_column("created_utc", start, end)
+                start_epoch, end_epoch = time_period_epochs
+                mask = (utc > start_epoch) & (utc <= end_epoch)
+                batch = {name: values[mask] for name, values in batch.items()}
+            yield batch
+
+    def iter_records(
+        self,
+        fields: list = None,
+        time_period_epochs: tuple = None,
+        n_items: int = None,
+    ):
+        """
+        yield each row as a dict, like DataHandler.get_generator does
+        """
+        if fields is None:
+            fields = list(self.columns)
+        for batch in self.read(fields, time_period_epochs, n_items):
+            lists = {}
+            for name in fields:
+                if name not in batch:
+                    continue
+                type = self.columns[name]["type"]
+                values = batch[name]
+                if type == "bool":
+                    lists[name] = [None if v < 0 else bool(v) for v in values.tolist()]
+                elif type == "int":
+                    if values.dtype == np.float64:
+                        lists[name] = [
+                            None if v != v else int(v) for v in values.tolist()
+                        ]
+                    else:
+                        lists[name] = values.tolist()
+                elif type == "float":
+                    lists[name] = [None if v != v else v for v in values.tolist()]
+                else:
+                    lists[name] = values.tolist()
+            n = len(next(iter(lists.values()))) if lists else 0
+            for i in range(n):
+                yield {
+                    name: lists[name][i] if name in lists else None for name in fields
+                }
+
+    def to_pandas(self, columns: list = None, time_period_epochs: tuple = None):
+        """
+        return the chosen columns as a DataFrame, category columns stay dictionary encoded
+        """
+        import pandas as pd
+
+        if columns is None:
+            columns = list(self.columns)
+        columns = [c for c in columns if c in self.columns]
+        batches = list(self.read(columns, time_period_epochs, decode=False))
+        data = {}
+        for name in columns:
+            values = (
+                np.concatenate([batch[name] for batch in batches])
+                if batches
+                else self.read_column(name, 0, 0, decode=False)
+            )
+            type = self.columns[name]["type"]
+            if type == "category":
+                data[name] = pd.Categorical.from_codes(
+                    values, categories=self.columns[name]["categories"]
+                )
+            elif type == "bool":
+                data[name] = pd.array(
+                    [None if v < 0 else bool(v) for v in values.tolist()],
+                    dtype="boolean",
+                )
+            elif type == "int" and values.dtype == np.float64:
+                data[name] = pd.array(values, dtype="Int64")
+            else:
+                data[name] = values
+        return pd.DataFrame(data)
@@ -0,0 +1,133 @@
+import time
+import datetime
+
+DAY = 86400
+EPOCH_DAY = datetime.date(1970, 1, 1)
+# " %H:%M:" of every minute of a day and "%S" of every second of a minute
+MINUTES = [f" {hour:02d}:{minute:02d}:" for hour in range(24) for minute in range(60)]
+SECONDS = [f"{second:02d}" for second in range(60)]
+
+
+def get_timezone(timezone: str = None):
+    """
+    return the tzinfo of a time zone name, None for the local time of the machine
+
+    :param timezone
+    :type None or "local", "UTC" or an IANA name like "America/New_York"
+    """
+    if timezone is None or timezone == "local":
+        return None
+    if timezone == "UTC":
+        return datetime.timezone.utc
+    from zoneinfo import ZoneInfo
+
+    return ZoneInfo(timezone)
+
+
+class Dates:
+    """
+    dates, months, days and hours of epochs in one time zone
+
+    the utc offset is looked up once per utc day (every epoch of a day with a
+    daylight saving change is looked up on its own) and the date of a day is
+    formatted once, the time of day is put together from the strings above.
+    the results are the same as datetime.fromtimestamp(utc, tz).strftime(...)
+    """
+
+    def __init__(self, timezone: str = None):
+        """
+        :param timezone
+        :type None for the local time of the machine, "UTC" or an IANA name
+        """
+        self.timezone = timezone
+        self.tz = get_timezone(timezone)
+        # {utc day: utc offset in seconds, None if it changes during the day}
+        self.offsets = {}
+        # {local day: "%Y-%m-%d"}
+        self.days = {}
+
+    def utc_offset(self, utc: int) -> int:
+        if self.tz is None:
+            return time.localtime(utc).tm_gmtoff
+        offset = datetime.datetime.fromtimestamp(utc, self.tz).utcoffset()
+        return int(offset.total_seconds())
+
+    def get_offset(self, utc: int) -> int:
+        """
+        the utc offset of an epoch whose day is not cached or has a change
+        """
+        day = utc // DAY
+        if day not in self.offsets:
+            first = self.utc_offset(day * DAY)
+            last = self.utc_offset(day * DAY + DAY - 1)
+            self.offsets[day] = first if first == last else None
+        offset = self.offsets[day]
+        return self.utc_offset(utc) if offset is None else offset
+
+    def local(self, utc) -> int:
+        """
+        seconds since the epoch in the time zone
+        """
+        utc = int(utc)
+        offset = self.offsets.get(utc // DAY)
+        if offset is None:
+            offset = self.get_offset(utc)
+        return utc + offset
+
+    def format_day(self, local_day: int) -> str:
+        day = self.days.get(local_day)
+        if day is None:
+            # "%Y-%m-%d"
+            day = (EPOCH_DAY + datetime.timedelta(days=local_day)).isoformat()
+            self.days[local_day] = day
+        return day
+
+    def date(self, utc) -> str:
+        """
+        "%Y-%m-%d %H:%M:%S", None if utc is empty
+        """
+        if not utc:
+            return None
+        # local() and format_day() inlined, this is called for every line
+        utc = int(utc)
+        offset = self.offsets.get(utc // DAY)
+        if offset is None:
+            offset = self.get_offset(utc)
+        day, seconds = divmod(utc + offset, DAY)
+        date = self.days.get(day) or self.format_day(day)
+        return date + MINUTES[seconds // 60] + SECONDS[seconds % 60]
+
+    def day(self, utc) -> str:
+        """
+        "%Y-%m-%d", None if utc is empty
+        """
+        if not utc:
+            return None
+        return self.format_day(self.local(utc) // DAY)
+
+    def month(self, utc) -> str:
+        """
+        "%Y-%m", None if utc is empty
+        """
+        if not utc:
+            return None
+        return self.format_day(self.local(utc) // DAY)[:7]
+
+    def hour(self, utc) -> str:
+        """
+        "%Y-%m-%d %H", None if utc is empty
+        """
+        if not utc:
+            return None
+        day, seconds = divmod(self.local(utc), DAY)
+        return f"{self.format_day(day)} {seconds // 3600:02d}"
+
+    def epoch(self, date, format: str = "%Y%m%d %H:%M:%S") -> int:
+        """
+        the epoch of a date string or datetime, naive ones are in the time zone
+        """
+        if isinstance(date, str):
+            date = datetime.datetime.strptime(date, format)
+        if date.tzinfo is None and self.tz is not None:
+            date = date.replace(tzinfo=self.tz)
+        return int(date.timestamp())
@@ -0,0 +1,67 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def available_backends() -> list:
+    """
+    return the names of the json backends that can be used, fastest first
+    """
+    backends = []
+    if orjson is not None:
+        backends.append("orjson")
+    if ujson is not None:
+        backends.append("ujson")
+    backends.append("json")
+    return backends
+
+
+def get_decoder(backend: str = None):
+    """
+    return a function that decodes one jsonl line (bytes or str) into a dict
+
+    :param backend
+    :type "orjson", "ujson", "json" or None for the fastest one installed
+    """
+    if backend is None:
+        backend = available_backends()[0]
+    assert (
+        backend in available_backends()
+    ), f"{backend} is not installed, choose from {available_backends()}."
+    if backend == "orjson":
+        return orjson.loads
+    if backend == "ujson":
+        return ujson.loads
+    return json.loads
+
+
+def project(line: dict, fields) -> dict:
+    """
+    keep only the chosen keys of a decoded line, missing keys become None
+    """
+    return {key: line.get(key) for key in fields}
+
+
+def get_keys(line: dict) -> dict:
+    """
+    the id, post_id and author of a raw or processed line
+    """
+    id = line.get("id") or line.get("comment_id") or line.get("post_id")
+    post_id = line.get("post_id")
+    if post_id is None:
+        link_id = line.get("link_id")
+        if link_id:
+            # comments
+            post_id = link_id.split("_")[-1]
+        elif "title" in line:
+            # submissions
+            post_id = line.get("id")
+    return {"id": id, "post_id": post_id, "author": line.get("author")}
@@ -0,0 +1,189 @@
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from pathlib import Path
+from shard_io import open_shard
+
+# base 36 reddit ids that fit into 64 bits
+BASE36_ID = re.compile(r"[0-9a-z]{1,12}")
+
+
+def content_key(raw: bytes) -> int:
+    """
+    64 bit hash of a raw jsonl line
+    """
+    digest = hashlib.blake2b(raw.strip(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def id_key(id) -> int:
+    """
+    reddit ids are base 36 numbers and are kept as they are, other ids
+    (prefixed, signed, with "_" or spaces) are hashed
+    """
+    if isinstance(id, str) and BASE36_ID.fullmatch(id):
+        return int(id, 36)
+    return content_key(f"id:{id}".encode("utf-8"))
+
+
+class KeySet:
+    """
+    set of 64 bit keys that spills to disk
+
+    new keys are kept in a python set, once it holds max_keys they are sorted
+    and written to a run file that is memory mapped. keys of a batch are looked
+    up in the runs with one searchsorted per run, runs are merged when there are
+    more than max_runs of them
+    """
+
+    def __init__(
+        self,
+        max_keys: int = 2000000,
+        max_runs: int = 8,
+        spill_directory: str = None,
+    ):
+        """
+        :param spill_directory
+        :type directory of the run files, None uses a temporary directory
+        """
+        self.max_keys = max_keys
+        self.max_runs = max_runs
+        self.spill_directory = spill_directory
+        self.directory = None
+        self.memory = set()
+        self.runs = []
+        self.n_files = 0
+
+    def __len__(self):
+        return len(self.memory) + sum(len(run) for run in self.runs)
+
+    def add_batch(self, keys: list) -> list:
+        """
+        add keys, return for every key whether it was new
+        """
+        seen_in_runs = np.zeros(len(keys), dtype=bool)
+        if self.runs and keys:
+            array = np.array(keys, dtype=np.uint64)
+            for run in self.runs:
+                positions = np.searchsorted(run, array)
+                positions[positions == len(run)] = len(run) - 1
+                seen_in_runs |= run[positions] == array
+
+        memory = self.memory
+        new = []
+        for key, seen in zip(keys, seen_in_runs):
+            if seen or key in memory:
+                new.append(False)
+            else:
+                memory.add(key)
+                new.append(True)
+
+        if len(memory) >= self.max_keys:
+            self.spill()
+        return new
+
+    def write_run(self, array) -> np.ndarray:
+        if self.directory is None:
+            if self.spill_directory is None:
+                self.directory = Path(tempfile.mkdtemp(prefix="dedup_"))
+            else:
+                self.directory = Path(self.spill_directory)
+                self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"run_{self.n_files}.npy"
+        self.n_files += 1
+        np.save(path, array)
+        return np.load(path, mmap_mode="r")
+
+    def spill(self):
+        array = np.fromiter(self.memory, dtype=np.uint64, count=len(self.memory))
+        array.sort()
+        self.runs.append(self.write_run(array))
+        self.memory = set()
+        if len(self.runs) > self.max_runs:
+            merged = np.concatenate(self.runs)
+            merged.sort()
+            self.remove_runs()
+            self.runs = [self.write_run(merged)]
+
+    def remove_runs(self):
+        for run in self.runs:
+            Path(run.filename).unlink()
+        self.runs = []
+
+    def close(self):
+        self.memory = set()
+        if self.directory is not None:
+            self.remove_runs()
+            if self.spill_directory is None:
+                shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+def deduplicate(
+    jsonl_paths: list,
+    output_directory,
+    loads=json.loads,
+    key: str = "id",
+    batch_size: int = 65536,
+    max_keys: int = 2000000,
+    spill_directory: str = None,
+) -> dict:
+    """
+    write every jsonl file without the lines seen before (in the same file or
+    an earlier one) into output_directory, in one pass over all files
+
+    :param key
+    :type "id" drops lines whose id was seen before, lines without id are keyed
+    on their content; "content" only drops identical lines
+
+    :return {file name: {"lines": x, "duplicates": x}}
+    """
+    assert key in ["id", "content"], f"{key} must be 'id' or 'content'."
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    seen = KeySet(max_keys=max_keys, spill_directory=spill_directory)
+    report = {}
+
+    def write_batch(f_out, batch):
+        if key == "id":
+            keys = []
+            for raw in batch:
+                id = loads(raw).get("id")
+                keys.append(content_key(raw) if id is None else id_key(id))
+        else:
+            keys = [content_key(raw) for raw in batch]
+        new = seen.add_batch(keys)
+        f_out.write(b"".join(raw for raw, is_new in zip(batch, new) if is_new))
+        return len(batch) - sum(new)
+
+    try:
+        for jsonl_path in jsonl_paths:
+            name = Path(jsonl_path).name
+            lines = 0
+            duplicates = 0
+            with open_shard(jsonl_path) as f_in, open_shard(
+                output_directory / name, "wb"
+            ) as f_out:
+                batch = []
+                for raw in f_in:
+                    if not raw.strip():
+                        continue
+                    if not raw.endswith(b"\n"):
+                        raw += b"\n"
+                    batch.append(raw)
+                    lines += 1
+                    if len(batch) >= batch_size:
+                        duplicates += write_batch(f_out, batch)
+                        batch = []
+                if batch:
+                    duplicates += write_batch(f_out, batch)
+            report[name] = {"lines": lines, "duplicates": duplicates}
+    finally:
+        seen.close()
+
+    with (output_directory / "dedup_report.json").open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,53 @@
+import hashlib
+from keywords import count_tokens
+
+# keys added to processed lines by ProcessedLines(text_features=True)
+FEATURE_KEYS = ["token_count", "char_count", "text_hash"]
+
+
+def normalize(text: str) -> str:
+    """
+    lowercase the text and collapse whitespace
+    """
+    return " ".join(text.lower().split())
+
+
+def text_hash(text: str) -> str:
+    """
+    hash of the normalized text, equal for texts that only differ in case and spacing
+    """
+    return hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class TextFeatures:
+    """
+    token count, character count and normalized hash of texts
+
+    the counts are cached on the hash of the exact text, so repeated texts
+    ("[deleted]", "[removed]", bot messages, copypastas) are tokenized once.
+    the cache is cleared when it holds max_size texts
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        # {hash of the text: (token_count, normalized hash)}
+        self.cache = {}
+
+    def get(self, text: str) -> dict:
+        """
+        :return {"token_count": x, "char_count": x, "text_hash": x}, None values for no text
+        """
+        if not text:
+            return {"token_count": None, "char_count": None, "text_hash": None}
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        cached = self.cache.get(key)
+        if cached is None:
+            if len(self.cache) >= self.max_size:
+                self.cache = {}
+            cached = (count_tokens(text), text_hash(text))
+            self.cache[key] = cached
+        return {
+            "token_count": cached[0],
+            "char_count": len(text),
+            "text_hash": cached[1],
+        }
@@ -0,0 +1,147 @@
+import re
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# the tokens of nltk's wordpunct_tokenize
+WORDPUNCT = re.compile(r"\w+|[^\w\s]+")
+
+
+class KeywordMatcher:
+    """
+    check texts for any of a list of keywords or regular expressions
+
+    regular expressions are combined into one compiled pattern. long lists of
+    plain keywords are searched with an Aho-Corasick automaton when the
+    pyahocorasick package is installed, otherwise they are combined as well
+    """
+
+    def __init__(
+        self,
+        keywords: list = None,
+        regex: list = None,
+        ignore_case: bool = False,
+        automaton_size: int = 100,
+    ):
+        """
+        :param keywords
+        :type list of plain strings
+
+        :param regex
+        :type list of regular expressions, e.g. [r"[Cc]ommunity|[Cc]ommunities", r"[Gg]roups?"]
+
+        :param automaton_size
+        :type number of keywords from which the automaton is used
+        """
+        assert keywords or regex, "A KeywordMatcher needs keywords or regex."
+        self.ignore_case = ignore_case
+        self.automaton = None
+        patterns = list(regex) if regex else []
+        if keywords:
+            if (
+                ahocorasick is not None
+                and not regex
+                and len(keywords) >= automaton_size
+            ):
+                self.automaton = ahocorasick.Automaton()
+                for keyword in keywords:
+                    if ignore_case:
+                        keyword = keyword.lower()
+                    self.automaton.add_word(keyword, keyword)
+                self.automaton.make_automaton()
+            else:
+                # longer keywords first so the alternation prefers them
+                keywords = sorted(keywords, key=len, reverse=True)
+                patterns += [re.escape(keyword) for keyword in keywords]
+        self.pattern = None
+        if patterns:
+            self.pattern = re.compile(
+                "|".join(f"(?:{p})" for p in patterns),
+                re.IGNORECASE if ignore_case else 0,
+            )
+
+    def search(self, text: str) -> bool:
+        """
+        whether the text contains any of the keywords
+        """
+        if self.automaton is not None:
+            if self.ignore_case:
+                text = text.lower()
+            for _ in self.automaton.iter(text):
+                return True
+            return False
+        return self.pattern.search(text) is not None
+
+
+def count_tokens(text: str) -> int:
+    """
+    number of tokens of nltk's wordpunct_tokenize, without building the list
+    """
+    return sum(1 for _ in WORDPUNCT.finditer(text))
+
+
+def in_range(
+    text: str,
+    min_tokens: int = None,
+    max_tokens: int = None,
+    token_count: int = None,
+) -> bool:
+    """
+    whether the number of tokens of a text is within the limits,
+    a token_count that is already known is used instead of tokenizing
+    """
+    if token_count is None:
+        if min_tokens is None and max_tokens is None:
+            return True
+        # every whitespace separated word has at least one token
+        if max_tokens is None and len(text.split()) >= min_tokens:
+            return True
+        token_count = count_tokens(text)
+    if min_tokens is not None and token_count < min_tokens:
+        return False
+    if max_tokens is not None and token_count > max_tokens:
+        return False
+    return True
+
+
+class TextFilter:
+    """
+    which texts are kept by DataProcessor.export_corpus and export_top_terms
+
+    a text is kept if its author is not excluded, it contains one of the
+    keywords and its number of tokens is within the limits. the keywords are
+    searched first, so most texts are never tokenized, and processed lines
+    with a token_count (see ProcessedLines) are not tokenized at all
+    """
+
+    # keys of a line read by the filter besides the text
+    fields = ["author", "token_count"]
+
+    def __init__(
+        self,
+        matcher: KeywordMatcher = None,
+        min_tokens: int = None,
+        max_tokens: int = None,
+        exclude_authors: list = None,
+    ):
+        self.matcher = matcher
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.exclude_authors = set(exclude_authors) if exclude_authors else set()
+
+    def get_text(self, line: dict, text_key: str) -> str:
+        """
+        return the text of the line if it is kept, otherwise None
+        """
+        text = line.get(text_key)
+        if not text or line.get("author") in self.exclude_authors:
+            return None
+        if self.matcher is not None and not self.matcher.search(text):
+            return None
+        if not in_range(
+            text, self.min_tokens, self.max_tokens, token_count=line.get("token_count")
+        ):
+            return None
+        return text
@@ -0,0 +1,128 @@
+import json
+import mmap
+import shutil
+import numpy as np
+from array import array
+from pathlib import Path
+from functools import lru_cache
+from record_index import key_hash
+
+
+def write_table(output_path, items):
+    """
+    write the (key, value) pairs of an iterable into a table directory:
+    the entries as json lines (data.bin), the sorted hashes of the keys
+    (hashes.npy) and the byte offsets of their entries (offsets.npy)
+
+    the table is written next to the old one and replaces it when complete
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    hashes = array("Q")
+    offsets = array("q")
+    position = 0
+    with (tmp_path / "data.bin").open("wb") as f:
+        for key, value in items:
+            raw = (json.dumps([key, value], ensure_ascii=False) + "\n").encode("utf-8")
+            hashes.append(key_hash(key))
+            offsets.append(position)
+            f.write(raw)
+            position += len(raw)
+    hashes = np.frombuffer(hashes, dtype=np.uint64)
+    offsets = np.frombuffer(offsets, dtype=np.int64)
+    order = np.argsort(hashes, kind="stable")
+    np.save(tmp_path / "hashes.npy", hashes[order])
+    np.save(tmp_path / "offsets.npy", offsets[order])
+    with (tmp_path / "table.json").open("w", encoding="utf-8") as f:
+        json.dump({"size": len(hashes)}, f)
+
+    if output_path.exists():
+        shutil.rmtree(output_path)
+    tmp_path.rename(output_path)
+
+
+class DiskDict:
+    """
+    read-only {key: value} of a table directory written by write_table
+
+    the hashes and offsets are memory mapped and the entries are decoded when
+    they are looked up, so only the last cache_size lookups are held in memory
+    (least recently used first out) however large the table is
+    """
+
+    def __init__(self, path, cache_size: int = 100000, loads=json.loads):
+        self.path = Path(path)
+        with (self.path / "table.json").open("r", encoding="utf-8") as f:
+            self.size = json.load(f)["size"]
+        self.loads = loads
+        self.hashes = np.load(self.path / "hashes.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.data = None
+        if self.size:
+            with (self.path / "data.bin").open("rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.lookup = lru_cache(maxsize=cache_size)(self.find)
+
+    @staticmethod
+    def is_table(path) -> bool:
+        return Path(path).is_dir() and (Path(path) / "table.json").exists()
+
+    def read_entry(self, offset: int) -> list:
+        end = self.data.find(b"\n", offset)
+        return self.loads(self.data[offset:end])
+
+    def find(self, key) -> tuple:
+        """
+        return (True, value) if the key is in the table, otherwise (False, None)
+        """
+        if not self.size:
+            return False, None
+        h = np.uint64(key_hash(key))
+        i = np.searchsorted(self.hashes, h, side="left")
+        # keys whose hashes are equal by chance are told apart by the entries
+        while i < self.size and self.hashes[i] == h:
+            entry_key, value = self.read_entry(int(self.offsets[i]))
+            if entry_key == key:
+                return True, value
+            i += 1
+        return False, None
+
+    def get(self, key, default=None):
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def __getitem__(self, key):
+        found, value = self.lookup(key)
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.lookup(key)[0]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def items(self):
+        """
+        yield the (key, value) pairs in the order they were written
+        """
+        if not self.size:
+            return
+        with (self.path / "data.bin").open("rb") as f:
+            for raw in f:
+                key, value = self.loads(raw)
+                yield key, value
+
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
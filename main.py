@@ -1,8 +1,5 @@
-import jsonlines
-import json
-import os
-import glob
-from process_data import DataHandler, DataProcessor
+from process_data import DataProcessor
+from aggregate import AuthorDict, IdDict, PosterStats, ProcessedLines
 
 ### Settings
 
@@ -62,6 +59,15 @@ if __name__ == "__main__":
     #     custom_filename=None,
     # )
 
-    
-
+    # # all of the above from one scan of the submissions
+    # s = DataProcessor(
+    #     input_path="./example-data/submissions",
+    #     output_directory=OUTPUT_DIR,
+    #     mode="submissions",
+    # )
+    # s.aggregate(
+    #     [AuthorDict(), IdDict(), PosterStats(threshold=1), ProcessedLines()],
+    #     n_items=N_ITEMS,
+    #     time_period=TIME_PERIOD,
+    # )
 
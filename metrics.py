@@ -0,0 +1,203 @@
+import sys
+import json
+import time
+import datetime
+import threading
+from collections import Counter
+from aggregate import add_counts
+
+
+class SamplingProfiler:
+    """
+    sample the stack of a thread every interval seconds from a background thread
+
+    the innermost function of every sample is counted as self time, every
+    function on the stack as total time. hooks are called with every sampled
+    frame, e.g. to collect stacks for a flame graph
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: int = None, hooks=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.hooks = hooks or []
+        self.self_samples = Counter()
+        self.total_samples = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def location(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            top = sys._current_frames().get(self.thread_id)
+            if top is None:
+                continue
+            self.samples += 1
+            self.self_samples[self.location(top)] += 1
+            seen = set()
+            frame = top
+            while frame is not None:
+                location = self.location(frame)
+                if location not in seen:
+                    self.total_samples[location] += 1
+                    seen.add(location)
+                frame = frame.f_back
+            for hook in self.hooks:
+                hook(top)
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def report(self, n: int = 20) -> dict:
+        def top(counter):
+            return [
+                {"function": location, "samples": count, "share": count / self.samples}
+                for location, count in counter.most_common(n)
+            ]
+
+        return {
+            "interval": self.interval,
+            "samples": self.samples,
+            "self": top(self.self_samples) if self.samples else [],
+            "total": top(self.total_samples) if self.samples else [],
+        }
+
+
+class Timed:
+    """
+    a function whose calls and time are added to a stage of Metrics as
+    "{name}_calls" and "{name}_seconds", it can be sent to parallel workers
+    """
+
+    def __init__(self, function, metrics, stage: str, name: str):
+        self.function = function
+        self.metrics = metrics
+        self.stage = stage
+        self.calls = f"{name}_calls"
+        self.seconds = f"{name}_seconds"
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.function(*args, **kwargs)
+        finally:
+            counts = self.metrics.stages.setdefault(self.stage, {})
+            counts[self.calls] = counts.get(self.calls, 0) + 1
+            seconds = time.perf_counter() - start
+            counts[self.seconds] = counts.get(self.seconds, 0) + seconds
+
+
+class Metrics:
+    """
+    counters and timings of a run of DataHandler/DataProcessor
+
+    by shard: bytes_read, lines_decoded, decode_seconds and lines_yielded
+    (the lines left after the time period and n_items), by stage: the update
+    and finish time of every aggregator and the time and characters of the
+    writes to the output files. the counts of parallel workers are merged
+    with merge()
+
+    nothing is measured unless a DataHandler is created with metrics=True,
+    the instrumented code paths are only taken then
+    """
+
+    def __init__(self, profile_interval: float = None, profile_hooks: list = None):
+        """
+        :param profile_interval
+        :type seconds between the samples of the SamplingProfiler, None for no profile
+        """
+        self.profile_interval = profile_interval
+        self.profile_hooks = profile_hooks
+        self.reset()
+
+    def reset(self):
+        # {shard: {counter: value}}
+        self.shards = {}
+        # {stage: {counter: value}}
+        self.stages = {}
+        self.started = None
+        self.wall_seconds = None
+        self.profiler = None
+
+    def __getstate__(self):
+        # workers get the counters only, without the profiler thread
+        state = self.__dict__.copy()
+        state["profiler"] = None
+        return state
+
+    def add_shard(self, shard, **counts):
+        add_counts(self.shards.setdefault(str(shard), {}), counts)
+
+    def add(self, stage: str, **counts):
+        add_counts(self.stages.setdefault(stage, {}), counts)
+
+    def timed(self, function, stage: str, name: str):
+        return Timed(function, self, stage, name)
+
+    def get_state(self) -> dict:
+        return {"shards": self.shards, "stages": self.stages}
+
+    def merge(self, state: dict):
+        for shard, counts in state["shards"].items():
+            self.add_shard(shard, **counts)
+        for stage, counts in state["stages"].items():
+            self.add(stage, **counts)
+
+    def start(self):
+        self.reset()
+        self.started = datetime.datetime.now()
+        self.start_time = time.perf_counter()
+        if self.profile_interval:
+            self.profiler = SamplingProfiler(
+                self.profile_interval, hooks=self.profile_hooks
+            )
+            self.profiler.start()
+
+    def stop(self):
+        self.wall_seconds = time.perf_counter() - self.start_time
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def report(self, **info) -> dict:
+        """
+        the run report: totals, shards, stages and profile, with info added on top
+        """
+        shards = {}
+        totals = {}
+        for shard, counts in self.shards.items():
+            counts = dict(counts)
+            if "lines_yielded" in counts:
+                decoded = counts.get("lines_decoded", 0)
+                counts["lines_filtered"] = decoded - counts["lines_yielded"]
+            shards[shard] = counts
+            add_counts(totals, counts)
+        if self.wall_seconds and totals.get("lines_decoded"):
+            totals["lines_per_second"] = totals["lines_decoded"] / self.wall_seconds
+        started = self.started.strftime("%Y-%m-%d %H:%M:%S") if self.started else None
+        report = {
+            **info,
+            "started": started,
+            "wall_seconds": self.wall_seconds,
+            "totals": totals,
+            "stages": self.stages,
+            "shards": shards,
+        }
+        if self.profiler is not None:
+            report["profile"] = self.profiler.report()
+        return report
+
+    def write(self, path, **info):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**info), f, indent=2, default=str)
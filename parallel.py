@@ -0,0 +1,215 @@
+import os
+import multiprocessing
+from shard_index import ShardIndex
+from sinks import Sink
+from shard_io import get_compression
+
+
+def split_shard(jsonl_path, split_bytes: int, offset: int = 0) -> list:
+    """
+    return newline aligned (start, end) byte ranges of about split_bytes each
+    """
+    size = os.path.getsize(jsonl_path)
+    ranges = []
+    start = offset
+    with open(jsonl_path, "rb") as f:
+        while start < size:
+            end = start + split_bytes
+            if end >= size:
+                end = size
+            else:
+                # move the end to the start of the next line
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def plan_tasks(
+    jsonl_paths: list,
+    split_bytes: int,
+    start_epoch: int = None,
+    end_epoch: int = None,
+    n_items: int = None,
+    get_index=ShardIndex,
+) -> list:
+    """
+    return the tasks (task_id, jsonl_path, start, end, is_sorted) in data order
+
+    shards outside the time period are skipped,
+    shards are not split when only their first n_items are read or
+    when they are compressed
+    """
+    tasks = []
+    for jsonl_path in jsonl_paths:
+        offset = 0
+        is_sorted = False
+        if start_epoch is not None:
+            index = get_index(jsonl_path)
+            if not index.overlaps(start_epoch, end_epoch):
+                continue
+            offset = index.seek_offset(start_epoch)
+            is_sorted = index.is_sorted
+        if get_compression(jsonl_path) is not None:
+            ranges = [(offset, None)]
+        elif n_items:
+            ranges = [(offset, os.path.getsize(jsonl_path))]
+        else:
+            ranges = split_shard(jsonl_path, split_bytes, offset=offset)
+        for start, end in ranges:
+            tasks.append((len(tasks), str(jsonl_path), start, end, is_sorted))
+    return tasks
+
+
+# state of a worker process, set by init_worker
+worker = {}
+
+
+def init_worker(handler, aggregators, fields, start_epoch, end_epoch, n_items, router):
+    worker["handler"] = handler
+    worker["aggregators"] = aggregators
+    worker["sink"] = Sink(metrics=handler.metrics)
+    for aggregator in aggregators:
+        aggregator.sink = worker["sink"]
+    worker["fields"] = fields
+    worker["start_epoch"] = start_epoch
+    worker["end_epoch"] = end_epoch
+    worker["n_items"] = n_items
+    worker["router"] = router
+
+
+def run_task(task) -> dict:
+    """
+    run the aggregators over one byte range
+
+    :return {chunk index: [state of each aggregator]}, state of the metrics or None
+    """
+    task_id, jsonl_path, start, end, is_sorted = task
+    handler = worker["handler"]
+    aggregators = worker["aggregators"]
+    fields = worker["fields"]
+    start_epoch = worker["start_epoch"]
+    end_epoch = worker["end_epoch"]
+    n_items = worker["n_items"]
+    router = worker["router"]
+
+    for aggregator in aggregators:
+        aggregator.part_id = task_id
+    metrics = handler.metrics
+    if metrics is not None:
+        # only the counts of this task go back
+        metrics.reset()
+
+    states = {}
+    current = None
+    index = 0
+    counter = 0
+    for line in handler.read_shard(jsonl_path, offset=start, end=end):
+        utc = line.get("created_utc")
+        if start_epoch is not None:
+            if utc > end_epoch:
+                if is_sorted:
+                    break
+                continue
+            if utc <= start_epoch:
+                continue
+        line = {key: line.get(key) for key in fields}
+
+        # move on to the chunk of the line, late lines stay in the open chunk
+        index = max(index, router.route(utc))
+        if index != current:
+            if current is not None:
+                states[current] = [a.get_state() for a in aggregators]
+            for aggregator in aggregators:
+                aggregator.start(router.filenames[index])
+            current = index
+
+        for aggregator in aggregators:
+            aggregator.update(line)
+
+        counter += 1
+        if counter == n_items:
+            break
+
+    if current is not None:
+        states[current] = [a.get_state() for a in aggregators]
+    worker["sink"].close_all()
+    if metrics is None:
+        return states, None
+    metrics.add_shard(jsonl_path, lines_yielded=counter)
+    return states, metrics.get_state()
+
+
+def aggregate_parallel(
+    handler,
+    aggregators: list,
+    fields: list,
+    router,
+    workers: int,
+    split_bytes: int,
+    start_epoch: int = None,
+    end_epoch: int = None,
+    n_items: int = None,
+):
+    """
+    fan the shards (split into byte ranges) out to a process pool and merge
+    the partial results of the aggregators in data order
+
+    the workers route their lines with the router (see partition.py), the
+    chunks are then finished in time order, chunks without lines included
+    """
+    tasks = plan_tasks(
+        handler.jsonl_paths,
+        split_bytes,
+        start_epoch=start_epoch,
+        end_epoch=end_epoch,
+        n_items=n_items,
+        get_index=handler.get_shard_index,
+    )
+    initargs = (
+        handler,
+        aggregators,
+        fields,
+        start_epoch,
+        end_epoch,
+        n_items,
+        router,
+    )
+    # the results are merged as they come in (in task order) into the chunk
+    # loaded in the aggregators, the merged states of the other chunks are kept
+    # until it is their turn, so only one result is held at a time
+    saved = {}
+    loaded = None
+    with multiprocessing.Pool(
+        workers, initializer=init_worker, initargs=initargs
+    ) as pool:
+        results = handler.track(pool.imap(run_task, tasks), len(tasks))
+        for states, metrics_state in results:
+            if metrics_state is not None:
+                handler.metrics.merge(metrics_state)
+            for index, chunk_states in states.items():
+                if index != loaded:
+                    if loaded is not None:
+                        saved[loaded] = [a.get_state() for a in aggregators]
+                    for aggregator in aggregators:
+                        aggregator.start(router.filenames[index])
+                    if index in saved:
+                        for aggregator, state in zip(aggregators, saved.pop(index)):
+                            aggregator.merge(state)
+                    loaded = index
+                for aggregator, state in zip(aggregators, chunk_states):
+                    aggregator.merge(state)
+            del states
+    if loaded is not None:
+        saved[loaded] = [a.get_state() for a in aggregators]
+
+    # chunks are finished in time order, chunks without lines included
+    for index, filename in enumerate(router.filenames):
+        for aggregator in aggregators:
+            aggregator.start(filename)
+        for aggregator, state in zip(aggregators, saved.pop(index, [])):
+            aggregator.merge(state)
+        for aggregator in aggregators:
+            aggregator.finish(filename)
@@ -0,0 +1,88 @@
+import bisect
+
+
+class PartitionRouter:
+    """
+    route the lines of a chunked export to their time periods
+
+    the end epochs of the periods (see DataProcessor.get_periods) are computed
+    once, every line is then routed with a bisect over them. a line belongs to
+    the first period whose end is at or after its created_utc, the last period
+    takes everything after the last boundary.
+
+    subscribers are told when a period opens and closes, periods without any
+    lines are opened and closed as well so every period gets its output.
+    lines are expected in time order, a late line of a period that is already
+    closed goes into the open period
+    """
+
+    def __init__(self, filenames: list, boundaries: list = None):
+        """
+        :param filenames
+        :type the output name of every period, in time order
+
+        :param boundaries
+        :type the end epochs of all periods but the last one
+        """
+        self.filenames = filenames
+        self.boundaries = list(boundaries) if boundaries else []
+        assert (
+            len(self.boundaries) == len(filenames) - 1
+        ), "Every period but the last needs an end epoch."
+        # [(on_open, on_close)]
+        self.subscribers = []
+        # index of the open period
+        self.index = None
+
+    def subscribe(self, on_open=None, on_close=None):
+        """
+        call on_open(filename) when a period opens and on_close(filename) when it closes
+        """
+        self.subscribers.append((on_open, on_close))
+
+    def route(self, utc) -> int:
+        """
+        index of the period of an epoch
+        """
+        return bisect.bisect_left(self.boundaries, utc)
+
+    def open(self, index: int):
+        self.index = index
+        for on_open, _ in self.subscribers:
+            if on_open is not None:
+                on_open(self.filenames[index])
+
+    def close(self):
+        for _, on_close in self.subscribers:
+            if on_close is not None:
+                on_close(self.filenames[self.index])
+
+    def start(self):
+        """
+        open the first period
+        """
+        self.open(0)
+
+    def feed(self, utc) -> int:
+        """
+        move on to the period of a line, return its index
+        """
+        index = self.route(utc)
+        if index > self.index:
+            self.close()
+            # periods without lines
+            for empty in range(self.index + 1, index):
+                self.open(empty)
+                self.close()
+            self.open(index)
+        return self.index
+
+    def finish(self):
+        """
+        close the open period and the periods after it
+        """
+        self.close()
+        for empty in range(self.index + 1, len(self.filenames)):
+            self.open(empty)
+            self.close()
+        self.index = None
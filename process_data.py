@@ -1,12 +1,27 @@
-import nltk
 import json
-import jsonlines
 import glob
-import datetime
-import pandas as pd
-import numpy as np
-from tqdm import tqdm
+import time
 from pathlib import Path
+from shard_index import ShardIndex
+from sinks import Sink
+from dates import Dates
+from checkpoint import Checkpoint
+from partition import PartitionRouter
+from decoders import get_decoder, project
+from shard_io import find_shards, is_shard, open_shard
+from sql_store import SqlStore
+from metrics import Metrics
+from aggregate import (
+    AuthorDict,
+    IdDict,
+    AuthorSketch,
+    FrequentAuthors,
+    PosterStats,
+    CommenterStats,
+    ProcessedLines,
+    Corpus,
+)
+from keywords import KeywordMatcher, TextFilter
 
 
 class DataHandler:
@@ -17,84 +32,326 @@ class DataHandler:
     def __init__(
         self,
         input_path: str,
+        decoder: str = None,
+        record_index_path: str = None,
+        index_directory: str = None,
+        metrics: bool = False,
+        profile_interval: float = None,
+        progress: bool = True,
+        timezone: str = None,
     ):
+        """
+        :param input_path
+        :type a jsonl file, a directory of jsonl files, a column store directory
+        or a database (.sqlite or .db),
+        jsonl files can be compressed (.jsonl.gz or .jsonl.zst)
+
+        :param decoder
+        :type "orjson", "ujson", "json" or None for the fastest one installed
+
+        :param record_index_path
+        :type directory of the index of get_by_id, iter_by_author and iter_by_post,
+        None for ".record_index" next to the jsonl files
+
+        :param index_directory
+        :type directory of the time-range indexes of the shards (see shard_index.py),
+        None to write them next to the jsonl files
+
+        :param metrics
+        :type measure the bytes, lines and time of every shard and stage, the exports
+        write them to a run report next to the outputs, see metrics.py
+
+        :param profile_interval
+        :type seconds between the samples of the stack added to the run report,
+        None for no samples (implies metrics)
+
+        :param progress
+        :type show tqdm progress bars, without them tqdm is not imported
+
+        :param timezone
+        :type time zone of the time periods and of the dates of the exports,
+        None for the local time of the machine, "UTC" or an IANA name
+        """
         # running status
         self.running = False
 
         # path(s)
-        if Path(input_path).is_dir():
-            self.jsonl_paths = sorted(list(Path(input_path).glob("*.jsonl")))
-            assert (
-                len(self.jsonl_paths) > 0
-            ), f"{input_path} does not contain any jsonl files."
+        self.store = None
+        self.database = None
+        if SqlStore.is_database(input_path):
+            # database written by DataProcessor.export_database
+            self.database = SqlStore(input_path)
+            self.jsonl_paths = []
+        elif Path(input_path).is_dir():
+            self.jsonl_paths = find_shards(input_path)
+            if not self.jsonl_paths:
+                # numpy is only imported for column stores
+                from columnar import ColumnStore
+
+                assert ColumnStore.is_store(
+                    input_path
+                ), f"{input_path} does not contain any jsonl files."
+                # column store written by DataProcessor.export_columnar
+                self.store = ColumnStore(input_path)
         else:
-            assert (
-                Path(input_path).suffix == ".jsonl"
-            ), f"{input_path} is not a directory or jsonl file."
+            assert is_shard(input_path), f"{input_path} is not a directory or jsonl file."
             self.jsonl_paths = [input_path]
 
-    @staticmethod
-    def get_epoch(time) -> int:
-        if isinstance(time, str):
-            time = datetime.datetime.strptime(time, "%Y%m%d %H:%M:%S")
-        epoch = int(time.timestamp())
-        return epoch
+        # json decoder
+        self.loads = get_decoder(decoder)
+
+        # record index, loaded on the first lookup
+        self.record_index_path = record_index_path
+        self.record_index = None
+
+        # time-range indexes of the shards, {path: ShardIndex}
+        self.index_directory = index_directory
+        self.shard_indexes = {}
+
+        # metrics of the runs, None measures nothing
+        self.metrics = None
+        if metrics or profile_interval:
+            self.metrics = Metrics(profile_interval=profile_interval)
+
+        # progress bars
+        self.progress = progress
+
+        # dates of the epochs, see dates.py
+        self.dates = Dates(timezone)
+
+    def track(self, iterable, total: int = None):
+        """
+        wrap an iterable in a tqdm progress bar unless progress is off
+        """
+        if not self.progress:
+            return iterable
+        from tqdm import tqdm
+
+        return tqdm(iterable, total=total)
+
+    def get_epoch(self, time) -> int:
+        return self.dates.epoch(time)
+
+    def read_shard(self, jsonl_path, offset: int = 0, end: int = None):
+        """
+        yield each decoded line of one jsonl file, starting at a byte offset
+        and stopping before the line that starts at or after the end offset
+        """
+        if self.metrics is not None:
+            yield from self.read_shard_measured(jsonl_path, offset, end)
+            return
+        loads = self.loads
+        with open_shard(jsonl_path, offset=offset) as f:
+            if end is None:
+                for raw in f:
+                    if raw.strip():
+                        yield loads(raw)
+            else:
+                position = offset
+                while position < end:
+                    raw = f.readline()
+                    if not raw:
+                        break
+                    position += len(raw)
+                    if raw.strip():
+                        yield loads(raw)
+
+    def read_shard_measured(self, jsonl_path, offset: int = 0, end: int = None):
+        """
+        read_shard that adds the bytes, lines and decode time to the metrics
+        """
+        loads = self.loads
+        clock = time.perf_counter
+        position = offset
+        lines = 0
+        seconds = 0.0
+        try:
+            with open_shard(jsonl_path, offset=offset) as f:
+                while end is None or position < end:
+                    raw = f.readline()
+                    if not raw:
+                        break
+                    position += len(raw)
+                    if raw.strip():
+                        start = clock()
+                        line = loads(raw)
+                        seconds += clock() - start
+                        lines += 1
+                        yield line
+        finally:
+            self.metrics.add_shard(
+                jsonl_path,
+                bytes_read=position - offset,
+                lines_decoded=lines,
+                decode_seconds=seconds,
+            )
+
+    def get_shard_index(self, jsonl_path) -> ShardIndex:
+        """
+        the time-range index of a shard, kept in memory while the shard is unchanged
+        (also when it could not be written next to a read-only shard)
+        """
+        index = self.shard_indexes.get(str(jsonl_path))
+        if index is None or not index.is_current():
+            index = ShardIndex(
+                jsonl_path, loads=self.loads, index_directory=self.index_directory
+            )
+            self.shard_indexes[str(jsonl_path)] = index
+        return index
+
+    def get_shard_generator(
+        self,
+        jsonl_path,
+        n_items: int = None,
+        time_period_epochs: tuple = None,
+        fields: list = None,
+    ):
+        """
+        yield the lines of one jsonl file, see get_generator
+        """
+        if time_period_epochs:
+            start_epoch, end_epoch = time_period_epochs
+            # skip shards outside the time period
+            index = self.get_shard_index(jsonl_path)
+            if not index.overlaps(start_epoch, end_epoch):
+                return
+            # jump to the first line that can be in the time period
+            generator = self.read_shard(
+                jsonl_path, offset=index.seek_offset(start_epoch)
+            )
+            self.running = True
+            for line in generator:
+                utc = line.get("created_utc")
+                if utc > start_epoch and utc <= end_epoch:
+                    yield project(line, fields) if fields else line
+                if utc > end_epoch and index.is_sorted:
+                    self.running = False
+                    generator.close()
+                    break
+
+        elif n_items:
+            counter = 0
+            generator = self.read_shard(jsonl_path)
+            self.running = True
+            for line in generator:
+                yield project(line, fields) if fields else line
+                counter += 1
+                if counter == n_items:
+                    self.running = False
+                    generator.close()
+
+        else:
+            generator = self.read_shard(jsonl_path)
+            self.running = True
+            for line in generator:
+                try:
+                    yield project(line, fields) if fields else line
+                finally:
+                    self.running = False
 
     def get_generator(
         self,
         n_items: int = None,
         time_period: tuple = None,
+        fields: list = None,
     ):
         """
         :param time_period
         :type tuple of two strings in format "%Y%m%d %H:%M:%S" - e.g. ("20180317 01:23:45", "20190317 01:23:49")
 
+        :param fields
+        :type list of keys to keep in each line, None keeps all keys
+
         :return generator value - jsonline {}
         """
         if time_period:
-            start = time_period[0]
-            end = time_period[1]
-            start_epoch = self.get_epoch(start)
-            end_epoch = self.get_epoch(end)
-            counter = 0
-            for jsonl_path in self.jsonl_paths:
-                with jsonlines.open(jsonl_path) as reader:
-                    generator = reader.iter()
-                    self.running = True
-                    for line in generator:
-                        utc = line.get("created_utc")
-                        if utc > start_epoch and utc <= end_epoch:
-                            yield line
-                            counter += 1
-                        if utc > end_epoch:
-                            self.running = False
-                            generator.close()
+            time_period_epochs = (
+                self.get_epoch(time_period[0]),
+                self.get_epoch(time_period[1]),
+            )
+        else:
+            time_period_epochs = None
 
-        if n_items:
-            for jsonl_path in self.jsonl_paths:
-                counter = 0
-                with jsonlines.open(jsonl_path) as reader:
-                    generator = reader.iter()
-                    self.running = True
-                    for line in generator:
-                        yield line
-                        counter += 1
-                        if counter == n_items:
-                            self.running = False
-                            generator.close()
+        # column store
+        if self.store is not None:
+            self.running = True
+            yield from self.store.iter_records(
+                fields, time_period_epochs=time_period_epochs, n_items=n_items
+            )
+            self.running = False
+            return
+
+        # database
+        if self.database is not None:
+            self.running = True
+            yield from self.database.iter_records(
+                fields,
+                time_period_epochs=time_period_epochs,
+                # the time period wins like for jsonl files
+                n_items=None if time_period_epochs else n_items,
+                loads=self.loads,
+            )
+            self.running = False
+            return
+
+        for jsonl_path in self.jsonl_paths:
+            generator = self.get_shard_generator(
+                jsonl_path,
+                n_items=n_items,
+                time_period_epochs=time_period_epochs,
+                fields=fields,
+            )
+            if self.metrics is None:
+                yield from generator
+                continue
+            lines = 0
+            try:
+                for line in generator:
+                    lines += 1
+                    yield line
+            finally:
+                self.metrics.add_shard(jsonl_path, lines_yielded=lines)
+
+    def update_record_index(self):
+        """
+        index the lines added to the jsonl files since the last update by
+        id, post_id and author, see record_index.py
+        """
+        from record_index import RecordIndex
+
+        assert self.jsonl_paths, "The record index needs jsonl files."
+        if self.record_index is None:
+            directory = self.record_index_path
+            if directory is None:
+                directory = Path(self.jsonl_paths[0]).parent / ".record_index"
+            self.record_index = RecordIndex(directory, loads=self.loads)
+        self.record_index.update(self.jsonl_paths)
+        return self.record_index
+
+    def iter_by_key(self, key: str, value, fields: list = None):
+        if self.record_index is None:
+            self.update_record_index()
+        for line in self.record_index.iter_lines(key, value):
+            yield project(line, fields) if fields else line
+
+    def get_by_id(self, id: str, fields: list = None) -> dict:
+        """
+        return the line of a comment or post id (without prefix), None if there is none
+        """
+        return next(self.iter_by_key("id", id, fields), None)
 
-        else:
-            for jsonl_path in self.jsonl_paths:
-                counter = 0
-                with jsonlines.open(jsonl_path) as reader:
-                    generator = reader.iter()
-                    self.running = True
-                    for line in generator:
-                        try:
-                            yield line
-                            counter += 1
-                        finally:
-                            self.running = False
+    def iter_by_author(self, author: str, fields: list = None):
+        """
+        yield the lines of an author in data order
+        """
+        yield from self.iter_by_key("author", author, fields)
+
+    def iter_by_post(self, post_id: str, fields: list = None):
+        """
+        yield the lines of a post id (without prefix) in data order: the comments on
+        the post for comment files, the post itself for submission files
+        """
+        yield from self.iter_by_key("post_id", post_id, fields)
 
 
 class DataProcessor(DataHandler):
@@ -107,13 +364,30 @@ class DataProcessor(DataHandler):
         input_path: str,
         output_directory: str,
         mode: str,
+        decoder: str = None,
+        metrics: bool = False,
+        profile_interval: float = None,
+        progress: bool = True,
+        timezone: str = None,
+        index_directory: str = None,
     ):
         """
         :para mode
         :type either "comments" or "submissions"
+
+        with metrics every export writes a run report
+        "run_report_{mode}_{filename}.json" next to its outputs, see DataHandler
         """
         # inherit
-        super().__init__(input_path)
+        super().__init__(
+            input_path,
+            decoder=decoder,
+            metrics=metrics,
+            profile_interval=profile_interval,
+            progress=progress,
+            timezone=timezone,
+            index_directory=index_directory,
+        )
 
         # output directory
         assert (
@@ -140,6 +414,8 @@ class DataProcessor(DataHandler):
         return a list of tuples of time periods
         n can be integers or 0.5
         """
+        import pandas as pd
+
         begin_date = time_period[0]
         end_date = time_period[1]
         if isinstance(n, int):
@@ -171,6 +447,9 @@ class DataProcessor(DataHandler):
                 end_index = index[i + 1]
                 period = (months[start_index], months[end_index])
                 periods.append(period)
+        if not periods:
+            # the time period is shorter than one chunk
+            periods.append((begin_date, end_date))
         return periods
 
     @staticmethod
@@ -192,215 +471,468 @@ class DataProcessor(DataHandler):
             filename = f"{begin}_{end}"
             return filename
 
-    def export_processed_jsonl(
+    def aggregate(
         self,
-        author_dict_path: str,
-        id_dict_path: str,
+        aggregators: list,
         n_items: int = None,
         time_period: tuple = None,
         chunk: int = None,
-        default: bool = True,
-        custom_keys: list = None,
-        custom_filename: str = None,
+        workers: int = None,
+        split_bytes: int = 64 * 1024 * 1024,
+        checkpoint: str = None,
     ):
         """
-        export jsonl file with processed lines with chosen keys
-        always return default keys
-        optionally return the custom keys
+        feed several aggregators (see aggregate.py) from one scan of the data
+        and export all their results
+
+        Allowed combinations:
+        - n_items (time_period and chunk are None)
+        - time_period (n_items and chunk are None)
+        - time_period and chunk (n_items is None)
+        - all are None
+
+        :param workers
+        :type number of processes, None scans in this process
+
+        :param split_bytes
+        :type shards larger than this are split into newline aligned byte ranges (parallel only)
+
+        :param checkpoint
+        :type directory of the state of an incremental export (see checkpoint.py), each run
+        only reads the lines added since the last run and rewrites the outputs
         """
-        # generator
+        assert not (chunk and not time_period), "chunk needs a time_period."
+        sink = Sink(metrics=self.metrics)
+        for aggregator in aggregators:
+            aggregator.setup(self, sink)
+        if self.metrics is not None:
+            self.metrics.start()
+            self.time_aggregators(aggregators)
+
+        # keys read by the aggregators
+        fields = ["created_utc"]
+        for aggregator in aggregators:
+            fields += [key for key in aggregator.fields if key not in fields]
+
+        # output names
         if n_items:
             filename = f"{n_items}lines"
-            gen = self.get_generator(n_items=n_items)
         elif time_period:
-            if chunk:
-                gen = self.get_generator(time_period=time_period)
-            else:
-                filename = self.get_filenames(time_period)
-                gen = self.get_generator(time_period=time_period)
+            filename = self.get_filenames(time_period)
         else:
             filename = "all"
-            gen = self.get_generator()
 
-        # output path
+        # time chunks
         if chunk:
             time_periods = self.get_periods(time_period, chunk)
-            filenames = self.get_filenames(time_periods)
-            index = 0
+            router = PartitionRouter(
+                self.get_filenames(time_periods),
+                [self.get_epoch(p[1]) for p in time_periods[:-1]],
+            )
         else:
-            if custom_filename:
-                output_path = (
-                    Path(self.output_directory)
-                    / f"processed_{filename}_{custom_filename}.jsonl"
-                )
+            router = PartitionRouter([filename])
+
+        if checkpoint is not None:
+            assert not (
+                n_items or chunk or workers
+            ), "Incremental exports work without n_items, chunk and workers."
+            self.aggregate_incremental(
+                aggregators, fields, filename, time_period, checkpoint
+            )
+            sink.close_all()
+            self.write_report(
+                aggregators, filename, n_items, time_period, chunk, workers
+            )
+            return
+
+        if self.database is not None and all(a.sql for a in aggregators):
+            self.aggregate_sql(aggregators, router, n_items, time_period)
+            sink.close_all()
+            self.write_report(
+                aggregators, filename, n_items, time_period, chunk, workers
+            )
+            return
+
+        if workers:
+            assert self.jsonl_paths, "Only jsonl files are read by several processes."
+            if time_period:
+                start_epoch = self.get_epoch(time_period[0])
+                end_epoch = self.get_epoch(time_period[1])
             else:
-                output_path = (
-                    Path(self.output_directory) / f"processed_{filename}.jsonl"
-                )
+                start_epoch = None
+                end_epoch = None
+            from parallel import aggregate_parallel
+
+            aggregate_parallel(
+                self,
+                aggregators,
+                fields,
+                router,
+                workers=workers,
+                split_bytes=split_bytes,
+                start_epoch=start_epoch,
+                end_epoch=end_epoch,
+                n_items=n_items,
+            )
+            sink.close_all()
+            self.write_report(
+                aggregators, filename, n_items, time_period, chunk, workers
+            )
+            return
 
-        # load dicts
-        with open(author_dict_path, "r") as f1:
-            author_dict = json.load(f1)
-        with open(id_dict_path, "r") as f2:
-            id_dict = json.load(f2)
+        # generator
+        if n_items:
+            gen = self.get_generator(n_items=n_items, fields=fields)
+        elif time_period:
+            gen = self.get_generator(time_period=time_period, fields=fields)
+        else:
+            gen = self.get_generator(fields=fields)
+
+        for aggregator in aggregators:
+            router.subscribe(aggregator.start, aggregator.finish)
+        router.subscribe(on_close=lambda filename: sink.close_all())
+        router.start()
 
         # process
-        for line in tqdm(gen):
-            # output path for chunk
+        for line in self.track(gen):
             if chunk:
-                # time period
-                time_period = time_periods[index]
-                end_epoch = self.get_epoch(time_period[1])
+                # move on to the chunk of the line
+                router.feed(line.get("created_utc"))
+            for aggregator in aggregators:
+                aggregator.update(line)
 
-                # check path change condition
-                utc = line.get("created_utc")
-                if utc > end_epoch:
-                    # change output path
-                    index += 1
-
-                # output path
-                filename = filenames[index]
-                if custom_filename:
-                    output_path = (
-                        Path(self.output_directory)
-                        / f"processed_{filename}_{custom_filename}.jsonl"
-                    )
-                else:
-                    output_path = (
-                        Path(self.output_directory) / f"processed_{filename}.jsonl"
-                    )
-
-            newline = {}
-            if default:
-                # Post
-                if self.mode == "submissions":
-                    # id
-                    newline["post_id"] = line.get("id")
-                    # author
-                    author = line.get("author")
-                    newline["author"] = author
-                    # total_posts
-                    posts = author_dict.get(author)
-                    newline["total_posts"] = posts
-                    # title
-                    newline["title"] = line.get("title")
-                    # selftext
-                    newline["selftext"] = line.get("selftext")
-                    # flair
-                    newline["link_flair_text"] = line.get("link_flair_text")
-                    # removed_by_category
-                    newline["removed_by_category"] = line.get("removed_by_category")
-                    # utc
-                    utc = line.get("created_utc")
-                    newline["created_utc"] = utc
-                    # date
-                    if utc:
-                        newline["date"] = datetime.datetime.fromtimestamp(utc).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        )
-                    else:
-                        newline["date"] = None
-                    # month
-                    date = newline["date"]
-                    if date:
-                        month = date[:7]
-                        newline["month"] = month
-                    else:
-                        newline["month"] = None
-                    # score
-                    newline["score"] = line.get("score")
-
-                    # upvote_ratio
-                    newline["upvote_ratio"] = line.get("upvote_ratio")
-
-                    # num_comments
-                    newline["num_comments"] = line.get("num_comments")
-
-                    # num_crossposts
-                    newline["num_crossposts"] = line.get("num_crossposts")
-
-                    # subreddit_subscribers
-                    newline["subreddit_subscribers"] = line.get("subreddit_subscribers")
-
-                # Comment
-                if self.mode == "comments":
-                    # id
-                    post_id = line.get("link_id")
-                    if post_id:
-                        newline["post_id"] = post_id.split("_")[1]
-                    else:
-                        newline["post_id"] = None
-                    newline["comment_id"] = line.get("id")
-                    # author
-                    author = line.get("author")
-                    newline["author"] = author
-                    # total_comments
-                    coms = author_dict.get(author)
-                    newline["total_comments"] = coms
-                    # author_created_utc
-                    u = line.get("author_created_utc")
-                    newline["author_created_utc"] = u
-                    # author_created_date
-                    if u:
-                        newline[
-                            "author_created_date"
-                        ] = datetime.datetime.fromtimestamp(u).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        )
-                    else:
-                        newline["author_created_date"] = None
-                    # body
-                    newline["body"] = line.get("body")
-                    # flair & post title
-                    if post_id:
-                        i = newline["post_id"]
-                        flair = id_dict["flair"].get(i)
-                        title = id_dict["title"].get(i)
-                    newline["link_flair_text"] = flair
-                    newline["title"] = title
-                    # utc
+        router.finish()
+        self.write_report(aggregators, filename, n_items, time_period, chunk, workers)
+
+    def time_aggregators(self, aggregators: list):
+        """
+        add the time of the update and finish calls of the aggregators to the metrics
+        """
+        for aggregator in aggregators:
+            stage = type(aggregator).__name__
+            aggregator.update = self.metrics.timed(aggregator.update, stage, "update")
+            aggregator.finish = self.metrics.timed(aggregator.finish, stage, "finish")
+
+    def write_report(
+        self,
+        aggregators: list,
+        filename: str,
+        n_items: int = None,
+        time_period: tuple = None,
+        chunk: int = None,
+        workers: int = None,
+    ):
+        """
+        write the run report of the metrics next to the outputs, see metrics.py
+        """
+        if self.metrics is None:
+            return
+        self.metrics.stop()
+        for aggregator in aggregators:
+            # back to the methods of the class
+            del aggregator.update, aggregator.finish
+        self.metrics.write(
+            Path(self.output_directory) / f"run_report_{self.mode}_{filename}.json",
+            mode=self.mode,
+            aggregators=[type(aggregator).__name__ for aggregator in aggregators],
+            n_items=n_items,
+            time_period=time_period,
+            chunk=chunk,
+            workers=workers,
+        )
+
+    def aggregate_sql(
+        self,
+        aggregators: list,
+        router: PartitionRouter,
+        n_items: int = None,
+        time_period: tuple = None,
+    ):
+        """
+        answer every time chunk with queries of the database instead of a scan,
+        for aggregators with update_sql, see aggregate
+
+        the lines are chosen like the scan chooses them (the first n_items
+        lines of every shard or the time period) and split at the boundaries
+        of the router, so both split the time period the same way
+        """
+        if time_period and not n_items:
+            start_epoch = self.get_epoch(time_period[0])
+            end_epoch = self.get_epoch(time_period[1])
+        else:
+            start_epoch = None
+            end_epoch = None
+        edges = [start_epoch] + router.boundaries + [end_epoch]
+        for filename, start, end in zip(router.filenames, edges[:-1], edges[1:]):
+            for aggregator in aggregators:
+                aggregator.start(filename)
+                aggregator.update_sql(
+                    self.database, time_period_epochs=(start, end), n_items=n_items
+                )
+                aggregator.finish(filename)
+
+    def aggregate_incremental(
+        self,
+        aggregators: list,
+        fields: list,
+        filename: str,
+        time_period: tuple,
+        checkpoint: str,
+    ):
+        """
+        merge the state of the last run, feed the new lines and export, see aggregate
+        """
+        assert self.jsonl_paths, "Incremental exports read jsonl files."
+        for aggregator in aggregators:
+            assert (
+                aggregator.incremental
+            ), f"{type(aggregator).__name__} cannot be exported incrementally."
+        key = {
+            "mode": self.mode,
+            "filename": filename,
+            "aggregators": [type(aggregator).__name__ for aggregator in aggregators],
+            "fields": fields,
+        }
+        store = Checkpoint(checkpoint, key)
+        ranges = store.get_ranges(self.jsonl_paths)
+
+        for aggregator in aggregators:
+            aggregator.overwrite = True
+            aggregator.start(filename)
+        if store.states is not None:
+            for aggregator, state in zip(aggregators, store.states):
+                aggregator.merge(state)
+
+        if time_period:
+            start_epoch = self.get_epoch(time_period[0])
+            end_epoch = self.get_epoch(time_period[1])
+        for jsonl_path, start, end in self.track(ranges):
+            for line in self.read_shard(jsonl_path, offset=start, end=end):
+                if time_period:
                     utc = line.get("created_utc")
-                    newline["created_utc"] = utc
-                    # date
-                    if utc:
-                        newline["date"] = datetime.datetime.fromtimestamp(utc).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        )
-                    else:
-                        newline["date"] = None
-                    # month
-                    date = newline["date"]
-                    if date:
-                        month = date[:7]
-                        newline["month"] = month
-                    else:
-                        newline["month"] = None
-                    # score
-                    newline["score"] = line.get("score")
-                    # no_follow
-                    newline["no_follow"] = line.get("no_follow")
-                    # collapsed_reason_code
-                    newline["collapsed_reason_code"] = line.get("collapsed_reason_code")
-                    # controversiality
-                    newline["controversiality"] = line.get("controversiality")
-                    # banned_by
-                    newline["banned_by"] = line.get("banned_by")
-                    # is_submitter
-                    newline["is_submitter"] = line.get("is_submitter")
-            if custom_keys:
-                for key in custom_keys:
-                    newline[key] = line.get(key)
-
-            # export data
-            with output_path.open(mode="a+", encoding="utf-8") as f:
-                json_record = json.dumps(newline, ensure_ascii=False)
-                f.write(json_record + "\n")
+                    if utc <= start_epoch or utc > end_epoch:
+                        continue
+                line = project(line, fields)
+                for aggregator in aggregators:
+                    aggregator.update(line)
+
+        store.save(ranges, [aggregator.get_state() for aggregator in aggregators])
+        for aggregator in aggregators:
+            aggregator.finish(filename)
+
+    def export_columnar(
+        self,
+        n_items: int = None,
+        time_period: tuple = None,
+        columns: dict = None,
+        batch_size: int = 100000,
+        custom_filename: str = None,
+    ):
+        """
+        export raw or processed lines into a column store directory
+        that can be used as input_path, see columnar.py
+
+        :param columns
+        :type {column name: column type}, None uses DEFAULT_COLUMNS of the mode
+        """
+        from columnar import DEFAULT_COLUMNS, write_store
+
+        assert self.jsonl_paths, "A column store is written from jsonl files."
+        if columns is None:
+            columns = DEFAULT_COLUMNS[self.mode]
+
+        # the time period wins over n_items like in get_shard_generator
+        time_period_epochs = None
+        if time_period:
+            filename = self.get_filenames(time_period)
+            time_period_epochs = (
+                self.get_epoch(time_period[0]),
+                self.get_epoch(time_period[1]),
+            )
+        elif n_items:
+            filename = f"{n_items}lines"
+        else:
+            filename = "all"
+        if custom_filename:
+            filename = f"{filename}_{custom_filename}"
+        output_path = Path(self.output_directory) / f"columnar_{self.mode}_{filename}"
+
+        def lines():
+            for i, jsonl_path in enumerate(self.jsonl_paths):
+                gen = self.get_shard_generator(
+                    jsonl_path,
+                    n_items=n_items,
+                    time_period_epochs=time_period_epochs,
+                    fields=list(columns),
+                )
+                for line in gen:
+                    yield i, line
+
+        shard_names = [Path(p).name for p in self.jsonl_paths]
+        write_store(
+            self.track(lines()),
+            output_path,
+            columns,
+            batch_size=batch_size,
+            shard_names=shard_names,
+        )
+
+    def export_database(self, database_path: str = None) -> str:
+        """
+        ingest the raw or processed lines into a local SQLite database that can be
+        used as input_path or queried with SQL, see sql_store.py
+
+        running it again only adds the lines appended since the last run
+
+        :param database_path
+        :type .sqlite or .db file, None for "{mode}.sqlite" in the output directory
+        """
+        assert self.jsonl_paths, "A database is ingested from jsonl files."
+        if database_path is None:
+            database_path = Path(self.output_directory) / f"{self.mode}.sqlite"
+        # the month column in the time zone of the processor
+        store = SqlStore(database_path, timezone=self.dates.timezone or "local")
+        store.ingest(self.track(self.jsonl_paths), loads=self.loads)
+        store.close()
+        return str(database_path)
+
+    def export_deduplicated(
+        self,
+        key: str = "id",
+        max_keys: int = 2000000,
+        spill_directory: str = None,
+    ) -> dict:
+        """
+        export the jsonl files without duplicated lines into a "deduplicated_<mode>"
+        directory that can be used as input_path, duplicates across files are found too
+
+        :param key
+        :type "id" drops lines whose id was seen before, "content" only drops identical lines
+
+        :param max_keys
+        :type number of keys kept in memory before they are spilled to disk, see dedup.py
+
+        :return {file name: {"lines": x, "duplicates": x}}, also written to dedup_report.json
+        """
+        from dedup import deduplicate
+
+        assert self.jsonl_paths, "Duplicates are removed from jsonl files."
+        output_directory = Path(self.output_directory) / f"deduplicated_{self.mode}"
+        return deduplicate(
+            self.jsonl_paths,
+            output_directory,
+            loads=self.loads,
+            key=key,
+            max_keys=max_keys,
+            spill_directory=spill_directory,
+        )
+
+    def export_text_index(self, text_key: str = None, segment_docs: int = 200000):
+        """
+        build an inverted index of the body of comments, selftext of submissions
+        or text_key in a "text_index_<mode>" directory, open it with
+        text_index.TextIndex for phrase queries
+        """
+        from text_index import build_text_index
+
+        assert self.jsonl_paths, "The text index is built from jsonl files."
+        if text_key is None:
+            text_key = "body" if self.mode == "comments" else "selftext"
+        build_text_index(
+            self.jsonl_paths,
+            Path(self.output_directory) / f"text_index_{self.mode}",
+            text_key=text_key,
+            loads=self.loads,
+            segment_docs=segment_docs,
+            timezone=self.dates.timezone,
+        )
+
+    def get_columns(self, columns: list, time_period: tuple = None):
+        """
+        return the chosen columns of a column store input as a DataFrame
+        """
+        assert self.store is not None, "get_columns needs a column store as input."
+        if time_period:
+            time_period_epochs = (
+                self.get_epoch(time_period[0]),
+                self.get_epoch(time_period[1]),
+            )
+        else:
+            time_period_epochs = None
+        return self.store.to_pandas(columns, time_period_epochs=time_period_epochs)
+
+    @staticmethod
+    def load_dict(path) -> dict:
+        """
+        load a json dict, or open a table directory that is looked up from disk
+        (see kvstore.py)
+        """
+        if path is None:
+            return None
+        if Path(path).is_dir():
+            from kvstore import DiskDict
+
+            assert DiskDict.is_table(path), f"{path} is not a table directory."
+            return DiskDict(path)
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def export_processed_jsonl(
+        self,
+        author_dict_path: str = None,
+        id_dict_path: str = None,
+        n_items: int = None,
+        time_period: tuple = None,
+        chunk: int = None,
+        default: bool = True,
+        custom_keys: list = None,
+        custom_filename: str = None,
+        workers: int = None,
+        checkpoint: str = None,
+        text_features: bool = False,
+    ):
+        """
+        export jsonl file with processed lines with chosen keys
+        always return default keys
+        optionally return the custom keys
+        with text_features add "token_count", "char_count" and "text_hash" (see features.py),
+        so later length filters do not tokenize again
+
+        without author_dict_path the total posts/comments are counted in the same scan
+        id_dict_path is needed for comments, the dicts can be json files or tables
+        written with table=True, which keep the memory fixed for any number of posts
+        with a checkpoint directory only new lines are appended (needs author_dict_path)
+        chunks need author_dict_path too, the totals of the same scan would only
+        count each chunk
+        """
+        assert not (
+            chunk and default and author_dict_path is None
+        ), "Chunked processed lines need author_dict_path for the totals."
+        aggregator = ProcessedLines(
+            author_dict=self.load_dict(author_dict_path),
+            id_dict=self.load_dict(id_dict_path),
+            default=default,
+            custom_keys=custom_keys,
+            custom_filename=custom_filename,
+            text_features=text_features,
+        )
+        self.aggregate(
+            [aggregator],
+            n_items=n_items,
+            time_period=time_period,
+            chunk=chunk,
+            workers=workers,
+            checkpoint=checkpoint,
+        )
 
     def export_author_dict(
         self,
         n_items: int = None,
         time_period: tuple = None,
         chunk: int = None,
+        workers: int = None,
+        checkpoint: str = None,
+        table: bool = False,
     ):
         """
         export a dict: {author: total_post/comment_number}
@@ -410,171 +942,93 @@ class DataProcessor(DataHandler):
         - time_period (n_items and chunk are None)
         - time_period and chunk (n_items is None)
         - all are None
-        """
-        # generator
-        if n_items:
-            filename = f"{n_items}lines"
-            gen = self.get_generator(n_items=n_items)
-        elif time_period:
-            if chunk:
-                gen = self.get_generator(time_period=time_period)
-            else:
-                filename = self.get_filenames(time_period)
-                gen = self.get_generator(time_period=time_period)
-        else:
-            filename = "all"
-            gen = self.get_generator()
-
-        # if split into chunks
-        if chunk:
-            time_periods = self.get_periods(time_period, chunk)
-            filenames = self.get_filenames(time_periods)
-            author_dict = {}
-            index = 0
-            for line in tqdm(gen):
-                # time period
-                time_period = time_periods[index]
-                end_epoch = self.get_epoch(time_period[1])
-                # filename
-                filename = filenames[index]
 
-                # check export condition
-                utc = line.get("created_utc")
-                if utc > end_epoch:
-                    # sort dict by values
-                    author_dict = self.sort_dict(author_dict)
-                    # export dict
-                    output_path = (
-                        Path(self.output_directory)
-                        / f"author_dict_{self.mode}_{filename}.json"
-                    )
-                    with output_path.open(mode="a+", encoding="utf-8") as f:
-                        json_record = json.dumps(author_dict, ensure_ascii=False)
-                        f.write(json_record)
-                    # reset
-                    author_dict = {}
-                    index += 1
-
-                # generate content
-                author = line.get("author")
-                if author not in author_dict.keys():
-                    author_dict[author] = 1
-                else:
-                    author_dict[author] += 1
+        with a checkpoint directory the dict is updated with the lines added since
+        the last run, see DataProcessor.aggregate
 
-        else:
-            author_dict = {}
-            for line in tqdm(gen):
-                author = line.get("author")
-                if author not in author_dict.keys():
-                    author_dict[author] = 1
-                else:
-                    author_dict[author] += 1
-            author_dict = self.sort_dict(author_dict)
-            output_path = (
-                Path(self.output_directory) / f"author_dict_{self.mode}_{filename}.json"
-            )
-            with output_path.open(mode="a+", encoding="utf-8") as f:
-                json_record = json.dumps(author_dict, ensure_ascii=False)
-                f.write(json_record)
+        with table=True the dict is written as a table directory instead of a json
+        file, export_processed_jsonl and the stats then look authors up from disk
+        """
+        self.aggregate(
+            [AuthorDict(table=table)],
+            n_items=n_items,
+            time_period=time_period,
+            chunk=chunk,
+            workers=workers,
+            checkpoint=checkpoint,
+        )
 
     def export_id_dict(
         self,
         n_items: int = None,
         time_period: tuple = None,
         chunk: int = None,
+        workers: int = None,
+        checkpoint: str = None,
+        table: bool = False,
     ):
-        assert self.mode == "submissions", "This function only works with submissions."
-
-        # generator
-        if n_items:
-            filename = f"{n_items}lines"
-            gen = self.get_generator(n_items=n_items)
-        elif time_period:
-            if chunk:
-                gen = self.get_generator(time_period=time_period)
-            else:
-                filename = self.get_filenames(time_period)
-                gen = self.get_generator(time_period=time_period)
-        else:
-            filename = "all"
-            gen = self.get_generator()
-
-        # if split into chunks
-        if chunk:
-            time_periods = self.get_periods(time_period, chunk)
-            filenames = self.get_filenames(time_periods)
-            id_dict = {"flair": {}, "title": {}}
-            index = 0
-            for line in tqdm(gen):
-                # time period
-                time_period = time_periods[index]
-                end_epoch = self.get_epoch(time_period[1])
-                # filename
-                filename = filenames[index]
+        """
+        export a dict: {"flair": {post_id: flair}, "title": {post_id: title}}
 
-                # check export condition
-                utc = line.get("created_utc")
-                if utc > end_epoch:
-                    # export dict
-                    output_path = (
-                        Path(self.output_directory)
-                        / f"id_dict_{self.mode}_{filename}.json"
-                    )
-                    with output_path.open(mode="a+", encoding="utf-8") as f:
-                        json_record = json.dumps(id_dict, ensure_ascii=False)
-                        f.write(json_record)
-                    # reset
-                    id_dict = {"flair": {}, "title": {}}
-                    index += 1
-
-                # generate content
-                id = line.get("id")
-                flair = line.get("link_flair_text")
-                title = line.get("title")
-                if id:
-                    # flair
-                    if id not in id_dict["flair"].keys():
-                        id_dict["flair"][id] = flair
-                    else:
-                        raise Exception(
-                            f"Post with id '{id}' has appeared twice. There may be duplicated files."
-                        )
-                    # title
-                    if id not in id_dict["title"].keys():
-                        id_dict["title"][id] = title
-                    else:
-                        raise Exception(
-                            f"Post with id '{id}' has appeared twice. There may be duplicated files."
-                        )
+        with table=True it is written as a table directory instead of a json file,
+        export_processed_jsonl then looks the posts up from disk
+        """
+        assert self.mode == "submissions", "This function only works with submissions."
+        self.aggregate(
+            [IdDict(table=table)],
+            n_items=n_items,
+            time_period=time_period,
+            chunk=chunk,
+            workers=workers,
+            checkpoint=checkpoint,
+        )
 
-        else:
-            id_dict = {"flair": {}, "title": {}}
-            for line in tqdm(gen):
-                id = line.get("id")
-                flair = line.get("link_flair_text")
-                title = line.get("title")
-                if id:
-                    # flair
-                    if id not in id_dict["flair"].keys():
-                        id_dict["flair"][id] = flair
-                    else:
-                        raise Exception(
-                            f"Post with id '{id}' has appeared twice. There may be duplicated files."
-                        )
-                    # title
-                    if id not in id_dict["title"].keys():
-                        id_dict["title"][id] = title
-                    else:
-                        raise Exception(
-                            f"Post with id '{id}' has appeared twice. There may be duplicated files."
-                        )
-            output_path = (
-                Path(self.output_directory) / f"id_dict_{self.mode}_{filename}.json"
+    def export_frequent_authors(
+        self,
+        min_count: int = None,
+        top_n: int = None,
+        exact: bool = True,
+        n_items: int = None,
+        time_period: tuple = None,
+        chunk: int = None,
+        workers: int = None,
+        width: int = 2**21,
+        depth: int = 4,
+    ):
+        """
+        export a dict: {author: total_post/comment_number} of the authors with at
+        least min_count posts/comments and/or of the top_n authors, in fixed memory
+        instead of counting every author, see AuthorSketch
+
+        with exact=True a second scan counts only the candidates of the first,
+        otherwise the estimates of one scan are written (they can be too high).
+        with workers the second scan is always run: the candidates of the parts
+        can miss authors whose lines are spread over several parts
+        the dict can be the author_dict of export_poster_stats/export_commenter_stats
+        with minpost/mincom up to min_count
+
+        :param width, depth
+        :type size of the count-min sketch, width * depth * 4 bytes per time chunk
+        """
+        exact = exact or bool(workers)
+        sketch = AuthorSketch(
+            min_count=min_count, top_n=top_n, width=width, depth=depth, exact=exact
+        )
+        self.aggregate(
+            [sketch],
+            n_items=n_items,
+            time_period=time_period,
+            chunk=chunk,
+            workers=workers,
+        )
+        if exact:
+            self.aggregate(
+                [FrequentAuthors(sketch)],
+                n_items=n_items,
+                time_period=time_period,
+                chunk=chunk,
+                workers=workers,
             )
-            with output_path.open(mode="a+", encoding="utf-8") as f:
-                json_record = json.dumps(id_dict, ensure_ascii=False)
-                f.write(json_record)
 
     def export_poster_stats(
         self,
@@ -583,6 +1037,10 @@ class DataProcessor(DataHandler):
         n_items: int = None,
         time_period: tuple = None,
         custom_filename: str = None,
+        workers: int = None,
+        engine: str = "numpy",
+        batch_size: int = 65536,
+        checkpoint: str = None,
     ):
         """
         export author stats (from raw data) in a dict of dicts:
@@ -600,167 +1058,26 @@ class DataProcessor(DataHandler):
         "upvote_ratio": {highest: {postlink: max_ratio but not 1.0}, lowest: {postlink: min_ratio}},
         },
         {"author_2": {...}}
+
+        if author_dict_path is None, the posts are counted in the same scan,
+        engine is "numpy" or "pandas" (vectorized groupby over batches of batch_size lines)
         """
 
         assert self.mode == "submissions", "This function only works with submissions."
-
-        # generator
-        if n_items:
-            filename = f"{n_items}lines"
-            gen = self.get_generator(n_items=n_items)
-        elif time_period:
-            filename = self.get_filenames(time_period)
-            gen = self.get_generator(time_period=time_period)
-        else:
-            filename = "all"
-            gen = self.get_generator()
-
-        # output path
-        if custom_filename:
-            output_path = (
-                Path(self.output_directory)
-                / f"poster_stats_{filename}_(posts>={minpost})_{custom_filename}.json"
-            )
-        else:
-            output_path = (
-                Path(self.output_directory)
-                / f"poster_stats_{filename}_(posts>={minpost}).json"
-            )
-
-        # load dict
-        with open(author_dict_path, "r") as f:
-            author_dict = json.load(f)
-        if minpost > 1:
-            authors = [
-                author
-                for author in author_dict.keys()
-                if author_dict[author] >= minpost
-            ]
-        else:
-            authors = [author for author in author_dict.keys()]
-
-        # set up
-        result = {}
-        for author in authors:
-            result[author] = {
-                "author": author,
-                "active_period": {"start_date": 0, "end_date": 0},
-                "active_span": 0,
-                "flair_ratio": {"no_flair": 0},
-                "remove_ratio": {"exist": 0},
-                "total_posts": author_dict[author],
-                "total_score": 0,
-                "max_score": {},
-                "total_comments": 0,
-                "comment_ratio": {"no_flair": 0},
-                "max_comments": {},
-                "upvote_ratio": {"highest": {}, "lowest": {}},
-            }
-
-        # generate content
-
-        for line in tqdm(gen):
-            if line["author"] in authors:
-                author = line.get("author")
-                link = line.get("id")
-
-                # dates
-                utc = line.get("created_utc")
-                if utc:
-                    if result[author]["active_period"]["start_date"] == 0:
-                        result[author]["active_period"]["start_date"] = utc
-                        result[author]["active_period"]["end_date"] = utc
-                    else:
-                        result[author]["active_period"]["end_date"] = utc
-                else:
-                    pass
-
-                # flairs
-                flair = line.get("link_flair_text")
-                if flair:
-                    if flair not in result[author]["flair_ratio"].keys():
-                        result[author]["flair_ratio"][flair] = 1
-                    else:
-                        result[author]["flair_ratio"][flair] += 1
-                else:
-                    result[author]["flair_ratio"]["no_flair"] += 1
-
-                # removes
-                remove = line.get("removed_by_category")
-                if remove:
-                    if remove not in result[author]["remove_ratio"].keys():
-                        result[author]["remove_ratio"][remove] = 1
-                    else:
-                        result[author]["remove_ratio"][remove] += 1
-                else:
-                    result[author]["remove_ratio"]["exist"] += 1
-
-                # scores
-                score = line.get("score") - 1  # filter out the one self upvote
-                if score:
-                    result[author]["total_score"] += score
-                    if result[author]["max_score"] == {}:
-                        result[author]["max_score"][link] = score
-                    elif score > max(result[author]["max_score"].values()):
-                        result[author]["max_score"] = {}
-                        result[author]["max_score"][link] = score
-                else:
-                    pass
-
-                # comments
-                c = line.get("num_comments")
-                if c:
-                    result[author]["total_comments"] += c
-                    if result[author]["max_comments"] == {}:
-                        result[author]["max_comments"][link] = c
-                    elif c > max(result[author]["max_comments"].values()):
-                        result[author]["max_comments"] = {}
-                        result[author]["max_comments"][link] = c
-                    if flair:
-                        if flair not in result[author]["comment_ratio"].keys():
-                            result[author]["comment_ratio"][flair] = c
-                        else:
-                            result[author]["comment_ratio"][flair] += c
-                    else:
-                        result[author]["comment_ratio"]["no_flair"] += c
-                else:
-                    pass
-
-                # upvote ratio
-                r = line.get("upvote_ratio")
-                if r is not None and r != 1.0:
-                    if (
-                        result[author]["upvote_ratio"]["lowest"] == {}
-                        and result[author]["upvote_ratio"]["highest"] == {}
-                    ):
-                        result[author]["upvote_ratio"]["lowest"][link] = r
-                        result[author]["upvote_ratio"]["highest"][link] = r
-                    elif r <= min(result[author]["upvote_ratio"]["lowest"].values()):
-                        result[author]["upvote_ratio"]["lowest"] = {}
-                        result[author]["upvote_ratio"]["lowest"][link] = r
-                    elif r >= max(result[author]["upvote_ratio"]["highest"].values()):
-                        result[author]["upvote_ratio"]["highest"] = {}
-                        result[author]["upvote_ratio"]["highest"][link] = r
-                    else:
-                        pass
-                else:
-                    pass
-
-        # date convertions
-        for line in result.values():
-            start = line["active_period"]["start_date"]
-            end = line["active_period"]["end_date"]
-            line["active_span"] = str(datetime.timedelta(seconds=end - start))
-            line["active_period"]["start_date"] = datetime.datetime.fromtimestamp(
-                start
-            ).strftime("%Y-%m-%d %H:%M:%S")
-            line["active_period"]["end_date"] = datetime.datetime.fromtimestamp(
-                end
-            ).strftime("%Y-%m-%d %H:%M:%S")
-
-        with output_path.open(mode="a+", encoding="utf-8") as f:
-            json_record = json.dumps(result, ensure_ascii=False)
-            f.write(json_record)
+        aggregator = PosterStats(
+            minpost,
+            author_dict=self.load_dict(author_dict_path),
+            custom_filename=custom_filename,
+            batch_size=batch_size,
+            engine=engine,
+        )
+        self.aggregate(
+            [aggregator],
+            n_items=n_items,
+            time_period=time_period,
+            workers=workers,
+            checkpoint=checkpoint,
+        )
 
     def export_commenter_stats(
         self,
@@ -770,6 +1087,10 @@ class DataProcessor(DataHandler):
         time_period: tuple = None,
         chunk: int = None,
         custom_filename: str = None,
+        workers: int = None,
+        engine: str = "numpy",
+        batch_size: int = 65536,
+        checkpoint: str = None,
     ):
         """
         export author stats (from processed data) in a dict of dicts:
@@ -786,193 +1107,192 @@ class DataProcessor(DataHandler):
             "banned_by": [],
             "controversiality": 0,,
          {"author_2": {...}}
+
+        if author_dict_path is None, the comments are counted in the same scan,
+        engine is "numpy" or "pandas" (vectorized groupby over batches of batch_size lines)
         """
         assert self.mode == "comments", "This function only works with comments."
+        aggregator = CommenterStats(
+            mincom,
+            author_dict=self.load_dict(author_dict_path),
+            custom_filename=custom_filename,
+            batch_size=batch_size,
+            engine=engine,
+        )
+        self.aggregate(
+            [aggregator],
+            n_items=n_items,
+            time_period=time_period,
+            chunk=chunk,
+            workers=workers,
+            checkpoint=checkpoint,
+        )
+
+    @staticmethod
+    def get_text_filter(
+        keywords: list = None,
+        regex: list = None,
+        ignore_case: bool = False,
+        min_tokens: int = None,
+        max_tokens: int = None,
+        exclude_authors: list = None,
+    ) -> TextFilter:
+        """
+        return the TextFilter of export_corpus and export_top_terms,
+        exclude_authors None leaves out AutoModerator
+        """
+        matcher = None
+        if keywords or regex:
+            matcher = KeywordMatcher(
+                keywords=keywords, regex=regex, ignore_case=ignore_case
+            )
+        if exclude_authors is None:
+            exclude_authors = ["AutoModerator"]
+        return TextFilter(
+            matcher=matcher,
+            min_tokens=min_tokens,
+            max_tokens=max_tokens,
+            exclude_authors=exclude_authors,
+        )
+
+    def export_corpus(
+        self,
+        keywords: list = None,
+        regex: list = None,
+        ignore_case: bool = False,
+        min_tokens: int = None,
+        max_tokens: int = None,
+        exclude_authors: list = None,
+        max_lines: int = 20000,
+        text_key: str = None,
+        n_items: int = None,
+        time_period: tuple = None,
+        chunk: int = None,
+        custom_filename: str = None,
+        workers: int = None,
+    ):
+        """
+        export the texts (body of comments, selftext of submissions or text_key)
+        that contain at least one of the keywords or regex into txt files of
+        max_lines entries for AntConc: corpus_<mode>_<filename>_<number>.txt
+
+        :param regex
+        :type list of regular expressions, e.g. [r"[Cc]ommunity|[Cc]ommunities", r"[Gg]roups?"]
+
+        :param min_tokens, max_tokens
+        :type limits of the number of wordpunct tokens of a text, None is no limit
+
+        :param exclude_authors
+        :type authors whose texts are left out, None leaves out AutoModerator
+
+        without keywords and regex all texts within the limits are exported
+        """
+        aggregator = Corpus(
+            text_filter=self.get_text_filter(
+                keywords, regex, ignore_case, min_tokens, max_tokens, exclude_authors
+            ),
+            max_lines=max_lines,
+            text_key=text_key,
+            custom_filename=custom_filename,
+        )
+        self.aggregate(
+            [aggregator],
+            n_items=n_items,
+            time_period=time_period,
+            chunk=chunk,
+            workers=workers,
+        )
+
+    def export_top_terms(
+        self,
+        top_n: int = 5,
+        max_df=1.0,
+        min_df=1,
+        hashing: bool = False,
+        n_features: int = 2**20,
+        keywords: list = None,
+        regex: list = None,
+        ignore_case: bool = False,
+        min_tokens: int = None,
+        max_tokens: int = None,
+        exclude_authors: list = None,
+        text_key: str = None,
+        n_items: int = None,
+        time_period: tuple = None,
+        custom_filename: str = None,
+        batch_size: int = 10000,
+    ):
+        """
+        export the top_n tf-idf terms of every text chosen like in export_corpus
+        and of every month (the sum of the weights of its texts), see tfidf.py:
+        - top_terms_<mode>_<filename>.jsonl: {"id": x, "month": x, "terms": {term: weight}}
+        - top_terms_by_month_<mode>_<filename>.json: {month: {term: weight}}
+
+        the data is read twice, once for the document frequencies and once for the weights,
+        with hashing the vocabulary does not grow with the corpus
+        """
+        from tfidf import TfidfModel, iter_batches, add_group_sums
+
+        if text_key is None:
+            text_key = "body" if self.mode == "comments" else "selftext"
+        text_filter = self.get_text_filter(
+            keywords, regex, ignore_case, min_tokens, max_tokens, exclude_authors
+        )
+        fields = ["id", "comment_id", "post_id", "created_utc", text_key]
+        fields += TextFilter.fields
+
+        def texts():
+            # (id, month, text) of the chosen texts
+            if n_items:
+                gen = self.get_generator(n_items=n_items, fields=fields)
+            elif time_period:
+                gen = self.get_generator(time_period=time_period, fields=fields)
+            else:
+                gen = self.get_generator(fields=fields)
+            for line in gen:
+                text = text_filter.get_text(line, text_key)
+                if text is None:
+                    continue
+                id = line.get("id") or line.get("comment_id") or line.get("post_id")
+                yield id, self.dates.month(line.get("created_utc")), text
+
+        model = TfidfModel(
+            max_df=max_df,
+            min_df=min_df,
+            hashing=hashing,
+            n_features=n_features,
+            batch_size=batch_size,
+        )
+        model.fit(text for _, _, text in self.track(texts()))
 
-        # generator
         if n_items:
             filename = f"{n_items}lines"
-            gen = self.get_generator(n_items=n_items)
         elif time_period:
-            if chunk:
-                gen = self.get_generator(time_period=time_period)
-            else:
-                filename = self.get_filenames(time_period)
-                gen = self.get_generator(time_period=time_period)
+            filename = self.get_filenames(time_period)
         else:
             filename = "all"
-            gen = self.get_generator()
-
-        # output path
-        if chunk:
-            time_periods = self.get_periods(time_period, chunk)
-            filenames = self.get_filenames(time_periods)
-            index = 0
-        else:
-            if custom_filename:
-                output_path = (
-                    Path(self.output_directory)
-                    / f"commenter_stats_{filename}_(comments>={mincom})_{custom_filename}.json"
-                )
-            else:
-                output_path = (
-                    Path(self.output_directory)
-                    / f"commenter_stats_{filename}_(comments>={mincom}).json"
-                )
-
-        # loda dict
-        with open(author_dict_path, "r") as f:
-            author_dict = json.load(f)
-        if mincom > 1:
-            authors = [
-                author for author in author_dict.keys() if author_dict[author] >= mincom
-            ]
-        else:
-            authors = [author for author in author_dict.keys()]
-
-        # set up
-        result = {}
-        for author in authors:
-            result[author] = {
-                "author": author,
-                "author_created_date": 0,
-                "active_period": {"start_date": 0, "end_date": 0},
-                "active_span": 0,
-                "flair_ratio": {"no_flair": 0},
-                "total_comments": author_dict[author],
-                "total_comments_as_submitter": 0,
-                "total_score": 0,
-                "max_score": {},
-                "banned_by": [],
-                "controversiality": 0,
-            }
-        for line in tqdm(gen):
-            if line["author"] in authors:
-                author = line.get("author")
-                com_id = line.get("comment_id")
-
-                # author birth
-                b = line.get("author_created_utc")
-                if b:
-                    result[author][
-                        "author_created_date"
-                    ] = datetime.datetime.fromtimestamp(b).strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    pass
-
-                # dates
-                utc = line.get("created_utc")
-                if utc:
-                    if result[author]["active_period"]["start_date"] == 0:
-                        result[author]["active_period"]["start_date"] = utc
-                        result[author]["active_period"]["end_date"] = utc
-                    else:
-                        result[author]["active_period"]["end_date"] = utc
-                else:
-                    pass
-
-                # flairs
-                flair = line.get("link_flair_text")
-                if flair:
-                    if flair not in result[author]["flair_ratio"].keys():
-                        result[author]["flair_ratio"][flair] = 1
-                    else:
-                        result[author]["flair_ratio"][flair] += 1
-                else:
-                    result[author]["flair_ratio"]["no_flair"] += 1
-
-                # comments as submitter
-                s = line.get("is_submitter")
-                if s is True:
-                    result[author]["total_comments_as_submitter"] += 1
-                else:
-                    pass
-
-                # scores
-                score = line.get("score") - 1
-                if score:
-                    result[author]["total_score"] += score
-                    if result[author]["max_score"] == {}:
-                        result[author]["max_score"][com_id] = score
-                    elif score > max(result[author]["max_score"].values()):
-                        result[author]["max_score"] = {}
-                        result[author]["max_score"][com_id] = score
-                else:
-                    pass
-
-                # banning
-                ban = line.get("banned_by")
-                if ban:
-                    result[author]["banned_by"].append(ban)
-
-                # controversiality
-                c = line.get("controversiality")
-                if c != 0:
-                    result[author]["controversiality"] += c
-
-            if chunk:
-                # output path
-                time_period = time_periods[index]
-                end_epoch = self.get_epoch(time_period[1])
-                filename = filenames[index]
-                # export condition
-                if utc > end_epoch:
-                    # output path
-                    output_path = (
-                        Path(self.output_directory)
-                        / f"commenter_stats_{filename}_(comments>={mincom}).json"
-                    )
-                    # date conversions
-                    for line in result.values():
-                        start = line["active_period"]["start_date"]
-                        end = line["active_period"]["end_date"]
-                        line["active_span"] = str(
-                            datetime.timedelta(seconds=end - start)
-                        )
-                        line["active_period"][
-                            "start_date"
-                        ] = datetime.datetime.fromtimestamp(start).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        )
-                        line["active_period"][
-                            "end_date"
-                        ] = datetime.datetime.fromtimestamp(end).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        )
-                    # export data
-                    with output_path.open(mode="a+", encoding="utf-8") as f:
-                        json_record = json.dumps(result, ensure_ascii=False)
-                        f.write(json_record)
-                    # reset
-                    result = {}
-                    for author in authors:
-                        result[author] = {
-                            "author": author,
-                            "author_created_date": 0,
-                            "active_period": {"start_date": 0, "end_date": 0},
-                            "active_span": 0,
-                            "flair_ratio": {"no_flair": 0},
-                            "total_comments": author_dict[author],
-                            "total_comments_as_submitter": 0,
-                            "total_score": 0,
-                            "max_score": {},
-                            "banned_by": [],
-                            "controversiality": 0,
-                        }
-                    index += 1
-
-        # date convertions
-        for line in result.values():
-            start = line["active_period"]["start_date"]
-            end = line["active_period"]["end_date"]
-            line["active_span"] = str(datetime.timedelta(seconds=end - start))
-            line["active_period"]["start_date"] = datetime.datetime.fromtimestamp(
-                start
-            ).strftime("%Y-%m-%d %H:%M:%S")
-            line["active_period"]["end_date"] = datetime.datetime.fromtimestamp(
-                end
-            ).strftime("%Y-%m-%d %H:%M:%S")
-
-        with output_path.open(mode="a+", encoding="utf-8") as f:
-            json_record = json.dumps(result, ensure_ascii=False)
-            f.write(json_record)
+        if custom_filename:
+            filename = f"{filename}_{custom_filename}"
+        output_path = (
+            Path(self.output_directory) / f"top_terms_{self.mode}_{filename}.jsonl"
+        )
+        sink = Sink()
+        sink.open(output_path, mode="w")
+        # {month: sparse sum of the weights}
+        month_sums = {}
+        for batch in iter_batches(self.track(texts()), batch_size):
+            matrix = model.transform_batch([text for _, _, text in batch])
+            for (id, month, _), terms in zip(batch, model.top_terms(matrix, top_n)):
+                newline = {"id": id, "month": month, "terms": dict(terms)}
+                sink.write(output_path, json.dumps(newline, ensure_ascii=False) + "\n")
+            add_group_sums(month_sums, matrix, [month for _, month, _ in batch])
+        sink.close(output_path)
+
+        months = sorted(month_sums, key=str)
+        top = model.top_terms([month_sums[month] for month in months], top_n)
+        by_month = {str(month): dict(terms) for month, terms in zip(months, top)}
+        output_path = Path(self.output_directory) / (
+            f"top_terms_by_month_{self.mode}_{filename}.json"
+        )
+        with output_path.open(mode="w", encoding="utf-8") as f:
+            json.dump(by_month, f, ensure_ascii=False)
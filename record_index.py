@@ -0,0 +1,193 @@
+import json
+import shutil
+import hashlib
+import numpy as np
+from array import array
+from pathlib import Path
+from shard_io import get_compression, open_shard
+from checkpoint import complete_size, head_hash
+from decoders import get_keys
+
+# keys of the index
+RECORD_KEYS = ["id", "post_id", "author"]
+
+
+def key_hash(value) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def read_at(jsonl_path, offsets):
+    """
+    yield the raw lines that start at the sorted byte offsets of a jsonl file,
+    compressed files are read forward once
+    """
+    if get_compression(jsonl_path) is None:
+        with open_shard(jsonl_path) as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield f.readline()
+        return
+    if not len(offsets):
+        return
+    with open_shard(jsonl_path, offset=offsets[0]) as f:
+        position = offsets[0]
+        for offset in offsets:
+            if offset < position:
+                continue
+            f.read(offset - position)
+            raw = f.readline()
+            position = offset + len(raw)
+            yield raw
+
+
+class RecordIndex:
+    """
+    index of the byte offsets of the lines of jsonl files by id, post_id and author
+
+    the index is kept in a directory with one segment per shard and run:
+    sorted hashes of the keys and the byte offsets of their lines (.npy files).
+    update() only indexes the lines appended since the last update and new
+    shards, a shard that was rewritten is indexed again.
+    hashes that are equal by chance are told apart by checking the decoded lines
+    """
+
+    def __init__(self, directory, loads=json.loads):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.directory / "manifest.json"
+        self.loads = loads
+        # {shard path: {"offset": x, "hash": x, "size": x, "segments": [name, ...]}}
+        self.shards = {}
+        if self.manifest_path.exists():
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                self.shards = json.load(f)
+        self.segments = None
+        # shards of the lookups, all indexed shards if None
+        self.jsonl_paths = None
+
+    def save(self):
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.shards, f, indent=2)
+        tmp_path.replace(self.manifest_path)
+
+    def remove_segments(self, jsonl_path: str):
+        for name in self.shards[jsonl_path]["segments"]:
+            for key in RECORD_KEYS:
+                for kind in ["hashes", "offsets"]:
+                    path = self.directory / f"{name}.{key}.{kind}.npy"
+                    path.unlink(missing_ok=True)
+        del self.shards[jsonl_path]
+
+    def update(self, jsonl_paths: list):
+        """
+        index the lines of the jsonl files that are not indexed yet,
+        lookups are limited to these files
+        """
+        self.jsonl_paths = [str(Path(p).resolve()) for p in jsonl_paths]
+        for jsonl_path in self.jsonl_paths:
+            done = self.shards.get(jsonl_path)
+            size = Path(jsonl_path).stat().st_size
+            start = 0
+            if done is not None:
+                if get_compression(jsonl_path) is not None and size == done["size"]:
+                    continue
+                start = done["offset"]
+                if size < done["size"] or head_hash(jsonl_path, start) != done["hash"]:
+                    # rewritten
+                    self.remove_segments(jsonl_path)
+                    done = None
+                    start = 0
+            end = complete_size(jsonl_path)
+            if done is not None and end <= start:
+                continue
+            segments = done["segments"] if done is not None else []
+            shard_hash = hashlib.sha1(jsonl_path.encode("utf-8")).hexdigest()[:16]
+            name = f"{shard_hash}_{len(segments)}"
+            self.index_range(jsonl_path, start, end, name)
+            self.shards[jsonl_path] = {
+                "offset": end,
+                "hash": head_hash(jsonl_path, end),
+                "size": size,
+                "segments": segments + [name],
+            }
+            self.save()
+        self.segments = None
+
+    def index_range(self, jsonl_path: str, start: int, end: int, name: str):
+        hashes = {key: array("Q") for key in RECORD_KEYS}
+        offsets = {key: array("q") for key in RECORD_KEYS}
+        loads = self.loads
+        with open_shard(jsonl_path, offset=start) as f:
+            position = start
+            while position < end:
+                raw = f.readline()
+                if not raw:
+                    break
+                offset = position
+                position += len(raw)
+                if not raw.strip():
+                    continue
+                for key, value in get_keys(loads(raw)).items():
+                    if value is not None:
+                        hashes[key].append(key_hash(value))
+                        offsets[key].append(offset)
+        for key in RECORD_KEYS:
+            key_hashes = np.frombuffer(hashes[key], dtype=np.uint64)
+            key_offsets = np.frombuffer(offsets[key], dtype=np.int64)
+            order = np.argsort(key_hashes, kind="stable")
+            np.save(self.directory / f"{name}.{key}.hashes.npy", key_hashes[order])
+            np.save(self.directory / f"{name}.{key}.offsets.npy", key_offsets[order])
+
+    def load_segments(self):
+        # [(shard path, {key: (hashes, offsets)})]
+        self.segments = []
+        jsonl_paths = self.jsonl_paths or list(self.shards)
+        for jsonl_path in jsonl_paths:
+            for name in self.shards[jsonl_path]["segments"]:
+                arrays = {}
+                for key in RECORD_KEYS:
+                    arrays[key] = tuple(
+                        np.load(
+                            self.directory / f"{name}.{key}.{kind}.npy", mmap_mode="r"
+                        )
+                        for kind in ["hashes", "offsets"]
+                    )
+                self.segments.append((jsonl_path, arrays))
+
+    def lookup(self, key: str, value) -> list:
+        """
+        return (shard path, sorted byte offsets) of the lines that may have the value
+        """
+        assert key in RECORD_KEYS, f"{key} is not one of {RECORD_KEYS}."
+        if self.segments is None:
+            self.load_segments()
+        h = np.uint64(key_hash(value))
+        found = {}
+        for jsonl_path, arrays in self.segments:
+            hashes, offsets = arrays[key]
+            i = np.searchsorted(hashes, h, side="left")
+            j = np.searchsorted(hashes, h, side="right")
+            if j > i:
+                found.setdefault(jsonl_path, []).extend(offsets[i:j].tolist())
+        return [(jsonl_path, sorted(offsets)) for jsonl_path, offsets in found.items()]
+
+    def iter_lines(self, key: str, value):
+        """
+        yield the decoded lines whose key has the value, in data order
+        """
+        value = str(value)
+        for jsonl_path, offsets in self.lookup(key, value):
+            for raw in read_at(jsonl_path, offsets):
+                line = self.loads(raw)
+                if str(get_keys(line)[key]) == value:
+                    yield line
+
+    def clear(self):
+        shutil.rmtree(self.directory)
+        self.directory.mkdir(parents=True)
+        self.shards = {}
+        self.segments = None
+        self.jsonl_paths = None
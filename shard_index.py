@@ -0,0 +1,157 @@
+import json
+import bisect
+from pathlib import Path
+from shard_io import open_shard
+
+
+class ShardIndex:
+    """
+    sidecar index of a jsonl shard, stored next to it as "<shard>.idx"
+    or as "<shard name>.idx" in index_directory
+
+    keeps the min/max created_utc of the shard and a sparse table of
+    (created_utc, byte offset) pairs, one every `step` lines.
+    the offsets of compressed shards are offsets in the decompressed lines.
+    the index is rebuilt only when the size or mtime of the shard changes.
+    when the index cannot be written (e.g. a read-only directory of archived
+    dumps) it is only kept in memory.
+    """
+
+    def __init__(
+        self,
+        jsonl_path,
+        step: int = 1000,
+        loads=json.loads,
+        index_directory: str = None,
+    ):
+        """
+        :param loads
+        :type function that decodes a line, see decoders.py
+        """
+        self.jsonl_path = Path(jsonl_path)
+        if index_directory is None:
+            self.index_path = Path(f"{self.jsonl_path}.idx")
+        else:
+            self.index_path = Path(index_directory) / f"{self.jsonl_path.name}.idx"
+        self.step = step
+        self.loads = loads
+        self.saved = False
+
+        self.min_utc = None
+        self.max_utc = None
+        self.is_sorted = True
+        self.epochs = []
+        self.offsets = []
+
+        if not self.load():
+            self.build()
+            self.saved = self.save()
+        else:
+            self.saved = True
+
+    def _signature(self) -> dict:
+        stat = self.jsonl_path.stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def load(self) -> bool:
+        """
+        load the sidecar index, return False if it is missing or out of date
+        """
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (
+            index.get("signature") != self._signature()
+            or index.get("step") != self.step
+        ):
+            return False
+        self.signature = index["signature"]
+        self.min_utc = index["min_utc"]
+        self.max_utc = index["max_utc"]
+        self.is_sorted = index["is_sorted"]
+        self.epochs = index["epochs"]
+        self.offsets = index["offsets"]
+        return True
+
+    def build(self):
+        """
+        scan the shard once and collect time bounds and sparse offsets
+        """
+        self.signature = self._signature()
+        self.min_utc = None
+        self.max_utc = None
+        self.is_sorted = True
+        self.epochs = []
+        self.offsets = []
+
+        previous = None
+        offset = 0
+        n = 0
+        with open_shard(self.jsonl_path) as f:
+            for raw in f:
+                start = offset
+                offset += len(raw)
+                if not raw.strip():
+                    continue
+                utc = self.loads(raw).get("created_utc")
+                if utc is None:
+                    continue
+                if self.min_utc is None or utc < self.min_utc:
+                    self.min_utc = utc
+                if self.max_utc is None or utc > self.max_utc:
+                    self.max_utc = utc
+                if previous is not None and utc < previous:
+                    self.is_sorted = False
+                previous = utc
+                if n % self.step == 0:
+                    self.epochs.append(utc)
+                    self.offsets.append(start)
+                n += 1
+
+    def save(self) -> bool:
+        """
+        write the index, return False if it cannot be written
+        """
+        index = {
+            "signature": self.signature,
+            "step": self.step,
+            "min_utc": self.min_utc,
+            "max_utc": self.max_utc,
+            "is_sorted": self.is_sorted,
+            "epochs": self.epochs,
+            "offsets": self.offsets,
+        }
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.index_path.open("w", encoding="utf-8") as f:
+                json.dump(index, f)
+        except OSError:
+            return False
+        return True
+
+    def is_current(self) -> bool:
+        """
+        whether the shard is unchanged since the index was built
+        """
+        return self.signature == self._signature()
+
+    def overlaps(self, start_epoch: int, end_epoch: int) -> bool:
+        """
+        whether the shard may contain lines with start_epoch < created_utc <= end_epoch
+        """
+        if self.min_utc is None:
+            return False
+        return self.max_utc > start_epoch and self.min_utc <= end_epoch
+
+    def seek_offset(self, start_epoch: int) -> int:
+        """
+        byte offset from which all lines with created_utc > start_epoch follow
+        """
+        if not self.is_sorted or not self.epochs:
+            return 0
+        i = bisect.bisect_right(self.epochs, start_epoch) - 1
+        if i < 0:
+            return 0
+        return self.offsets[i]
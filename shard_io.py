@@ -0,0 +1,91 @@
+import io
+import gzip
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# file name endings of the jsonl shards and their compression
+SHARD_SUFFIXES = {".jsonl": None, ".jsonl.gz": "gzip", ".jsonl.zst": "zstd"}
+COMPRESSION_SUFFIXES = {
+    compression: suffix for suffix, compression in SHARD_SUFFIXES.items()
+}
+
+
+def get_compression(path) -> str:
+    """
+    return "gzip", "zstd" or None for a shard path
+    """
+    name = Path(path).name
+    for suffix, compression in SHARD_SUFFIXES.items():
+        if compression is not None and name.endswith(suffix):
+            return compression
+    return None
+
+
+def is_shard(path) -> bool:
+    return any(Path(path).name.endswith(suffix) for suffix in SHARD_SUFFIXES)
+
+
+def find_shards(directory) -> list:
+    """
+    return the sorted paths of the plain and compressed jsonl files in a directory
+    """
+    paths = []
+    for suffix in SHARD_SUFFIXES:
+        paths += Path(directory).glob(f"*{suffix}")
+    return sorted(paths)
+
+
+def open_shard(
+    path,
+    mode: str = "rb",
+    offset: int = 0,
+    buffer_size: int = 1024 * 1024,
+    level: int = None,
+):
+    """
+    open a plain or compressed jsonl file as a binary file
+
+    the offsets of compressed files are offsets in the decompressed lines,
+    the bytes before the offset are decompressed and skipped.
+    appending to a compressed file adds a new gzip member/zstd frame
+
+    :param mode
+    :type "rb", "wb" or "ab"
+
+    :param offset
+    :type byte offset to start reading from
+    """
+    assert mode in ["rb", "wb", "ab"], f"{mode} is not a shard mode."
+    compression = get_compression(path)
+    if compression is None:
+        f = open(path, mode, buffering=buffer_size)
+        if offset:
+            f.seek(offset)
+        return f
+
+    if compression == "gzip":
+        f = gzip.open(path, mode, compresslevel=6 if level is None else level)
+    else:
+        assert zstandard is not None, f"{path} needs the zstandard package."
+        raw = open(path, mode)
+        if mode == "rb":
+            f = zstandard.ZstdDecompressor().stream_reader(
+                raw, read_across_frames=True, closefd=True
+            )
+        else:
+            f = zstandard.ZstdCompressor(
+                level=3 if level is None else level
+            ).stream_writer(raw, closefd=True)
+    if mode != "rb":
+        return io.BufferedWriter(f, buffer_size)
+    f = io.BufferedReader(f, buffer_size)
+    while offset > 0:
+        skipped = len(f.read(min(offset, buffer_size)))
+        if not skipped:
+            break
+        offset -= skipped
+    return f
@@ -0,0 +1,82 @@
+import time
+from pathlib import Path
+
+
+class Sink:
+    """
+    buffered text output that keeps one open handle per output file
+
+    written text is collected in memory and handed to the file in large writes,
+    a file is flushed and closed with close() once nothing more goes into it
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = 1024 * 1024,
+        metrics=None,
+    ):
+        """
+        :param buffer_size
+        :type number of characters collected per file before writing them out
+
+        :param metrics
+        :type Metrics the time and characters of the writes are added to, see metrics.py
+        """
+        self.buffer_size = buffer_size
+        self.metrics = metrics
+        # {path: [file, buffered texts, buffered size]}
+        self.handles = {}
+
+    def open(self, path, mode: str = "a+"):
+        """
+        open a file, "a+" appends to existing outputs and "w" overwrites them
+        """
+        path = str(path)
+        if path not in self.handles:
+            f = Path(path).open(mode=mode, encoding="utf-8", buffering=self.buffer_size)
+            self.handles[path] = [f, [], 0]
+        return path
+
+    def write(self, path, text: str):
+        handle = self.handles.get(str(path))
+        if handle is None:
+            handle = self.handles[self.open(path)]
+        handle[1].append(text)
+        handle[2] += len(text)
+        if handle[2] >= self.buffer_size:
+            self.write_out(handle)
+
+    def write_out(self, handle):
+        text = "".join(handle[1])
+        if self.metrics is None:
+            handle[0].write(text)
+        else:
+            start = time.perf_counter()
+            handle[0].write(text)
+            self.metrics.add(
+                "write",
+                seconds=time.perf_counter() - start,
+                characters=len(text),
+                writes=1,
+            )
+        handle[1] = []
+        handle[2] = 0
+
+    def flush(self, path):
+        handle = self.handles.get(str(path))
+        if handle is not None and handle[1]:
+            self.write_out(handle)
+
+    def close(self, path):
+        handle = self.handles.get(str(path))
+        if handle is not None:
+            self.flush(path)
+            start = time.perf_counter()
+            handle[0].close()
+            if self.metrics is not None:
+                self.metrics.add("write", seconds=time.perf_counter() - start)
+            del self.handles[str(path)]
+
+    def close_all(self):
+        for path in list(self.handles):
+            self.close(path)
@@ -0,0 +1,78 @@
+import numpy as np
+from record_index import key_hash
+
+# odd multipliers of the multiply-shift hashes of the rows
+MULTIPLIERS = np.array(
+    [
+        0x9E3779B97F4A7C15,
+        0xC2B2AE3D27D4EB4F,
+        0x165667B19E3779F9,
+        0xD6E8FEB86659FD93,
+        0xFF51AFD7ED558CCD,
+        0xC4CEB9FE1A85EC53,
+        0x94D049BB133111EB,
+        0xBF58476D1CE4E5B9,
+    ],
+    dtype=np.uint64,
+)
+
+
+class CountMinSketch:
+    """
+    count-min sketch: estimated counts of keys in a fixed width x depth table
+
+    an estimate is never below the true count, and conservative updates keep it
+    close to it: only the counters that are below the new estimate of a key are
+    raised. sketches of parts of the data are merged by adding the tables
+    (the sums are still upper bounds)
+    """
+
+    def __init__(self, width: int = 2**21, depth: int = 4):
+        """
+        :param width
+        :type number of counters of a row, a power of two
+
+        :param depth
+        :type number of rows, up to 8
+        """
+        assert width & (width - 1) == 0, f"{width} is not a power of two."
+        assert 0 < depth <= len(MULTIPLIERS), f"depth must be 1 to {len(MULTIPLIERS)}."
+        self.width = width
+        self.depth = depth
+        self.shift = np.uint64(64 - width.bit_length() + 1)
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+        self.total = 0
+
+    def columns(self, keys: list):
+        """
+        the counter of each key in each row, shape (depth, len(keys))
+        """
+        hashes = np.fromiter((key_hash(key) for key in keys), np.uint64, len(keys))
+        with np.errstate(over="ignore"):
+            products = hashes[None, :] * MULTIPLIERS[: self.depth, None]
+        return (products >> self.shift).astype(np.int64)
+
+    def estimate(self, keys: list):
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        columns = self.columns(keys)
+        rows = np.arange(self.depth)[:, None]
+        return self.table[rows, columns].min(axis=0).astype(np.int64)
+
+    def add(self, keys: list, counts=None):
+        """
+        add counts (1 each by default) of distinct keys
+        """
+        if not len(keys):
+            return
+        counts = np.ones(len(keys), dtype=np.int64) if counts is None else counts
+        columns = self.columns(keys)
+        rows = np.broadcast_to(np.arange(self.depth)[:, None], columns.shape)
+        target = self.table[rows, columns].min(axis=0).astype(np.int64) + counts
+        target = np.broadcast_to(target.astype(np.uint32), columns.shape)
+        np.maximum.at(self.table, (rows, columns), target)
+        self.total += int(np.sum(counts))
+
+    def merge(self, other):
+        self.table += other.table
+        self.total += other.total
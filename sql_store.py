@@ -0,0 +1,229 @@
+import json
+import sqlite3
+from pathlib import Path
+from dates import Dates
+from shard_io import get_compression, open_shard
+from checkpoint import complete_size, head_hash
+from decoders import get_keys, project
+
+DATABASE_SUFFIXES = [".sqlite", ".db"]
+
+# indexed columns of the lines table besides the raw line
+COLUMNS = {
+    "id": "TEXT",
+    "post_id": "TEXT",
+    "author": "TEXT",
+    "created_utc": "INTEGER",
+    "month": "TEXT",
+    "link_flair_text": "TEXT",
+}
+INDEXES = ["created_utc", "author", "post_id", "link_flair_text"]
+
+
+class SqlStore:
+    """
+    local SQLite database of the lines of jsonl files
+
+    every line is kept as its raw json with the columns above, which are indexed,
+    so ad-hoc questions are answered with query() instead of a scan, e.g.
+    "SELECT month, link_flair_text, COUNT(*) FROM lines GROUP BY 1, 2".
+    json_extract(line, '$.key') reads any other key.
+
+    ingest() only adds the lines appended to the jsonl files since the last
+    ingest and new files, a file that was rewritten is ingested again.
+    a database can be the input of a DataHandler/DataProcessor like jsonl files,
+    the author and id dicts are then queried (author_counts, posts) and the other
+    exports read the lines with iter_records
+    """
+
+    def __init__(self, path, timezone: str = None):
+        """
+        :param timezone
+        :type time zone of the month column, "local", "UTC" or an IANA name,
+        None keeps the one of the database (local for a new one). the months
+        of the ingested lines are computed again if it changes
+        """
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path)
+        columns = ", ".join(f"{name} {type}" for name, type in COLUMNS.items())
+        self.connection.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS lines (shard TEXT, {columns}, line TEXT);
+            CREATE TABLE IF NOT EXISTS shards (
+                path TEXT PRIMARY KEY, offset INTEGER, hash TEXT, size INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        row = self.connection.execute(
+            "SELECT value FROM settings WHERE name = 'timezone'"
+        ).fetchone()
+        stored = row[0] if row else "local"
+        self.timezone = timezone or stored
+        self.dates = Dates(self.timezone)
+        if self.timezone != stored or row is None:
+            self.connection.create_function("local_month", 1, self.dates.month)
+            self.connection.execute("UPDATE lines SET month = local_month(created_utc)")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO settings VALUES ('timezone', ?)",
+                (self.timezone,),
+            )
+            self.connection.commit()
+
+    @staticmethod
+    def is_database(path) -> bool:
+        return Path(path).is_file() and Path(path).suffix in DATABASE_SUFFIXES
+
+    def create_indexes(self):
+        for name in INDEXES:
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS lines_{name} ON lines ({name})"
+            )
+        self.connection.commit()
+
+    def ingest(self, jsonl_paths: list, loads=json.loads, batch_size: int = 10000):
+        """
+        add the lines of the jsonl files that are not in the database yet
+        """
+        for jsonl_path in [str(Path(p).resolve()) for p in jsonl_paths]:
+            done = self.connection.execute(
+                "SELECT offset, hash, size FROM shards WHERE path = ?", (jsonl_path,)
+            ).fetchone()
+            size = Path(jsonl_path).stat().st_size
+            start = 0
+            if done is not None:
+                offset, hash, done_size = done
+                if get_compression(jsonl_path) is not None and size == done_size:
+                    continue
+                start = offset
+                if size < done_size or head_hash(jsonl_path, start) != hash:
+                    # rewritten
+                    self.connection.execute(
+                        "DELETE FROM lines WHERE shard = ?", (jsonl_path,)
+                    )
+                    start = 0
+            end = complete_size(jsonl_path)
+            if end > start:
+                self.ingest_range(jsonl_path, start, end, loads, batch_size)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO shards VALUES (?, ?, ?, ?)",
+                (jsonl_path, end, head_hash(jsonl_path, end), size),
+            )
+            self.connection.commit()
+        self.create_indexes()
+
+    def ingest_range(self, jsonl_path, start, end, loads, batch_size):
+        insert = (
+            f"INSERT INTO lines (shard, {', '.join(COLUMNS)}, line) "
+            f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})"
+        )
+        batch = []
+        with open_shard(jsonl_path, offset=start) as f:
+            position = start
+            while position < end:
+                raw = f.readline()
+                if not raw:
+                    break
+                position += len(raw)
+                if not raw.strip():
+                    continue
+                line = loads(raw)
+                keys = get_keys(line)
+                utc = line.get("created_utc")
+                batch.append(
+                    (
+                        jsonl_path,
+                        keys["id"],
+                        keys["post_id"],
+                        keys["author"],
+                        utc,
+                        self.dates.month(utc),
+                        line.get("link_flair_text"),
+                        raw.decode("utf-8").strip(),
+                    )
+                )
+                if len(batch) >= batch_size:
+                    self.connection.executemany(insert, batch)
+                    batch = []
+        if batch:
+            self.connection.executemany(insert, batch)
+
+    @staticmethod
+    def get_where(time_period_epochs: tuple = None, n_items: int = None) -> tuple:
+        """
+        return the where clause and parameters of the lines of a time period
+        (start, end] and/or the first n_items lines of every shard, like the
+        jsonl files are read. an end of the time period that is None is open
+        """
+        conditions = []
+        parameters = []
+        if n_items:
+            conditions.append(
+                "rowid IN (SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER "
+                "(PARTITION BY shard ORDER BY rowid) AS n FROM lines) WHERE n <= ?)"
+            )
+            parameters.append(n_items)
+        if time_period_epochs:
+            start_epoch, end_epoch = time_period_epochs
+            if start_epoch is not None:
+                conditions.append("created_utc > ?")
+                parameters.append(start_epoch)
+            if end_epoch is not None:
+                conditions.append("created_utc <= ?")
+                parameters.append(end_epoch)
+        if not conditions:
+            return "", ()
+        return "WHERE " + " AND ".join(conditions), tuple(parameters)
+
+    def query(self, sql: str, parameters: tuple = ()) -> list:
+        """
+        return the rows of a query as dicts
+        """
+        cursor = self.connection.execute(sql, parameters)
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def iter_records(
+        self,
+        fields: list = None,
+        time_period_epochs: tuple = None,
+        n_items: int = None,
+        loads=json.loads,
+    ):
+        """
+        yield the lines in the order they were ingested, see DataHandler.get_generator
+        """
+        where, parameters = self.get_where(time_period_epochs, n_items)
+        cursor = self.connection.execute(
+            f"SELECT line FROM lines {where} ORDER BY rowid", parameters
+        )
+        for (raw,) in cursor:
+            line = loads(raw)
+            yield project(line, fields) if fields else line
+
+    def author_counts(self, time_period_epochs: tuple = None, n_items: int = None):
+        """
+        {author: number of lines} in the order the authors first appear
+        """
+        where, parameters = self.get_where(time_period_epochs, n_items)
+        cursor = self.connection.execute(
+            f"SELECT author, COUNT(*) FROM lines {where} "
+            "GROUP BY author ORDER BY MIN(rowid)",
+            parameters,
+        )
+        return dict(cursor.fetchall())
+
+    def posts(self, time_period_epochs: tuple = None, n_items: int = None):
+        """
+        yield (id, flair, title) of the submissions in the order they were ingested
+        """
+        where, parameters = self.get_where(time_period_epochs, n_items)
+        yield from self.connection.execute(
+            "SELECT json_extract(line, '$.id'), link_flair_text, "
+            "json_extract(line, '$.title') "
+            f"FROM lines {where} ORDER BY rowid",
+            parameters,
+        )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,267 @@
+import json
+import datetime
+import numpy as np
+from pathlib import Path
+from shard_io import COMPRESSION_SUFFIXES, open_shard
+
+# words of the texts, drawn with a Zipf-like skew (the first ones are the most common)
+VOCABULARY = (
+    "the I to a and it of you is that in for this my but be have not with on "
+    "was so are they just like do can if what he at me we all your get or "
+    "would about people one there an think know them out when from up more "
+    "time no really because how good who now she some been make also community "
+    "want feel even much going other only then any see something work way "
+    "group friends thanks help everyone post here new thread reddit sub guys "
+    "members online support question advice anyone years day life same agree "
+    "communities groups together discussion comment mods rules love great "
+    "game team play music movie book school job money family home city world"
+).split()
+# link_flair_text with weights, None is the most common
+FLAIRS = [
+    (None, 0.40),
+    ("Discussion", 0.20),
+    ("Question", 0.15),
+    ("Meta", 0.08),
+    ("News", 0.07),
+    ("Humor", 0.05),
+    ("Support", 0.05),
+]
+REMOVED = [
+    (None, 0.85),
+    ("moderator", 0.08),
+    ("deleted", 0.05),
+    ("automod_filtered", 0.02),
+]
+# base of the post and comment ids, so they have the length of real ids
+POST_ID_BASE = 36**5
+COMMENT_ID_BASE = 36**6
+AUTHOR_YEARS = 8
+
+
+def to_base36(n: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    s = ""
+    while True:
+        n, r = divmod(n, 36)
+        s = digits[r] + s
+        if n == 0:
+            return s
+
+
+def choose(rng, weighted: list, n: int) -> list:
+    values = [value for value, _ in weighted]
+    weights = np.array([weight for _, weight in weighted])
+    return [values[i] for i in rng.choice(len(values), n, p=weights / weights.sum())]
+
+
+class SyntheticCorpus:
+    """
+    deterministic Pushshift-shaped submissions and comments for benchmarks
+
+    the lines have the keys the exports read, the authors and words follow
+    Zipf-like distributions, the flairs and removals are drawn with fixed
+    weights and created_utc increases across the lines and shards. every
+    shard is generated on its own from (seed, mode, shard), so millions of
+    lines are written in fixed memory and the same arguments give the same files
+
+    post i is created in the i-th of n_submissions equal slices of the time
+    period, so comments only reply to posts created before them
+    """
+
+    def __init__(
+        self,
+        n_submissions: int = 100000,
+        n_comments: int = 1000000,
+        n_authors: int = 50000,
+        start: str = "20220101 00:00:00",
+        end: str = "20221231 23:59:59",
+        subreddit: str = "synthetic",
+        seed: int = 0,
+        block_size: int = 10000,
+    ):
+        assert n_submissions > 0, "Comments need submissions to reply to."
+        self.n_submissions = n_submissions
+        self.n_comments = n_comments
+        self.n_authors = n_authors
+        self.start = self.get_epoch(start)
+        self.end = self.get_epoch(end)
+        self.subreddit = subreddit
+        self.seed = seed
+        self.block_size = block_size
+        ranks = np.arange(1, len(VOCABULARY) + 1)
+        self.word_weights = 1 / ranks / np.sum(1 / ranks)
+
+    @staticmethod
+    def get_epoch(time: str) -> int:
+        return int(datetime.datetime.strptime(time, "%Y%m%d %H:%M:%S").timestamp())
+
+    def get_rng(self, mode: str, shard: int, block: int):
+        return np.random.default_rng(
+            [self.seed, ["submissions", "comments"].index(mode), shard, block]
+        )
+
+    def get_authors(self, rng, n: int) -> tuple:
+        """
+        return the names and author_created_utc of n authors
+        """
+        ranks = np.minimum(rng.zipf(1.6, n), self.n_authors)
+        # a share of deleted accounts and bots, as in the dumps
+        kind = rng.random(n)
+        names = [
+            "[deleted]" if k < 0.04 else "AutoModerator" if k < 0.05 else f"user_{r}"
+            for r, k in zip(ranks.tolist(), kind.tolist())
+        ]
+        span = AUTHOR_YEARS * 365 * 86400
+        created = [
+            None if name == "[deleted]" else self.start - (r * 7919 * 86400) % span
+            for name, r in zip(names, ranks.tolist())
+        ]
+        return names, created
+
+    def get_texts(self, rng, n: int, mean_words: float) -> list:
+        lengths = np.maximum(rng.lognormal(np.log(mean_words), 0.9, n).astype(int), 1)
+        words = rng.choice(len(VOCABULARY), int(lengths.sum()), p=self.word_weights)
+        words = [VOCABULARY[i] for i in words.tolist()]
+        texts = []
+        position = 0
+        for length in lengths.tolist():
+            texts.append(" ".join(words[position : position + length]))
+            position += length
+        return texts
+
+    def get_times(self, rng, first: int, n: int, total: int) -> np.ndarray:
+        """
+        sorted created_utc of the lines first to first + n of total lines
+        """
+        span = self.end - self.start
+        lo = self.start + first * span // total
+        hi = self.start + (first + n) * span // total
+        return np.sort(rng.integers(lo, max(hi, lo + 1), n))
+
+    def get_blocks(self, total: int, shard: int, n_shards: int):
+        """
+        yield (block number, first line, number of lines) of a shard
+        """
+        first = shard * total // n_shards
+        last = (shard + 1) * total // n_shards
+        for block, begin in enumerate(range(first, last, self.block_size)):
+            yield block, begin, min(self.block_size, last - begin)
+
+    def post_time(self, i: int, u: float) -> int:
+        span = self.end - self.start
+        return self.start + int((i + u) * span / self.n_submissions)
+
+    def submissions(self, shard: int = 0, n_shards: int = 1):
+        """
+        yield the submissions of a shard
+        """
+        for block, first, n in self.get_blocks(self.n_submissions, shard, n_shards):
+            rng = self.get_rng("submissions", shard, block)
+            authors, author_created = self.get_authors(rng, n)
+            titles = self.get_texts(rng, n, 9)
+            selftexts = self.get_texts(rng, n, 60)
+            flairs = choose(rng, FLAIRS, n)
+            removed = choose(rng, REMOVED, n)
+            offsets = rng.random(n).tolist()
+            scores = rng.zipf(1.8, n).tolist()
+            ratios = np.round(rng.beta(8, 2, n), 2).tolist()
+            num_comments = rng.poisson(self.n_comments / self.n_submissions, n).tolist()
+            crossposts = rng.poisson(0.05, n).tolist()
+            for j in range(n):
+                i = first + j
+                yield {
+                    "id": to_base36(POST_ID_BASE + i),
+                    "author": authors[j],
+                    "author_created_utc": author_created[j],
+                    "title": titles[j],
+                    "selftext": "[removed]" if removed[j] else selftexts[j],
+                    "link_flair_text": flairs[j],
+                    "removed_by_category": removed[j],
+                    "created_utc": self.post_time(i, offsets[j]),
+                    "score": scores[j],
+                    "upvote_ratio": ratios[j],
+                    "num_comments": num_comments[j],
+                    "num_crossposts": crossposts[j],
+                    "subreddit": self.subreddit,
+                    "subreddit_subscribers": 50000 + i // 10,
+                }
+
+    def comments(self, shard: int = 0, n_shards: int = 1):
+        """
+        yield the comments of a shard
+        """
+        span = self.end - self.start
+        for block, first, n in self.get_blocks(self.n_comments, shard, n_shards):
+            rng = self.get_rng("comments", shard, block)
+            # after the first post
+            times = np.maximum(
+                self.get_times(rng, first, n, self.n_comments), self.post_time(1, 0)
+            )
+            authors, author_created = self.get_authors(rng, n)
+            bodies = self.get_texts(rng, n, 25)
+            # most comments are on recent posts
+            lags = rng.geometric(0.05, n)
+            replies = rng.random(n)
+            parent_lags = rng.geometric(0.2, n)
+            scores = (rng.zipf(2.0, n) - rng.binomial(1, 0.1, n) * 3).tolist()
+            controversial = rng.binomial(1, 0.03, n).tolist()
+            submitter = rng.binomial(1, 0.05, n).tolist()
+            removed = rng.random(n).tolist()
+            for j in range(n):
+                i = first + j
+                utc = int(times[j])
+                # the post slice before the comment
+                post = (utc - self.start) * self.n_submissions // span - 1
+                post = max(post - int(lags[j]) + 1, 0)
+                post_id = to_base36(POST_ID_BASE + post)
+                if replies[j] < 0.6 or i == 0:
+                    parent_id = f"t3_{post_id}"
+                else:
+                    parent = max(i - int(parent_lags[j]), 0)
+                    parent_id = f"t1_{to_base36(COMMENT_ID_BASE + parent)}"
+                yield {
+                    "id": to_base36(COMMENT_ID_BASE + i),
+                    "link_id": f"t3_{post_id}",
+                    "parent_id": parent_id,
+                    "author": authors[j],
+                    "author_created_utc": author_created[j],
+                    "body": "[removed]" if removed[j] < 0.03 else bodies[j],
+                    "created_utc": utc,
+                    "score": scores[j],
+                    "no_follow": scores[j] < 2,
+                    "collapsed_reason_code": "DELETED" if removed[j] < 0.01 else None,
+                    "controversiality": controversial[j],
+                    "banned_by": None,
+                    "is_submitter": bool(submitter[j]),
+                    "subreddit": self.subreddit,
+                }
+
+    def write(
+        self,
+        directory,
+        mode: str,
+        n_shards: int = 1,
+        compression: str = None,
+    ) -> list:
+        """
+        write the submissions or comments into n_shards jsonl files of a directory
+
+        :param compression
+        :type None, "gzip" or "zstd"
+
+        :return paths of the shards
+        """
+        assert mode in ["submissions", "comments"], f"{mode} is not a mode."
+        suffix = COMPRESSION_SUFFIXES[compression]
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        lines = self.submissions if mode == "submissions" else self.comments
+        paths = []
+        for shard in range(n_shards):
+            path = directory / f"{mode}_{shard:04d}{suffix}"
+            with open_shard(path, "wb") as f:
+                for line in lines(shard, n_shards):
+                    record = json.dumps(line, ensure_ascii=False) + "\n"
+                    f.write(record.encode("utf-8"))
+            paths.append(path)
+        return paths
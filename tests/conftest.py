@@ -0,0 +1,21 @@
+import sys
+import shutil
+from pathlib import Path
+import pytest
+
+# the modules live in the root of the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DATA = Path(__file__).resolve().parent / "data"
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory) -> Path:
+    """
+    a copy of the corpus in tests/data, the index files of the shards are
+    written next to them and must not end up in the repository
+    """
+    directory = tmp_path_factory.mktemp("corpus")
+    for name in ["submissions", "comments"]:
+        shutil.copytree(DATA / name, directory / name)
+    return directory
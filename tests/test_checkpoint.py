@@ -0,0 +1,66 @@
+import pytest
+from checkpoint import Checkpoint, complete_size
+from process_data import DataProcessor
+from shard_io import is_shard
+
+EXPORTS = [
+    ("export_author_dict", {}),
+    ("export_id_dict", {}),
+    ("export_poster_stats", {"author_dict_path": None, "minpost": 1}),
+]
+
+
+def export(input_path, output_directory, checkpoints=None) -> dict:
+    output_directory.mkdir(exist_ok=True)
+    processor = DataProcessor(
+        input_path, output_directory, "submissions", progress=False, timezone="UTC"
+    )
+    for method, kwargs in EXPORTS:
+        # one checkpoint directory per export
+        checkpoint = None if checkpoints is None else checkpoints / method
+        getattr(processor, method)(checkpoint=checkpoint, **kwargs)
+    return {
+        path.name: path.read_bytes() for path in sorted(output_directory.iterdir())
+    }
+
+
+def test_appended_lines_give_the_full_export(tmp_path, corpus):
+    paths = sorted(filter(is_shard, (corpus / "submissions").iterdir()))
+    lines = [path.read_bytes().splitlines(keepends=True) for path in paths]
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    checkpoints = tmp_path / "checkpoints"
+
+    # the first half of the first shard, the end of a line is still missing
+    first = shards / paths[0].name
+    first.write_bytes(b"".join(lines[0][:7]) + lines[0][7][:20])
+    assert complete_size(first) == len(b"".join(lines[0][:7]))
+    export(shards, tmp_path / "output", checkpoints)
+
+    # the rest of the first shard and a new shard
+    with first.open("ab") as f:
+        f.write(lines[0][7][20:] + b"".join(lines[0][8:]))
+    (shards / paths[1].name).write_bytes(b"".join(lines[1]))
+    incremental = export(shards, tmp_path / "output", checkpoints)
+
+    assert incremental == export(corpus / "submissions", tmp_path / "full")
+    # nothing new
+    assert export(shards, tmp_path / "output", checkpoints) == incremental
+
+
+def test_rewritten_shard_invalidates_the_manifest(tmp_path):
+    path = tmp_path / "shard.jsonl"
+    path.write_bytes(b'{"id": "a", "created_utc": 1}\n')
+    checkpoint = Checkpoint(tmp_path / "checkpoint", {"export": "test"})
+    ranges = checkpoint.get_ranges([path])
+    assert ranges == [(str(path), 0, path.stat().st_size)]
+    checkpoint.save(ranges, [{}])
+
+    checkpoint = Checkpoint(tmp_path / "checkpoint", {"export": "test"})
+    assert checkpoint.get_ranges([path]) == []
+    path.write_bytes(b'{"id": "b", "created_utc": 2}\n{"id": "c", "created_utc": 3}\n')
+    with pytest.raises(Exception, match="has changed"):
+        checkpoint.get_ranges([path])
+
+    with pytest.raises(Exception, match="another export"):
+        Checkpoint(tmp_path / "checkpoint", {"export": "other"})
@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+import pytest
+from benchmark import Benchmarks, imported_modules, wall_seconds
+
+CLI = str(Path(__file__).resolve().parent.parent / "cli.py")
+HEAVY = {"numpy", "pandas", "scipy", "nltk"}
+
+
+def startup(command: list) -> dict:
+    heavy = imported_modules(command)
+    return {
+        "interpreter_seconds": wall_seconds(["-c", "pass"], 3),
+        "seconds": wall_seconds(command, 3),
+        "heavy_modules": sorted(heavy & HEAVY),
+    }
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        ["--help"],
+        ["author-dict", "{corpus}/submissions", "{output}", "submissions"]
+        + ["--n-items", "10", "--quiet"],
+    ],
+    ids=["help", "author-dict"],
+)
+def test_startup_budget(tmp_path, corpus, arguments):
+    command = [CLI] + [
+        argument.format(corpus=corpus, output=tmp_path / "output")
+        for argument in arguments
+    ]
+    result = startup(command)
+    assert result["heavy_modules"] == []
+    assert Benchmarks.check_startup(result) == []
+
+
+def test_author_dict(tmp_path, corpus):
+    from cli import main
+
+    output = tmp_path / "output"
+    arguments = ["author-dict", str(corpus / "submissions"), str(output)]
+    assert main(arguments + ["submissions", "--n-items", "5", "--quiet"]) == 0
+    with (output / "author_dict_submissions_5lines.json").open("r") as f:
+        assert sum(json.load(f).values()) == 10
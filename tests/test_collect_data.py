@@ -0,0 +1,107 @@
+import json
+from types import SimpleNamespace
+from collect_data import ListClient, SliceCollector, get_comments_by_subreddit
+from shard_io import open_shard
+
+
+def make_items(utcs: list) -> list:
+    return [
+        {"id": f"t1_{i}", "created_utc": utc, "subreddit": "test"}
+        for i, utc in enumerate(utcs)
+    ]
+
+
+def read_ids_of(paths: list) -> list:
+    ids = []
+    for path in paths:
+        with open_shard(path) as f:
+            ids += [json.loads(record)["id"] for record in f]
+    return ids
+
+
+def read_ids(directory) -> list:
+    return read_ids_of(sorted(directory.glob("*.jsonl")))
+
+
+def get_collector(items: list, directory, **kwargs) -> SliceCollector:
+    return SliceCollector(
+        ListClient(items),
+        "comments",
+        "test",
+        directory,
+        workers=1,
+        min_interval=0,
+        **kwargs,
+    )
+
+
+def test_more_items_in_one_second_than_a_page(tmp_path):
+    # 25 items share one second, a page has 10
+    items = make_items([100] * 3 + [101] * 25 + [102] * 4)
+    n = get_collector(items, tmp_path, page_size=10).collect(50, 200)
+    ids = read_ids(tmp_path)
+    assert n == len(items)
+    assert sorted(ids) == sorted(item["id"] for item in items)
+    assert len(set(ids)) == len(ids)
+
+
+def test_resume_after_a_crash_before_the_checkpoint(tmp_path):
+    items = make_items([100, 101, 101, 102, 103, 103, 104])
+    collector = get_collector(items, tmp_path, page_size=3)
+    collector.collect(50, 200)
+
+    # the items of the first pages were written, but the cursor was not saved
+    with (tmp_path / "slices.json").open("r", encoding="utf-8") as f:
+        slices = json.load(f)
+    for state in slices.values():
+        state["cursor"] = state["after"]
+        state["done"] = False
+    with (tmp_path / "slices.json").open("w", encoding="utf-8") as f:
+        json.dump(slices, f)
+    shards = sorted(tmp_path.glob("*.jsonl"))
+    with open_shard(shards[0]) as f:
+        head = f.readlines()[:4]
+    for path in shards:
+        path.unlink()
+    with open_shard(shards[0], "wb") as f:
+        f.writelines(head)
+
+    n = get_collector(items, tmp_path, page_size=3).collect(50, 200)
+    ids = read_ids(tmp_path)
+    assert n == len(items) - 4
+    assert sorted(ids) == sorted(item["id"] for item in items)
+
+
+class SearchApi:
+    """
+    stand-in for the psaw api, items have their dict in d_
+    """
+
+    def __init__(self, items: list):
+        self.items = items
+
+    def search_comments(self, subreddit, sort, after, metadata):
+        items = [item for item in self.items if item["created_utc"] > after]
+        return (SimpleNamespace(d_=item) for item in items)
+
+
+def test_search_shards_rotate_at_max_lines(tmp_path):
+    items = make_items(list(range(100, 125)))
+    last_epoch = get_comments_by_subreddit(
+        SearchApi(items), 99, "test", tmp_path, compression="gzip", max_lines=10
+    )
+    assert last_epoch == 124
+    shards = sorted(tmp_path.glob("test_comments_*.jsonl.gz"))
+    sizes = []
+    for path in shards:
+        with open_shard(path) as f:
+            sizes.append(len(f.readlines()))
+    assert sizes == [10, 10, 5]
+    assert sorted(read_ids_of(shards)) == sorted(item["id"] for item in items)
+
+    # a later run starts a new shard
+    assert get_comments_by_subreddit(SearchApi(items), 124, "test", tmp_path) == 124
+    assert get_comments_by_subreddit(
+        SearchApi(items), 120, "test", tmp_path, compression="gzip", max_lines=10
+    ) == 124
+    assert len(list(tmp_path.glob("test_comments_*.jsonl.gz"))) == 4
@@ -0,0 +1,59 @@
+import pytest
+from process_data import DataHandler, DataProcessor
+
+PERIOD = ("20220115 12:00:00", "20220520 00:00:00")
+FIELDS = ["id", "created_utc"]
+
+
+@pytest.fixture(scope="module")
+def inputs(tmp_path_factory, corpus) -> dict:
+    """
+    the submissions as jsonl files, column store and database
+    """
+    directory = tmp_path_factory.mktemp("columnar")
+    processor = DataProcessor(
+        corpus / "submissions", directory, "submissions", progress=False, timezone="UTC"
+    )
+    processor.export_columnar()
+    database = processor.export_database(directory / "submissions.sqlite")
+    return {
+        "jsonl": corpus / "submissions",
+        "columnar": directory / "columnar_submissions_all",
+        "database": database,
+    }
+
+
+def read(input_path, **kwargs) -> list:
+    handler = DataHandler(input_path, progress=False, timezone="UTC")
+    return [line["id"] for line in handler.get_generator(fields=FIELDS, **kwargs)]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"n_items": 5},
+        {"time_period": PERIOD},
+        {"n_items": 5, "time_period": PERIOD},
+    ],
+    ids=["n_items", "time_period", "both"],
+)
+@pytest.mark.parametrize("backend", ["columnar", "database"])
+def test_same_lines_as_the_jsonl_files(inputs, backend, kwargs):
+    expected = read(inputs["jsonl"], **kwargs)
+    assert expected
+    assert read(inputs[backend], **kwargs) == expected
+
+
+def test_time_period_wins_over_n_items(inputs):
+    assert read(inputs["jsonl"], n_items=5, time_period=PERIOD) == read(
+        inputs["jsonl"], time_period=PERIOD
+    )
+
+
+def test_export_with_n_items_and_time_period(tmp_path, corpus, inputs):
+    processor = DataProcessor(
+        corpus / "submissions", tmp_path, "submissions", progress=False, timezone="UTC"
+    )
+    processor.export_columnar(n_items=5, time_period=PERIOD)
+    (path,) = tmp_path.glob("columnar_submissions_*")
+    assert read(path) == read(inputs["jsonl"], time_period=PERIOD)
@@ -0,0 +1,81 @@
+import time
+import datetime
+import pytest
+from dates import Dates
+
+# around the daylight saving changes of 2022 in New York and Berlin
+RANGES = [
+    (1647154800 - 2 * 86400, 1647154800 + 2 * 86400),
+    (1667714400 - 2 * 86400, 1667714400 + 2 * 86400),
+    (1648342800 - 86400, 1648342800 + 86400),
+    (1667091600 - 86400, 1667091600 + 86400),
+]
+
+
+def get_epochs() -> list:
+    epochs = []
+    for start, end in RANGES:
+        epochs += list(range(start, end, 599))
+    # the seconds around a change
+    for change in [1647154800, 1667714400, 1648342800, 1667091600]:
+        epochs += list(range(change - 3, change + 3))
+    return epochs + [1, 86399, 951782400, 4102444799]
+
+
+@pytest.mark.parametrize(
+    "timezone", ["UTC", "America/New_York", "Europe/Berlin", "Asia/Kolkata"]
+)
+def test_same_as_datetime(timezone):
+    from zoneinfo import ZoneInfo
+
+    dates = Dates(timezone)
+    tz = ZoneInfo(timezone)
+    for utc in get_epochs():
+        expected = datetime.datetime.fromtimestamp(utc, tz)
+        assert dates.date(utc) == expected.strftime("%Y-%m-%d %H:%M:%S")
+        assert dates.day(utc) == expected.strftime("%Y-%m-%d")
+        assert dates.month(utc) == expected.strftime("%Y-%m")
+        assert dates.hour(utc) == expected.strftime("%Y-%m-%d %H")
+        assert dates.local(utc) - utc == expected.utcoffset().total_seconds()
+
+
+def test_local_time_of_the_machine():
+    dates = Dates()
+    for utc in get_epochs():
+        expected = datetime.datetime.fromtimestamp(utc)
+        assert dates.date(utc) == expected.strftime("%Y-%m-%d %H:%M:%S")
+
+
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset")
+def test_local_time_across_a_change(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        test_local_time_of_the_machine()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_empty_epochs():
+    dates = Dates("UTC")
+    assert dates.date(None) is None
+    assert dates.month(0) is None
+    assert dates.day(None) is None
+
+
+@pytest.mark.parametrize("timezone", ["UTC", "America/New_York", "Asia/Kolkata"])
+def test_epoch(timezone):
+    from zoneinfo import ZoneInfo
+
+    dates = Dates(timezone)
+    expected = datetime.datetime(2022, 3, 13, 12, 30, tzinfo=ZoneInfo(timezone))
+    assert dates.epoch("20220313 12:30:00") == int(expected.timestamp())
+    assert dates.epoch(datetime.datetime(2022, 3, 13, 12, 30)) == int(
+        expected.timestamp()
+    )
+    # aware datetimes keep their time zone
+    aware = datetime.datetime(2022, 3, 13, 12, 30, tzinfo=datetime.timezone.utc)
+    assert dates.epoch(aware) == int(aware.timestamp())
+    # round trip through the dates of the time zone
+    assert dates.date(dates.epoch("20221106 01:59:59")) == "2022-11-06 01:59:59"
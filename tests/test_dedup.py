@@ -0,0 +1,73 @@
+import json
+import pytest
+from dedup import KeySet, deduplicate, id_key
+from shard_io import open_shard
+
+
+def write_shard(path, lines: list):
+    with open_shard(path, "wb") as f:
+        for line in lines:
+            f.write((json.dumps(line) + "\n").encode("utf-8"))
+
+
+def read_ids(path) -> list:
+    with open_shard(path) as f:
+        return [json.loads(raw)["id"] for raw in f]
+
+
+@pytest.mark.parametrize("max_keys", [2000000, 3], ids=["memory", "spilled"])
+def test_duplicates_across_shards(tmp_path, max_keys):
+    write_shard(tmp_path / "a_0.jsonl", [{"id": id} for id in ["a", "b", "c", "a"]])
+    write_shard(
+        tmp_path / "a_1.jsonl.gz", [{"id": id} for id in ["d", "b", "e", "f", "g"]]
+    )
+    write_shard(tmp_path / "a_2.jsonl", [{"id": id} for id in ["g", "h", "c", "i"]])
+    output = tmp_path / "output"
+    report = deduplicate(
+        sorted(tmp_path.glob("a_*")),
+        output,
+        max_keys=max_keys,
+        spill_directory=tmp_path / "spill",
+    )
+    assert read_ids(output / "a_0.jsonl") == ["a", "b", "c"]
+    assert read_ids(output / "a_1.jsonl.gz") == ["d", "e", "f", "g"]
+    assert read_ids(output / "a_2.jsonl") == ["h", "i"]
+    assert report == {
+        "a_0.jsonl": {"lines": 4, "duplicates": 1},
+        "a_1.jsonl.gz": {"lines": 5, "duplicates": 1},
+        "a_2.jsonl": {"lines": 4, "duplicates": 2},
+    }
+
+
+def test_spilled_runs_are_merged_and_removed(tmp_path):
+    seen = KeySet(max_keys=2, max_runs=2, spill_directory=tmp_path)
+    assert seen.add_batch(list(range(10))) == [True] * 10
+    seen.add_batch([10, 11, 12, 13, 14, 15])
+    assert len(seen.runs) <= 2
+    assert seen.add_batch([3, 13, 100]) == [False, False, True]
+    seen.close()
+    assert not list(tmp_path.glob("run_*.npy"))
+
+
+def test_content_key(tmp_path):
+    lines = [{"id": "a", "score": 1}, {"id": "a", "score": 2}, {"id": "a", "score": 1}]
+    write_shard(tmp_path / "b.jsonl", lines)
+    report = deduplicate([tmp_path / "b.jsonl"], tmp_path / "output", key="content")
+    assert report["b.jsonl"] == {"lines": 3, "duplicates": 1}
+
+
+def test_id_keys():
+    assert id_key("abc") == int("abc", 36)
+    assert id_key("zzzzzzzzzzzz") < 2**64
+    # not base 36 ids, hashed instead of parsed
+    for id in ["t3_abc", "-abc", "+abc", " abc", "abc\n", "ABC", "a" * 13, 12]:
+        assert 0 <= id_key(id) < 2**64
+    assert id_key("t3_abc") != id_key("t3abc")
+    assert id_key("-abc") != id_key("abc")
+    assert id_key(" abc") != id_key("abc")
+
+
+def test_prefixed_ids_are_not_duplicates(tmp_path):
+    write_shard(tmp_path / "c.jsonl", [{"id": id} for id in ["t3_abc", "t3abc", "-1"]])
+    report = deduplicate([tmp_path / "c.jsonl"], tmp_path / "output")
+    assert report["c.jsonl"] == {"lines": 3, "duplicates": 0}
@@ -0,0 +1,160 @@
+"""
+the exports of every engine against the outputs of the original sequential
+exports (run in UTC) on a small synthetic corpus in tests/data, which is read
+from a copy (see conftest.py)
+"""
+import shutil
+from pathlib import Path
+import pytest
+from process_data import DataProcessor
+
+DATA = Path(__file__).parent / "data"
+EXPECTED = DATA / "expected"
+AUTHOR_DICT_SUBMISSIONS = EXPECTED / "author_dict_submissions_all.json"
+AUTHOR_DICT_COMMENTS = EXPECTED / "author_dict_comments_all.json"
+ID_DICT = EXPECTED / "id_dict_submissions_all.json"
+PERIOD = ("20220101 00:00:00", "20220630 23:59:59")
+
+ENGINES = {"sequential": {}, "workers": {"workers": 3}}
+STATS_ENGINES = dict(ENGINES, pandas={"engine": "pandas"})
+
+# (input, mode, method, kwargs, output file)
+EXPORTS = [
+    (
+        "submissions",
+        "submissions",
+        "export_author_dict",
+        {},
+        "author_dict_submissions_all.json",
+    ),
+    (
+        "submissions",
+        "submissions",
+        "export_author_dict",
+        {"n_items": 15},
+        "author_dict_submissions_15lines.json",
+    ),
+    (
+        "comments",
+        "comments",
+        "export_author_dict",
+        {},
+        "author_dict_comments_all.json",
+    ),
+    (
+        "submissions",
+        "submissions",
+        "export_id_dict",
+        {},
+        "id_dict_submissions_all.json",
+    ),
+    (
+        "comments",
+        "comments",
+        "export_processed_jsonl",
+        {"author_dict_path": AUTHOR_DICT_SUBMISSIONS, "id_dict_path": ID_DICT},
+        "processed_all.jsonl",
+    ),
+    (
+        "comments",
+        "comments",
+        "export_processed_jsonl",
+        {
+            "author_dict_path": AUTHOR_DICT_SUBMISSIONS,
+            "id_dict_path": ID_DICT,
+            "n_items": 40,
+        },
+        "processed_40lines.jsonl",
+    ),
+]
+STATS = [
+    (
+        "submissions",
+        "submissions",
+        "export_poster_stats",
+        {"author_dict_path": AUTHOR_DICT_SUBMISSIONS, "minpost": 1},
+        "poster_stats_all_(posts>=1).json",
+    ),
+    (
+        "submissions",
+        "submissions",
+        "export_poster_stats",
+        {"author_dict_path": AUTHOR_DICT_SUBMISSIONS, "minpost": 2, "n_items": 15},
+        "poster_stats_15lines_(posts>=2).json",
+    ),
+    (
+        "processed",
+        "comments",
+        "export_commenter_stats",
+        {"author_dict_path": AUTHOR_DICT_COMMENTS, "mincom": 1},
+        "commenter_stats_all_(comments>=1).json",
+    ),
+]
+
+
+def get_cases(exports: list, engines: dict) -> list:
+    return [
+        pytest.param(*export, engine, id=f"{export[2]}-{export[4]}-{name}")
+        for export in exports
+        for name, engine in engines.items()
+    ]
+
+
+def get_input(name: str, corpus, tmp_path) -> Path:
+    if name != "processed":
+        return corpus / name
+    # the processed comments of the original export
+    directory = tmp_path / "processed"
+    directory.mkdir()
+    shutil.copy(EXPECTED / "processed_all.jsonl", directory)
+    return directory
+
+
+def export(input_path, mode: str, method: str, kwargs: dict, output_directory):
+    output_directory.mkdir()
+    processor = DataProcessor(
+        input_path, output_directory, mode, progress=False, timezone="UTC"
+    )
+    getattr(processor, method)(**kwargs)
+    return {
+        path.name: path.read_bytes() for path in sorted(output_directory.iterdir())
+    }
+
+
+@pytest.mark.parametrize(
+    "input, mode, method, kwargs, filename, engine",
+    get_cases(EXPORTS, ENGINES) + get_cases(STATS, STATS_ENGINES),
+)
+def test_same_as_the_original_export(
+    tmp_path, corpus, input, mode, method, kwargs, filename, engine
+):
+    input_path = get_input(input, corpus, tmp_path)
+    outputs = export(input_path, mode, method, dict(kwargs, **engine), tmp_path / "out")
+    assert list(outputs) == [filename]
+    assert outputs[filename] == (EXPECTED / filename).read_bytes()
+
+
+@pytest.mark.parametrize(
+    "input, mode, method, kwargs",
+    [
+        ("submissions", "submissions", "export_author_dict", {}),
+        ("submissions", "submissions", "export_id_dict", {}),
+        (
+            "comments",
+            "comments",
+            "export_processed_jsonl",
+            {"author_dict_path": AUTHOR_DICT_SUBMISSIONS, "id_dict_path": ID_DICT},
+        ),
+    ],
+)
+@pytest.mark.parametrize("chunk", [None, 1])
+def test_workers_split_time_like_the_scan(
+    tmp_path, corpus, input, mode, method, kwargs, chunk
+):
+    kwargs = dict(kwargs, time_period=PERIOD, chunk=chunk)
+    sequential = export(corpus / input, mode, method, kwargs, tmp_path / "sequential")
+    parallel = export(
+        corpus / input, mode, method, dict(kwargs, workers=3), tmp_path / "parallel"
+    )
+    assert len(sequential) == (6 if chunk else 1)
+    assert parallel == sequential
@@ -0,0 +1,80 @@
+import json
+from pathlib import Path
+import pytest
+from features import FEATURE_KEYS, TextFeatures, normalize, text_hash
+from process_data import DataProcessor
+
+nltk_tokenize = pytest.importorskip("nltk.tokenize")
+
+EXPECTED = Path(__file__).parent / "data" / "expected"
+TEXTS = [
+    "This community is great, isn't it?",
+    "a sense of belonging... to the group!!",
+    "naïve café — déjà vu, 1,000.5 times",
+    "tabs\tand\nnewlines\r\nbetween words",
+    "[deleted]",
+    "[removed]",
+    "$$$ !!! ???",
+]
+
+
+def test_same_as_nltk():
+    features = TextFeatures()
+    # repeated texts come from the cache
+    for text in TEXTS + TEXTS:
+        assert features.get(text) == {
+            "token_count": len(nltk_tokenize.wordpunct_tokenize(text)),
+            "char_count": len(text),
+            "text_hash": text_hash(text),
+        }
+    assert len(features.cache) == len(TEXTS)
+
+
+def test_no_text():
+    features = TextFeatures()
+    for text in [None, ""]:
+        assert features.get(text) == dict.fromkeys(FEATURE_KEYS)
+
+
+def test_normalized_hash():
+    assert normalize("  The\tCommunity\n ") == "the community"
+    assert text_hash("The  Community") == text_hash("the community\n")
+    assert text_hash("the community") != text_hash("the communities")
+
+
+def test_cache_is_cleared():
+    features = TextFeatures(max_size=3)
+    for text in TEXTS:
+        assert features.get(text)["token_count"] == len(
+            nltk_tokenize.wordpunct_tokenize(text)
+        )
+        assert len(features.cache) <= 3
+
+
+def test_processed_lines(tmp_path, corpus):
+    comments = DataProcessor(
+        corpus / "comments", tmp_path, "comments", progress=False, timezone="UTC"
+    )
+    comments.export_processed_jsonl(
+        author_dict_path=EXPECTED / "author_dict_submissions_all.json",
+        id_dict_path=EXPECTED / "id_dict_submissions_all.json",
+        text_features=True,
+    )
+    with (tmp_path / "processed_all.jsonl").open("r") as f:
+        lines = [json.loads(line) for line in f]
+    with (EXPECTED / "processed_all.jsonl").open("r") as f:
+        expected = [json.loads(line) for line in f]
+    assert len(lines) == len(expected)
+    for line, expected_line in zip(lines, expected):
+        features = {key: line.pop(key) for key in FEATURE_KEYS}
+        # the other keys are the same as without text features
+        assert line == expected_line
+        body = line["body"]
+        if body:
+            assert features["token_count"] == len(
+                nltk_tokenize.wordpunct_tokenize(body)
+            )
+            assert features["char_count"] == len(body)
+            assert features["text_hash"] == text_hash(body)
+        else:
+            assert features == dict.fromkeys(FEATURE_KEYS)
@@ -0,0 +1,118 @@
+import re
+import pytest
+from keywords import KeywordMatcher, TextFilter, count_tokens, in_range
+
+nltk_tokenize = pytest.importorskip("nltk.tokenize")
+
+REGEX = [
+    r"[Cc]ommunity|[Cc]ommunities",
+    r"[Ss]ubreddits?",
+    r"[Ii]dentity|[Ii]dentities",
+    r"[Bb]elonging",
+    r"[Gg]roups?",
+    r"[Pp]eople",
+]
+TEXTS = [
+    "This community is great, isn't it?",
+    "COMMUNITY in capitals",
+    "a sense of belonging... to the group!!",
+    "nothing to see here",
+    "peoples' identities & subreddits",
+    "Grouping things: is that a group?",
+    "e-mail me at someone@example.com :)",
+    "",
+    "   ",
+    "naïve café — déjà vu, 1,000.5 times",
+    "tabs\tand\nnewlines\r\nbetween words",
+    "$$$ !!! ???",
+]
+
+
+def check_keywords(regex: list, text: str):
+    """
+    the keyword check of the corpus notebook
+    """
+    for r in [re.compile(i) for i in regex]:
+        if r.search(text):
+            return text
+
+
+def test_regex_same_as_notebook():
+    matcher = KeywordMatcher(regex=REGEX)
+    for text in TEXTS:
+        assert matcher.search(text) == (check_keywords(REGEX, text) is not None)
+
+
+def test_keywords():
+    keywords = ["group", "group chat", "sense of", "a.b"]
+    matcher = KeywordMatcher(keywords=keywords)
+    for text in TEXTS + ["a.b", "axb"]:
+        expected = any(keyword in text for keyword in keywords)
+        assert matcher.search(text) == expected
+    # keywords are not regular expressions
+    assert not matcher.search("axb")
+
+
+def test_ignore_case():
+    matcher = KeywordMatcher(keywords=["Community"], ignore_case=True)
+    assert matcher.search("COMMUNITY in capitals")
+    assert matcher.search("this community")
+    assert not KeywordMatcher(keywords=["Community"]).search("this community")
+
+
+def test_keywords_and_regex():
+    matcher = KeywordMatcher(keywords=["nothing"], regex=[r"[Gg]roups?"])
+    for text in TEXTS:
+        expected = "nothing" in text or check_keywords([r"[Gg]roups?"], text)
+        assert matcher.search(text) == bool(expected)
+
+
+def test_many_keywords():
+    keywords = [f"word{i}" for i in range(200)] + ["community"]
+    matcher = KeywordMatcher(keywords=keywords, automaton_size=100)
+    for text in TEXTS + ["word199 here", "word2000"]:
+        expected = any(keyword in text for keyword in keywords)
+        assert matcher.search(text) == expected
+
+
+def test_no_keywords():
+    with pytest.raises(AssertionError):
+        KeywordMatcher()
+
+
+def test_count_tokens_same_as_nltk():
+    for text in TEXTS:
+        assert count_tokens(text) == len(nltk_tokenize.wordpunct_tokenize(text))
+
+
+def test_in_range_same_as_nltk():
+    for text in TEXTS:
+        n = len(nltk_tokenize.wordpunct_tokenize(text))
+        for min_tokens in [None, 0, 1, 3, 5, 8, 100]:
+            for max_tokens in [None, 0, 3, 5, 100]:
+                expected = (min_tokens is None or n >= min_tokens) and (
+                    max_tokens is None or n <= max_tokens
+                )
+                assert in_range(text, min_tokens, max_tokens) == expected
+                assert in_range("", min_tokens, max_tokens, token_count=n) == expected
+
+
+def test_text_filter_same_as_notebook():
+    text_filter = TextFilter(
+        KeywordMatcher(regex=REGEX), min_tokens=5, exclude_authors=["AutoModerator"]
+    )
+    for author in ["someone", "AutoModerator", None]:
+        for text in TEXTS + [None]:
+            line = {"author": author, "body": text}
+            expected = None
+            if text and author != "AutoModerator":
+                if len(nltk_tokenize.wordpunct_tokenize(text)) >= 5:
+                    expected = check_keywords(REGEX, text)
+            assert text_filter.get_text(line, "body") == expected
+
+
+def test_text_filter_uses_token_count():
+    text_filter = TextFilter(min_tokens=5)
+    line = {"body": "two words", "token_count": 10}
+    assert text_filter.get_text(line, "body") == "two words"
+    assert text_filter.get_text({"body": "two words"}, "body") is None
@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+import pytest
+from kvstore import DiskDict, write_table
+from process_data import DataProcessor
+
+EXPECTED = Path(__file__).parent / "data" / "expected"
+
+
+def test_lookups(tmp_path):
+    items = [(f"key_{i}", {"value": i}) for i in range(1000)]
+    write_table(tmp_path / "table", items)
+    table = DiskDict(tmp_path / "table", cache_size=10)
+    assert DiskDict.is_table(tmp_path / "table")
+    assert len(table) == 1000
+    for key, value in items[::7]:
+        assert table[key] == value
+        assert table.get(key) == value
+        assert key in table
+    assert list(table.items()) == items
+    assert list(table.keys()) == [key for key, _ in items]
+    table.close()
+
+
+def test_missing_keys(tmp_path):
+    write_table(tmp_path / "table", [("a", 1), ("b", None)])
+    table = DiskDict(tmp_path / "table")
+    assert "c" not in table
+    assert table.get("c") is None
+    assert table.get("c", 0) == 0
+    with pytest.raises(KeyError):
+        table["c"]
+    # a value of None is not a missing key
+    assert "b" in table
+    assert table["b"] is None
+    table.close()
+
+
+def test_empty_table(tmp_path):
+    write_table(tmp_path / "table", [])
+    table = DiskDict(tmp_path / "table")
+    assert len(table) == 0
+    assert "a" not in table
+    assert table.get("a", 1) == 1
+    assert list(table.items()) == []
+    table.close()
+
+
+def test_int_and_str_keys(tmp_path):
+    # both keys have the same hash, the entries tell them apart
+    write_table(tmp_path / "table", [(1, "int"), ("1", "str"), (2, "two")])
+    table = DiskDict(tmp_path / "table")
+    assert table[1] == "int"
+    assert table["1"] == "str"
+    assert table[2] == "two"
+    assert "2" not in table
+    table.close()
+
+
+def test_rewritten_table(tmp_path):
+    write_table(tmp_path / "table", [("a", 1)])
+    write_table(tmp_path / "table", [("b", 2)])
+    table = DiskDict(tmp_path / "table")
+    assert "a" not in table
+    assert table["b"] == 2
+    assert not (tmp_path / "table.tmp").exists()
+    table.close()
+
+
+def test_processed_lines_with_tables(tmp_path, corpus):
+    dicts = tmp_path / "dicts"
+    dicts.mkdir()
+    submissions = DataProcessor(
+        corpus / "submissions", dicts, "submissions", progress=False, timezone="UTC"
+    )
+    submissions.export_author_dict(table=True)
+    submissions.export_id_dict(table=True)
+    author_dict = DiskDict(dicts / "author_dict_submissions_all")
+    with (EXPECTED / "author_dict_submissions_all.json").open("r") as f:
+        assert dict(author_dict.items()) == json.load(f)
+    author_dict.close()
+
+    processed = {}
+    for kind, directory in [("tables", dicts), ("json", EXPECTED)]:
+        output = tmp_path / kind
+        output.mkdir()
+        comments = DataProcessor(
+            corpus / "comments", output, "comments", progress=False, timezone="UTC"
+        )
+        suffix = ".json" if kind == "json" else ""
+        comments.export_processed_jsonl(
+            author_dict_path=directory / f"author_dict_submissions_all{suffix}",
+            id_dict_path=directory / f"id_dict_submissions_all{suffix}",
+        )
+        processed[kind] = (output / "processed_all.jsonl").read_bytes()
+    assert processed["tables"] == processed["json"]
+    assert processed["json"] == (EXPECTED / "processed_all.jsonl").read_bytes()
@@ -0,0 +1,72 @@
+import pytest
+from partition import PartitionRouter
+
+
+def get_router(filenames=("a", "b", "c", "d"), boundaries=(100, 200, 300)):
+    router = PartitionRouter(list(filenames), list(boundaries))
+    events = []
+    router.subscribe(
+        lambda name: events.append(("open", name)),
+        lambda name: events.append(("close", name)),
+    )
+    return router, events
+
+
+def test_route_at_the_boundaries():
+    router, _ = get_router()
+    # a line at the end epoch of a period belongs to it
+    utcs = [99, 100, 101, 200, 201, 300, 301]
+    assert [router.route(utc) for utc in utcs] == [0, 0, 1, 1, 2, 2, 3]
+
+
+def test_lines_outside_every_period():
+    router, _ = get_router()
+    # before the first boundary: the first period, after the last: the last one
+    assert router.route(-(10**9)) == 0
+    assert router.route(10**12) == 3
+
+
+def test_empty_periods_are_opened_and_closed():
+    router, events = get_router()
+    router.start()
+    assert [router.feed(utc) for utc in [50, 100, 250]] == [0, 0, 2]
+    router.finish()
+    assert events == [
+        ("open", "a"),
+        ("close", "a"),
+        ("open", "b"),
+        ("close", "b"),
+        ("open", "c"),
+        ("close", "c"),
+        ("open", "d"),
+        ("close", "d"),
+    ]
+
+
+def test_late_line_goes_into_the_open_period():
+    router, events = get_router()
+    router.start()
+    router.feed(250)
+    assert router.feed(50) == 2
+    router.finish()
+    assert [name for event, name in events if event == "open"] == ["a", "b", "c", "d"]
+
+
+def test_without_lines_every_period_gets_an_output():
+    router, events = get_router()
+    router.start()
+    router.finish()
+    assert len(events) == 8
+
+
+def test_one_period():
+    router, events = get_router(["all"], [])
+    router.start()
+    assert router.feed(10**12) == 0
+    router.finish()
+    assert events == [("open", "all"), ("close", "all")]
+
+
+def test_every_period_but_the_last_needs_a_boundary():
+    with pytest.raises(AssertionError):
+        PartitionRouter(["a", "b"], [])
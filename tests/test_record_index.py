@@ -0,0 +1,83 @@
+import json
+import pytest
+from decoders import get_keys
+from process_data import DataHandler
+from shard_io import is_shard, open_shard
+
+
+def read_lines(directory) -> list:
+    lines = []
+    # shard indexes of other tests may be next to the shards
+    for path in sorted(filter(is_shard, directory.iterdir())):
+        with open_shard(path) as f:
+            lines += [json.loads(raw) for raw in f if raw.strip()]
+    return lines
+
+
+def write_shard(path, lines: list, mode: str = "wb"):
+    with open_shard(path, mode) as f:
+        for line in lines:
+            f.write((json.dumps(line) + "\n").encode("utf-8"))
+
+
+def check_lookups(handler, directory):
+    """
+    every id, post and author of the shards against a scan
+    """
+    lines = read_lines(directory)
+    keys = [get_keys(line) for line in lines]
+    for value in {k["id"] for k in keys}:
+        expected = [line for line, k in zip(lines, keys) if k["id"] == value]
+        assert handler.get_by_id(value) == expected[0]
+    for value in {k["post_id"] for k in keys}:
+        expected = [line for line, k in zip(lines, keys) if k["post_id"] == value]
+        assert list(handler.iter_by_post(value)) == expected
+    for value in {k["author"] for k in keys}:
+        expected = [line for line, k in zip(lines, keys) if k["author"] == value]
+        assert list(handler.iter_by_author(value)) == expected
+    assert handler.get_by_id("missing") is None
+    assert list(handler.iter_by_author("missing")) == []
+
+
+@pytest.fixture
+def comments(corpus) -> list:
+    return [read_lines(corpus / "comments")[:60], read_lines(corpus / "comments")[60:]]
+
+
+def test_lookups_after_appends_and_rewrites(tmp_path, comments):
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    plain = shards / "comments_0.jsonl"
+    compressed = shards / "comments_1.jsonl.gz"
+    write_shard(plain, comments[0][:30])
+    write_shard(compressed, comments[1])
+    handler = DataHandler(shards, record_index_path=tmp_path / "index", progress=False)
+    check_lookups(handler, shards)
+    assert handler.get_by_id(comments[0][40]["id"]) is None
+
+    # appended, a new gzip member for the compressed shard
+    write_shard(plain, comments[0][30:], mode="ab")
+    write_shard(compressed, comments[0][:5], mode="ab")
+    handler.update_record_index()
+    check_lookups(handler, shards)
+    assert handler.get_by_id(comments[0][40]["id"]) == comments[0][40]
+
+    # rewritten
+    write_shard(plain, comments[0][::-1][:20])
+    handler.update_record_index()
+    check_lookups(handler, shards)
+
+    # a new handler reuses the index on disk
+    handler = DataHandler(shards, record_index_path=tmp_path / "index", progress=False)
+    check_lookups(handler, shards)
+
+
+def test_fields(tmp_path, comments):
+    path = tmp_path / "comments.jsonl"
+    write_shard(path, comments[0])
+    handler = DataHandler(path, record_index_path=tmp_path / "index", progress=False)
+    line = comments[0][3]
+    assert handler.get_by_id(line["id"], fields=["id", "author"]) == {
+        "id": line["id"],
+        "author": line["author"],
+    }
@@ -0,0 +1,86 @@
+import os
+import json
+import pytest
+from process_data import DataHandler
+from shard_index import ShardIndex
+from shard_io import open_shard
+
+
+def write_shard(path, utcs: list, mode: str = "wb"):
+    with open_shard(path, mode) as f:
+        for utc in utcs:
+            line = {"id": f"{utc:08d}", "created_utc": utc}
+            f.write((json.dumps(line) + "\n").encode("utf-8"))
+
+
+def scan(path, start_epoch: int, end_epoch: int, offset: int = 0) -> list:
+    with open_shard(path, offset=offset) as f:
+        lines = [json.loads(raw) for raw in f]
+    return [line for line in lines if start_epoch < line["created_utc"] <= end_epoch]
+
+
+@pytest.mark.parametrize("name", ["shard.jsonl", "shard.jsonl.gz"])
+def test_seek_gives_the_lines_of_a_full_scan(tmp_path, name):
+    path = tmp_path / name
+    write_shard(path, [1000 + 2 * i for i in range(100)])
+    index = ShardIndex(path, step=10, index_directory=tmp_path / "indexes")
+    assert index.saved
+    assert (index.min_utc, index.max_utc) == (1000, 1198)
+    for start_epoch, end_epoch in [(1100, 1150), (1001, 1002), (999, 1000), (0, 5000)]:
+        offset = index.seek_offset(start_epoch)
+        expected = scan(path, start_epoch, end_epoch)
+        assert scan(path, start_epoch, end_epoch, offset) == expected
+    # the lines before the period are skipped
+    assert index.seek_offset(1100) > 0
+    assert not index.overlaps(1198, 2000)
+    assert not index.overlaps(0, 999)
+
+
+def test_unsorted_shard_is_read_from_the_start(tmp_path):
+    path = tmp_path / "shard.jsonl"
+    write_shard(path, [1000, 1200, 1100] + list(range(1300, 1400)))
+    index = ShardIndex(path, step=10, index_directory=tmp_path)
+    assert not index.is_sorted
+    assert index.seek_offset(1350) == 0
+
+
+def test_time_period_reads_like_a_full_scan(tmp_path):
+    path = tmp_path / "shard.jsonl"
+    # step is 1000 lines in DataHandler
+    write_shard(path, [1600000000 + 60 * i for i in range(2500)])
+    handler = DataHandler(
+        path, index_directory=tmp_path, progress=False, timezone="UTC"
+    )
+    time_period = ("20200915 00:00:00", "20200915 12:00:00")
+    lines = list(handler.get_generator(time_period=time_period))
+    start_epoch = handler.get_epoch(time_period[0])
+    end_epoch = handler.get_epoch(time_period[1])
+    assert lines == scan(path, start_epoch, end_epoch)
+    assert handler.get_shard_index(path).seek_offset(start_epoch) > 0
+    assert (tmp_path / "shard.jsonl.idx").exists()
+
+
+def test_rebuilt_when_the_shard_changes(tmp_path):
+    path = tmp_path / "shard.jsonl"
+    write_shard(path, range(1000, 1010))
+    index = ShardIndex(path, step=2, index_directory=tmp_path)
+    assert index.max_utc == 1009
+    assert ShardIndex(path, step=2, index_directory=tmp_path).max_utc == 1009
+
+    # appended
+    write_shard(path, range(1010, 1020), mode="ab")
+    assert not index.is_current()
+    assert ShardIndex(path, step=2, index_directory=tmp_path).max_utc == 1019
+
+    # rewritten with the same size
+    write_shard(path, range(2000, 2020))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    index = ShardIndex(path, step=2, index_directory=tmp_path)
+    assert (index.min_utc, index.max_utc) == (2000, 2019)
+
+    # the handler builds a new index as well
+    handler = DataHandler(path, index_directory=tmp_path, progress=False)
+    assert handler.get_shard_index(path).max_utc == 2019
+    write_shard(path, range(2020, 2030), mode="ab")
+    assert handler.get_shard_index(path).max_utc == 2029
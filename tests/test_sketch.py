@@ -0,0 +1,107 @@
+import json
+from collections import Counter
+import numpy as np
+import pytest
+from process_data import DataHandler, DataProcessor
+from sketch import CountMinSketch
+
+
+def get_keys(n: int, seed: int = 0) -> list:
+    """
+    skewed keys like the authors of a subreddit
+    """
+    rng = np.random.default_rng(seed)
+    return [f"user_{k}" for k in rng.zipf(1.3, n) % 5000]
+
+
+def add(sketch: CountMinSketch, keys: list, batch_size: int = 1000):
+    for i in range(0, len(keys), batch_size):
+        counter = Counter(keys[i : i + batch_size])
+        sketch.add(list(counter), np.fromiter(counter.values(), np.int64))
+
+
+@pytest.mark.parametrize("width", [64, 1024, 2**16])
+def test_estimates_are_never_below_the_counts(width):
+    keys = get_keys(20000)
+    sketch = CountMinSketch(width=width, depth=4)
+    add(sketch, keys)
+    counts = Counter(keys)
+    estimates = sketch.estimate(list(counts))
+    assert np.all(estimates >= np.fromiter(counts.values(), np.int64))
+    assert sketch.total == len(keys)
+    if width == 2**16:
+        # few collisions in a wide sketch
+        assert np.mean(estimates == np.fromiter(counts.values(), np.int64)) > 0.99
+
+
+def test_merge_equals_the_sketch_of_the_combined_data():
+    keys = get_keys(20000)
+    parts = [CountMinSketch(width=2**16), CountMinSketch(width=2**16)]
+    add(parts[0], keys[:7000])
+    add(parts[1], keys[7000:])
+    combined = CountMinSketch(width=2**16)
+    add(combined, keys)
+    parts[0].merge(parts[1])
+
+    counts = Counter(keys)
+    merged = parts[0].estimate(list(counts))
+    assert parts[0].total == combined.total == len(keys)
+    # the conservative updates of the parts are upper bounds as well
+    assert np.all(merged >= np.fromiter(counts.values(), np.int64))
+    assert np.all(merged >= combined.estimate(list(counts)))
+
+
+def test_merge_without_collisions_equals_the_combined_table():
+    keys = [f"user_{k}" for k in range(50) for _ in range(k + 1)]
+    parts = [CountMinSketch(width=2**20), CountMinSketch(width=2**20)]
+    add(parts[0], keys[::2])
+    add(parts[1], keys[1::2])
+    combined = CountMinSketch(width=2**20)
+    add(combined, keys)
+    parts[0].merge(parts[1])
+    assert np.array_equal(parts[0].table, combined.table)
+    assert parts[0].estimate(["user_49", "user_0"]).tolist() == [50, 1]
+
+
+def read_counts(corpus) -> Counter:
+    handler = DataHandler(corpus / "comments", progress=False)
+    return Counter(line["author"] for line in handler.get_generator())
+
+
+@pytest.mark.parametrize("workers", [None, 3])
+def test_exact_mode_keeps_exactly_the_frequent_authors(tmp_path, corpus, workers):
+    counts = read_counts(corpus)
+    min_count = sorted(counts.values())[len(counts) // 2]
+    processor = DataProcessor(corpus / "comments", tmp_path, "comments", progress=False)
+    # a narrow sketch overestimates, the second pass counts exactly
+    processor.export_frequent_authors(
+        min_count=min_count, width=16, depth=2, workers=workers
+    )
+    with (tmp_path / "frequent_authors_comments_all.json").open("r") as f:
+        result = json.load(f)
+    assert result == {a: n for a, n in counts.items() if n >= min_count}
+    assert list(result.values()) == sorted(result.values(), reverse=True)
+
+
+def test_approximate_mode_misses_no_author(tmp_path, corpus):
+    counts = read_counts(corpus)
+    min_count = sorted(counts.values())[len(counts) // 2]
+    processor = DataProcessor(corpus / "comments", tmp_path, "comments", progress=False)
+    processor.export_frequent_authors(
+        min_count=min_count, width=16, depth=2, exact=False
+    )
+    with (tmp_path / "frequent_authors_comments_all.json").open("r") as f:
+        result = json.load(f)
+    for author, n in counts.items():
+        if n >= min_count:
+            assert result[author] >= n
+
+
+def test_top_n(tmp_path, corpus):
+    counts = read_counts(corpus)
+    processor = DataProcessor(corpus / "comments", tmp_path, "comments", progress=False)
+    processor.export_frequent_authors(top_n=3)
+    with (tmp_path / "frequent_authors_comments_all.json").open("r") as f:
+        result = json.load(f)
+    assert list(result.values()) == sorted(counts.values(), reverse=True)[:3]
+    assert all(counts[author] == n for author, n in result.items())
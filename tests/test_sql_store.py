@@ -0,0 +1,52 @@
+import pytest
+from process_data import DataProcessor
+from sql_store import SqlStore
+
+PERIOD = ("20220115 12:00:00", "20220520 00:00:00")
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory, corpus):
+    directory = tmp_path_factory.mktemp("database")
+    processor = DataProcessor(
+        corpus / "submissions", directory, "submissions", progress=False, timezone="UTC"
+    )
+    return processor.export_database(directory / "submissions.sqlite")
+
+
+def export(input_path, output_directory, **kwargs) -> dict:
+    output_directory.mkdir()
+    processor = DataProcessor(
+        input_path, output_directory, "submissions", progress=False, timezone="UTC"
+    )
+    processor.export_author_dict(**kwargs)
+    processor.export_id_dict(**kwargs)
+    return {
+        path.name: path.read_bytes() for path in sorted(output_directory.iterdir())
+    }
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"n_items": 5},
+        {"time_period": PERIOD},
+        {"time_period": PERIOD, "chunk": 1},
+        {"n_items": 5, "time_period": PERIOD},
+    ],
+    ids=["all", "n_items", "time_period", "chunk", "n_items_and_time_period"],
+)
+def test_same_as_the_jsonl_files(tmp_path, corpus, database, kwargs):
+    jsonl = export(corpus / "submissions", tmp_path / "jsonl", **kwargs)
+    sql = export(database, tmp_path / "sql", **kwargs)
+    assert sql == jsonl
+
+
+def test_n_items_per_shard(database):
+    store = SqlStore(database)
+    lines = list(store.iter_records(["id"], n_items=5))
+    shards = store.query("SELECT shard, COUNT(*) AS n FROM lines GROUP BY shard")
+    store.close()
+    assert len(shards) == 2
+    assert len(lines) == 10
@@ -0,0 +1,63 @@
+import json
+import numpy as np
+import pytest
+from shard_io import open_shard
+from text_index import TextIndex, build_text_index, tokenize
+
+
+def write_shard(path, bodies: list, first_utc: int):
+    with open_shard(path, "wb") as f:
+        for i, body in enumerate(bodies):
+            line = {"id": f"{path.name}_{i}", "created_utc": first_utc + i}
+            line["body"] = body
+            f.write((json.dumps(line) + "\n").encode("utf-8"))
+
+
+@pytest.fixture
+def index(tmp_path):
+    # enough docs for several position blocks and segments
+    bodies = []
+    for i in range(600):
+        if i % 97 == 0:
+            bodies.append("you guys are the best community")
+        elif i % 53 == 0:
+            bodies.append("the community and you, guys")
+        else:
+            bodies.append(f"word{i % 7} filler text number {i}")
+    paths = [tmp_path / "comments_0.jsonl", tmp_path / "comments_1.jsonl.gz"]
+    write_shard(paths[0], bodies[:300], 1000)
+    write_shard(paths[1], bodies[300:], 2000)
+    build_text_index(paths, tmp_path / "index", segment_docs=250, timezone="UTC")
+    return TextIndex(tmp_path / "index"), bodies
+
+
+def test_phrase_docs(index):
+    index, bodies = index
+    texts = [" ".join(tokenize(body)) for body in bodies]
+    expected = [i for i, text in enumerate(texts) if "you guys" in text]
+    assert 0 < len(expected) < len(bodies)
+    assert index.phrase_docs("you guys").tolist() == expected
+    assert index.phrase_docs("You, guys!").tolist() == expected
+    assert index.phrase_docs("guys you").tolist() == []
+    assert index.phrase_docs("unknown words").tolist() == []
+    assert index.phrase_docs("the best community").tolist() == [
+        i for i, text in enumerate(texts) if "the best community" in text
+    ]
+
+
+def test_term_positions_of_some_docs(index):
+    index, _ = index
+    all_docs, all_positions = index.term_positions("filler")
+    docs = index.term_docs("filler")[::50]
+    some_docs, some_positions = index.term_positions("filler", docs)
+    keep = np.isin(all_docs, docs)
+    assert some_docs.tolist() == all_docs[keep].tolist()
+    assert some_positions.tolist() == all_positions[keep].tolist()
+
+
+def test_records_and_months(index):
+    index, bodies = index
+    docs = index.search(["you guys", "the community"])
+    lines = list(index.records(docs[::-1], fields=["body"]))
+    assert [line["body"] for line in lines] == [bodies[doc] for doc in docs]
+    assert index.count_by_month(docs) == {"1970-01": len(docs)}
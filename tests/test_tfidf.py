@@ -0,0 +1,149 @@
+import json
+import pytest
+from process_data import DataProcessor
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+feature_extraction = pytest.importorskip("sklearn.feature_extraction.text")
+from tfidf import TfidfModel, add_group_sums  # noqa: E402
+
+TEXTS = [
+    "The community is a group of people.",
+    "People in the group talk about the community, the community!",
+    "A sense of belonging to a group",
+    "Identity and belonging",
+    "the the the subreddit",
+    "Nothing in common here",
+    "Groups of people, groups of subreddits",
+    "café naïve déjà vu",
+    "x y z",
+    "",
+]
+PARAMS = [(1, 1.0), (2, 1.0), (1, 0.5), (0.2, 0.8), (2, 3), (1, 5)]
+
+
+def sklearn_weights(texts: list, min_df, max_df) -> tuple:
+    vectorizer = feature_extraction.TfidfVectorizer(
+        norm=None, min_df=min_df, max_df=max_df
+    )
+    matrix = vectorizer.fit_transform(texts).toarray()
+    terms = vectorizer.get_feature_names_out()
+    weights = [{terms[j]: row[j] for j in np.flatnonzero(row)} for row in matrix]
+    idf = dict(zip(terms, vectorizer.idf_))
+    return weights, idf
+
+
+def model_weights(model: TfidfModel, matrix) -> list:
+    matrix = matrix.tocsr()
+    weights = []
+    for i in range(matrix.shape[0]):
+        row = matrix.getrow(i)
+        weights.append({model.get_term(j): w for j, w in zip(row.indices, row.data)})
+    return weights
+
+
+def assert_same_weights(weights: list, expected: list):
+    assert len(weights) == len(expected)
+    for row, expected_row in zip(weights, expected):
+        assert row.keys() == expected_row.keys()
+        for term, weight in row.items():
+            assert weight == pytest.approx(expected_row[term])
+
+
+@pytest.mark.parametrize("min_df, max_df", PARAMS)
+@pytest.mark.parametrize("batch_size", [3, 10000])
+def test_same_as_sklearn(min_df, max_df, batch_size):
+    expected, expected_idf = sklearn_weights(TEXTS, min_df, max_df)
+    model = TfidfModel(min_df=min_df, max_df=max_df, batch_size=batch_size)
+    matrix = model.fit_transform(TEXTS)
+    assert matrix.shape[0] == len(TEXTS)
+    assert model.n_docs == len(TEXTS)
+    assert_same_weights(model_weights(model, matrix), expected)
+    # terms outside min_df/max_df have no idf
+    idf = {term: model.idf[j] for j, term in enumerate(model.terms)}
+    kept = {term: value for term, value in idf.items() if value}
+    assert kept.keys() == expected_idf.keys()
+    for term, value in kept.items():
+        assert value == pytest.approx(expected_idf[term])
+
+
+@pytest.mark.parametrize("min_df, max_df", PARAMS)
+def test_hashing_same_as_sklearn(min_df, max_df):
+    expected, _ = sklearn_weights(TEXTS, min_df, max_df)
+    model = TfidfModel(min_df=min_df, max_df=max_df, hashing=True, batch_size=4)
+    matrix = model.fit_transform(TEXTS)
+    # no terms share a column in this corpus
+    assert len(set(model.terms)) == len(model.terms)
+    assert_same_weights(model_weights(model, matrix), expected)
+
+
+def test_unknown_terms():
+    model = TfidfModel().fit(TEXTS[:3])
+    matrix = model.transform_batch(["unknown words and the community"])
+    assert set(model_weights(model, matrix)[0]) == {"the", "community"}
+
+
+@pytest.mark.parametrize("n", [1, 3, 100])
+def test_top_terms(n):
+    expected, _ = sklearn_weights(TEXTS, 1, 1.0)
+    model = TfidfModel()
+    matrix = model.fit_transform(TEXTS)
+    for terms, expected_row in zip(model.top_terms(matrix, n), expected):
+        weights = [weight for _, weight in terms]
+        # the highest weights in order, ties in any order
+        assert weights == pytest.approx(sorted(expected_row.values())[::-1][:n])
+        for term, weight in terms:
+            assert weight == pytest.approx(expected_row[term])
+    rows = [matrix.getrow(i) for i in range(matrix.shape[0])]
+    assert model.top_terms(rows, n) == model.top_terms(matrix, n)
+    assert model.top_terms([], n) == []
+
+
+def test_group_sums():
+    model = TfidfModel()
+    matrix = model.fit_transform(TEXTS)
+    groups = ["a", "b", "a", "c", "b", "a", "a", "c", "b", "a"]
+    sums = add_group_sums({}, matrix[:4], groups[:4])
+    sums = add_group_sums(sums, matrix[4:], groups[4:])
+    assert sorted(sums) == ["a", "b", "c"]
+    for group, row in sums.items():
+        rows = [i for i, g in enumerate(groups) if g == group]
+        expected = np.asarray(matrix[rows].sum(axis=0)).ravel()
+        assert np.allclose(row.toarray().ravel(), expected)
+
+
+def test_export_top_terms(tmp_path, corpus):
+    comments = DataProcessor(
+        corpus / "comments", tmp_path, "comments", progress=False, timezone="UTC"
+    )
+    comments.export_top_terms(top_n=3, min_df=2, max_df=0.9, batch_size=7)
+
+    lines = []
+    for line in comments.get_generator(fields=["id", "author", "created_utc", "body"]):
+        if line.get("body") and line.get("author") != "AutoModerator":
+            lines.append(line)
+    expected, _ = sklearn_weights([line["body"] for line in lines], 2, 0.9)
+    with (tmp_path / "top_terms_comments_all.jsonl").open("r") as f:
+        top = [json.loads(line) for line in f]
+    assert len(top) == len(lines)
+    by_month = {}
+    for newline, line, expected_row in zip(top, lines, expected):
+        month = comments.dates.month(line["created_utc"])
+        assert newline["id"] == line["id"]
+        assert newline["month"] == month
+        weights = sorted(expected_row.values())[::-1][:3]
+        assert list(newline["terms"].values()) == pytest.approx(weights)
+        for term, weight in newline["terms"].items():
+            assert weight == pytest.approx(expected_row[term])
+        sums = by_month.setdefault(month, {})
+        for term, weight in expected_row.items():
+            sums[term] = sums.get(term, 0) + weight
+
+    with (tmp_path / "top_terms_by_month_comments_all.json").open("r") as f:
+        top_by_month = json.load(f)
+    assert top_by_month.keys() == by_month.keys()
+    for month, terms in top_by_month.items():
+        weights = sorted(by_month[month].values())[::-1][:3]
+        assert list(terms.values()) == pytest.approx(weights)
+        for term, weight in terms.items():
+            assert weight == pytest.approx(by_month[month][term])
@@ -0,0 +1,443 @@
+import re
+import json
+import shutil
+import datetime
+import numpy as np
+from array import array
+from pathlib import Path
+from dates import DAY, Dates
+from shard_io import get_compression, open_shard
+from decoders import get_decoder, project
+
+# terms are lowercased words, punctuation is left out
+TOKEN = re.compile(r"\w+")
+# doc * POSITION_SHIFT + position identifies a token in phrase queries
+POSITION_SHIFT = 1 << 24
+# files of the varint encoded postings
+POSTING_FILES = ["docs", "freqs", "positions"]
+# docs per block of positions, the byte offset of every block is kept so only
+# the blocks of the docs a phrase query needs are decoded
+POSITION_BLOCK = 128
+
+
+def tokenize(text: str) -> list:
+    return TOKEN.findall(text.lower())
+
+
+def varint_sizes(values) -> np.ndarray:
+    """
+    number of bytes of every encoded integer
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        nbytes += values >= np.uint64(1 << (7 * k))
+    return nbytes
+
+
+def encode_varints(values) -> bytes:
+    """
+    encode non-negative integers with 7 bits per byte, the high bit marks
+    that more bytes of the same integer follow
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b""
+    nbytes = varint_sizes(values)
+    starts = np.cumsum(nbytes) - nbytes
+    which = np.repeat(np.arange(len(values)), nbytes)
+    shift = np.arange(nbytes.sum()) - np.repeat(starts, nbytes)
+    out = (values[which] >> (7 * shift).astype(np.uint64)) & np.uint64(0x7F)
+    out = out.astype(np.uint8)
+    more = shift < np.repeat(nbytes, nbytes) - 1
+    out[more] |= 0x80
+    return out.tobytes()
+
+
+def decode_varints(data) -> np.ndarray:
+    b = np.frombuffer(data, dtype=np.uint8)
+    if not len(b):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero((b & 0x80) == 0)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shift = np.arange(len(b)) - np.repeat(starts, ends - starts + 1)
+    parts = (b & 0x7F).astype(np.uint64) << (7 * shift).astype(np.uint64)
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+class Segment:
+    """
+    postings of a part of the docs, kept in memory while indexing and
+    written as raw uint32 arrays before they are merged
+    """
+
+    def __init__(self):
+        # {term: [doc ids, positions per doc, positions]}
+        self.postings = {}
+        self.n_docs = 0
+
+    def add(self, doc: int, terms: list):
+        seen = {}
+        for position, term in enumerate(terms):
+            if term not in seen:
+                seen[term] = [position]
+            else:
+                seen[term].append(position)
+        postings = self.postings
+        for term, positions in seen.items():
+            posting = postings.get(term)
+            if posting is None:
+                posting = postings[term] = [array("I"), array("I"), array("I")]
+            posting[0].append(doc)
+            posting[1].append(len(positions))
+            posting[2].extend(positions)
+        self.n_docs += 1
+
+    def write(self, path: Path) -> dict:
+        """
+        write the raw arrays, return {term: (offset, n docs, n positions)}
+        """
+        lexicon = {}
+        offset = 0
+        with path.open("wb") as f:
+            for term in sorted(self.postings):
+                docs, freqs, positions = self.postings[term]
+                for values in (docs, freqs, positions):
+                    values.tofile(f)
+                lexicon[term] = (offset, len(docs), len(positions))
+                offset += 4 * (2 * len(docs) + len(positions))
+        self.postings = {}
+        return lexicon
+
+
+def build_text_index(
+    jsonl_paths: list,
+    directory,
+    text_key: str = "body",
+    loads=None,
+    segment_docs: int = 200000,
+    timezone: str = None,
+):
+    """
+    index the texts of the jsonl files (see TextIndex), the postings of every
+    segment_docs docs are written to disk and merged at the end
+
+    :param timezone
+    :type time zone of count_by_month, None for the local time of the machine
+    """
+    loads = loads or get_decoder()
+    directory = Path(directory)
+    if directory.exists():
+        shutil.rmtree(directory)
+    directory.mkdir(parents=True)
+    tmp_directory = directory / "segments"
+    tmp_directory.mkdir()
+
+    doc_shards = array("i")
+    doc_offsets = array("q")
+    doc_utcs = array("q")
+    segments = []
+    segment = Segment()
+    for shard, jsonl_path in enumerate(jsonl_paths):
+        offset = 0
+        with open_shard(jsonl_path) as f:
+            for raw in f:
+                start = offset
+                offset += len(raw)
+                if not raw.strip():
+                    continue
+                line = loads(raw)
+                text = line.get(text_key)
+                if not text:
+                    continue
+                segment.add(len(doc_utcs), tokenize(text))
+                doc_shards.append(shard)
+                doc_offsets.append(start)
+                doc_utcs.append(line.get("created_utc") or 0)
+                if segment.n_docs >= segment_docs:
+                    path = tmp_directory / f"{len(segments)}.bin"
+                    segments.append((path, segment.write(path)))
+                    segment = Segment()
+    if segment.n_docs:
+        path = tmp_directory / f"{len(segments)}.bin"
+        segments.append((path, segment.write(path)))
+
+    np.save(directory / "doc_shards.npy", np.frombuffer(doc_shards, dtype=np.int32))
+    np.save(directory / "doc_offsets.npy", np.frombuffer(doc_offsets, dtype=np.int64))
+    np.save(directory / "doc_utcs.npy", np.frombuffer(doc_utcs, dtype=np.int64))
+
+    # merge the segments term by term
+    raws = [np.memmap(path, dtype=np.uint32, mode="r") for path, _ in segments]
+    terms = sorted(set().union(*[lexicon for _, lexicon in segments]))
+    lexicon = np.zeros((len(terms), 8), dtype=np.int64)
+    offsets = [0, 0, 0]
+    # byte offsets of the position blocks of every term
+    skips = []
+    n_skips = 0
+    files = [(directory / f"{name}.bin").open("wb") for name in POSTING_FILES]
+    try:
+        for i, term in enumerate(terms):
+            docs = []
+            freqs = []
+            positions = []
+            for raw, (_, segment_lexicon) in zip(raws, segments):
+                entry = segment_lexicon.get(term)
+                if entry is None:
+                    continue
+                start, n_docs, n_positions = entry
+                start //= 4
+                docs.append(raw[start : start + n_docs])
+                freqs.append(raw[start + n_docs : start + 2 * n_docs])
+                positions.append(
+                    raw[start + 2 * n_docs : start + 2 * n_docs + n_positions]
+                )
+            docs = np.concatenate(docs).astype(np.int64)
+            freqs = np.concatenate(freqs).astype(np.int64)
+            positions = np.concatenate(positions).astype(np.int64)
+
+            # doc ids as gaps, positions as gaps within their doc
+            doc_gaps = np.diff(docs, prepend=0)
+            doc_starts = np.cumsum(freqs) - freqs
+            position_gaps = np.diff(positions, prepend=0)
+            position_gaps[doc_starts] = positions[doc_starts]
+            # the first position of a doc is not a gap, so blocks decode alone
+            position_bytes = np.cumsum(varint_sizes(position_gaps))
+            block_starts = doc_starts[::POSITION_BLOCK]
+            skips.append(np.concatenate(([0], position_bytes[block_starts[1:] - 1])))
+
+            row = lexicon[i]
+            for k, values in enumerate((doc_gaps, freqs, position_gaps)):
+                data = encode_varints(values)
+                files[k].write(data)
+                row[2 * k] = offsets[k]
+                row[2 * k + 1] = len(data)
+                offsets[k] += len(data)
+            row[6] = len(docs)
+            row[7] = n_skips
+            n_skips += len(block_starts)
+    finally:
+        for f in files:
+            f.close()
+        del raws
+        shutil.rmtree(tmp_directory)
+
+    np.save(directory / "lexicon.npy", lexicon)
+    np.save(
+        directory / "position_skips.npy",
+        np.concatenate(skips) if skips else np.zeros(0, dtype=np.int64),
+    )
+    with (directory / "terms.json").open("w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+    with (directory / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "shards": [str(Path(p).resolve()) for p in jsonl_paths],
+                "text_key": text_key,
+                "n_docs": len(doc_utcs),
+                "n_terms": len(terms),
+                "timezone": timezone,
+            },
+            f,
+            indent=2,
+        )
+
+
+class TextIndex:
+    """
+    inverted index over the texts of jsonl files, stored in a directory:
+    - meta.json: the indexed files and key
+    - doc_shards.npy, doc_offsets.npy, doc_utcs.npy: file, byte offset and
+      created_utc of every indexed line (doc)
+    - terms.json and lexicon.npy: the sorted terms and where their postings are
+    - docs.bin, freqs.bin, positions.bin: varint encoded postings of every term,
+      the doc ids and the positions within a doc are stored as gaps
+    - position_skips.npy: byte offset of the positions of every POSITION_BLOCK
+      docs of a term, so phrase queries only decode the positions of the
+      blocks with candidate docs
+
+    queries return sorted arrays of doc ids, the lines are only read by records()
+    """
+
+    def __init__(self, directory, decoder: str = None, timezone: str = None):
+        """
+        :param timezone
+        :type time zone of count_by_month, None for the one the index was built with
+        """
+        self.directory = Path(directory)
+        with (self.directory / "meta.json").open("r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dates = Dates(timezone or self.meta.get("timezone"))
+        with (self.directory / "terms.json").open("r", encoding="utf-8") as f:
+            self.terms = {term: i for i, term in enumerate(json.load(f))}
+        self.lexicon = np.load(self.directory / "lexicon.npy")
+        self.position_skips = np.load(self.directory / "position_skips.npy")
+        self.doc_shards = np.load(self.directory / "doc_shards.npy", mmap_mode="r")
+        self.doc_offsets = np.load(self.directory / "doc_offsets.npy", mmap_mode="r")
+        self.doc_utcs = np.load(self.directory / "doc_utcs.npy", mmap_mode="r")
+        self.postings = [
+            np.memmap(self.directory / f"{name}.bin", dtype=np.uint8, mode="r")
+            if (self.directory / f"{name}.bin").stat().st_size
+            else np.zeros(0, dtype=np.uint8)
+            for name in POSTING_FILES
+        ]
+        self.loads = get_decoder(decoder)
+
+    def __len__(self):
+        return self.meta["n_docs"]
+
+    def block(self, term: str, k: int) -> np.ndarray:
+        row = self.lexicon[self.terms[term]]
+        start = row[2 * k]
+        return decode_varints(self.postings[k][start : start + row[2 * k + 1]])
+
+    def doc_freq(self, term: str) -> int:
+        i = self.terms.get(term)
+        return 0 if i is None else int(self.lexicon[i][6])
+
+    def term_docs(self, term: str) -> np.ndarray:
+        if term not in self.terms:
+            return np.zeros(0, dtype=np.int64)
+        return np.cumsum(self.block(term, 0))
+
+    def term_positions(self, term: str, docs=None):
+        """
+        return the doc of every position of a term and the positions,
+        with docs only those of the docs (only their blocks are decoded)
+        """
+        term_docs = self.term_docs(term)
+        freqs = self.block(term, 1)
+        row = self.lexicon[self.terms[term]]
+        n_blocks = -(-len(term_docs) // POSITION_BLOCK)
+        skips = self.position_skips[row[7] : row[7] + n_blocks] + row[4]
+        ends = np.append(skips[1:], row[4] + row[5])
+        if docs is None:
+            blocks = np.arange(n_blocks)
+        else:
+            index = np.searchsorted(term_docs, docs)
+            blocks = np.unique(index[index < len(term_docs)] // POSITION_BLOCK)
+        if len(blocks) == n_blocks:
+            doc_index = np.arange(len(term_docs))
+            gaps = self.block(term, 2)
+        else:
+            doc_index = np.concatenate(
+                [
+                    np.arange(b * POSITION_BLOCK, (b + 1) * POSITION_BLOCK)
+                    for b in blocks
+                ]
+            )
+            doc_index = doc_index[doc_index < len(term_docs)]
+            data = [self.postings[2][skips[b] : ends[b]] for b in blocks]
+            gaps = decode_varints(np.concatenate(data) if data else b"")
+        term_docs = term_docs[doc_index]
+        freqs = freqs[doc_index]
+        # restart the sum of the gaps at every doc
+        totals = np.cumsum(gaps)
+        doc_starts = np.cumsum(freqs) - freqs
+        base = np.repeat(totals[doc_starts] - gaps[doc_starts], freqs)
+        position_docs = np.repeat(term_docs, freqs)
+        positions = totals - base
+        if docs is not None:
+            keep = np.isin(position_docs, docs)
+            position_docs = position_docs[keep]
+            positions = positions[keep]
+        return position_docs, positions
+
+    def phrase_docs(self, phrase: str) -> np.ndarray:
+        """
+        docs that contain the words of the phrase next to each other
+        """
+        terms = tokenize(phrase)
+        if not terms or any(term not in self.terms for term in terms):
+            return np.zeros(0, dtype=np.int64)
+        # docs with all terms, rarest first
+        docs = None
+        for term in sorted(set(terms), key=self.doc_freq):
+            term_docs = self.term_docs(term)
+            docs = (
+                term_docs
+                if docs is None
+                else np.intersect1d(docs, term_docs, assume_unique=True)
+            )
+            if not len(docs):
+                return docs
+        if len(terms) == 1:
+            return docs
+
+        keys = None
+        for k, term in enumerate(terms):
+            position_docs, positions = self.term_positions(term, docs)
+            keep = positions >= k
+            term_keys = position_docs[keep] * POSITION_SHIFT + positions[keep] - k
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys)
+        return np.unique(keys // POSITION_SHIFT)
+
+    def search(self, query) -> np.ndarray:
+        """
+        docs that contain any of the phrases
+
+        :param query
+        :type a phrase or a list of phrases, e.g. ["this community", "you guys"]
+        """
+        if isinstance(query, str):
+            query = [query]
+        docs = np.zeros(0, dtype=np.int64)
+        for phrase in query:
+            docs = np.union1d(docs, self.phrase_docs(phrase))
+        return docs
+
+    def records(self, docs, fields: list = None):
+        """
+        yield the lines of the docs in doc order, the docs of every file are
+        read in one forward pass from their byte offsets
+        """
+        docs = np.unique(np.asarray(docs, dtype=np.int64))
+        shards = np.asarray(self.doc_shards)[docs]
+        offsets = np.asarray(self.doc_offsets)[docs]
+        # docs are numbered in the order of the files and offsets
+        for shard in np.unique(shards):
+            path = self.meta["shards"][shard]
+            shard_offsets = offsets[shards == shard]
+            compressed = get_compression(path) is not None
+            # compressed files are decompressed once up to the first offset
+            with open_shard(path, offset=int(shard_offsets[0])) as f:
+                position = int(shard_offsets[0])
+                for offset in shard_offsets:
+                    offset = int(offset)
+                    if not compressed:
+                        f.seek(offset)
+                    else:
+                        # skip the lines in between
+                        while position < offset:
+                            skipped = len(f.read(min(offset - position, 1 << 20)))
+                            if not skipped:
+                                break
+                            position += skipped
+                    raw = f.readline()
+                    position = offset + len(raw)
+                    line = self.loads(raw)
+                    yield project(line, fields) if fields else line
+
+    def count_by_month(self, docs) -> dict:
+        """
+        {"YYYY-MM": number of docs}, months in the time zone like the processed lines
+        """
+        utcs = np.asarray(self.doc_utcs)[np.asarray(docs, dtype=np.int64)]
+        if not len(utcs):
+            return {}
+        # the months from the first to the last doc and the epochs they start at
+        first, last = (
+            self.dates.format_day(self.dates.local(utc) // DAY)[:7]
+            for utc in (utcs.min(), utcs.max())
+        )
+        year, month = int(first[:4]), int(first[5:])
+        months = []
+        starts = []
+        while not months or months[-1] < last:
+            months.append(f"{year:04d}-{month:02d}")
+            starts.append(self.dates.epoch(datetime.datetime(year, month, 1)))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        starts = np.array(starts, dtype=np.int64)
+        counts = np.bincount(
+            np.searchsorted(starts, utcs, side="right") - 1, minlength=len(months)
+        )
+        return {m: int(n) for m, n in zip(months, counts) if n}
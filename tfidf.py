@@ -0,0 +1,189 @@
+import re
+import zlib
+import numpy as np
+import scipy.sparse as sp
+from array import array
+
+# the default token pattern of sklearn's TfidfVectorizer
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def iter_batches(iterable, batch_size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def add_group_sums(sums: dict, matrix, groups: list):
+    """
+    add the rows of a sparse matrix to the sums of their groups: {group: sparse row}
+    """
+    names = list(dict.fromkeys(groups))
+    rows = [names.index(group) for group in groups]
+    indicator = sp.csr_matrix(
+        (np.ones(len(groups)), (rows, np.arange(len(groups)))),
+        shape=(len(names), len(groups)),
+    )
+    for name, row in zip(names, indicator @ matrix):
+        sums[name] = sums[name] + row if name in sums else row
+    return sums
+
+
+class TfidfModel:
+    """
+    sparse tf-idf weights of texts that are streamed instead of held in memory
+
+    fit() counts the document frequencies in one pass over the texts,
+    transform() yields the weights of a second pass as sparse rows in batches.
+    the weights are those of sklearn's TfidfVectorizer(norm=None): the raw term
+    count times ln((1 + n_docs) / (1 + df)) + 1, terms outside min_df/max_df
+    get no weight
+
+    the vocabulary grows with the texts, or with hashing every term is mapped
+    to one of n_features columns so the memory does not grow with the corpus
+    (terms that share a column are counted together)
+    """
+
+    def __init__(
+        self,
+        max_df=1.0,
+        min_df=1,
+        hashing: bool = False,
+        n_features: int = 2**20,
+        batch_size: int = 10000,
+    ):
+        """
+        :param max_df, min_df
+        :type int for a number of docs, float for a share of the docs, as in sklearn
+        """
+        self.max_df = max_df
+        self.min_df = min_df
+        self.hashing = hashing
+        self.n_features = n_features
+        self.batch_size = batch_size
+        # {term: column} of the growing vocabulary
+        self.vocabulary = {}
+        # term of every column, with hashing the first term seen in a column
+        self.terms = {} if hashing else []
+        self.df = None
+        self.idf = None
+        self.n_docs = 0
+
+    def columns(self, text: str, grow: bool = False) -> list:
+        """
+        the column of every token of a text
+        """
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        if self.hashing:
+            n = self.n_features
+            columns = [zlib.crc32(t.encode("utf-8")) % n for t in tokens]
+            if grow:
+                for t, column in zip(tokens, columns):
+                    if column not in self.terms:
+                        self.terms[column] = t
+            return columns
+        vocabulary = self.vocabulary
+        if grow:
+            for t in tokens:
+                if t not in vocabulary:
+                    vocabulary[t] = len(self.terms)
+                    self.terms.append(t)
+            return [vocabulary[t] for t in tokens]
+        return [vocabulary[t] for t in tokens if t in vocabulary]
+
+    def fit(self, texts):
+        """
+        count the document frequencies of an iterable of texts
+        """
+        df = np.zeros(self.n_features if self.hashing else 0, dtype=np.int64)
+        self.n_docs = 0
+        for batch in iter_batches(texts, self.batch_size):
+            columns = array("q")
+            for text in batch:
+                columns.extend(set(self.columns(text, grow=True)))
+            n_columns = self.n_features if self.hashing else len(self.terms)
+            columns = np.frombuffer(columns, dtype=np.int64)
+            df = np.concatenate([df, np.zeros(n_columns - len(df), dtype=np.int64)])
+            df += np.bincount(columns, minlength=n_columns)
+            self.n_docs += len(batch)
+        self.df = df
+
+        max_df = self.max_df
+        if isinstance(max_df, float):
+            max_df *= self.n_docs
+        min_df = self.min_df
+        if isinstance(min_df, float):
+            min_df *= self.n_docs
+        self.idf = np.log((1 + self.n_docs) / (1 + df)) + 1
+        self.idf[(df > max_df) | (df < min_df)] = 0
+        return self
+
+    def transform_batch(self, texts: list):
+        """
+        return the weights of texts as a sparse matrix, one row per text
+        """
+        indices = array("q")
+        indptr = [0]
+        for text in texts:
+            indices.extend(self.columns(text))
+            indptr.append(len(indices))
+        matrix = sp.csr_matrix(
+            (
+                np.ones(len(indices)),
+                np.frombuffer(indices, dtype=np.int64),
+                np.array(indptr, dtype=np.int64),
+            ),
+            shape=(len(texts), len(self.idf)),
+        )
+        matrix.sum_duplicates()
+        matrix.data *= self.idf[matrix.indices]
+        matrix.eliminate_zeros()
+        return matrix
+
+    def transform(self, texts):
+        """
+        yield the weights of an iterable of texts in sparse batches of batch_size rows
+        """
+        for batch in iter_batches(texts, self.batch_size):
+            yield self.transform_batch(batch)
+
+    def fit_transform(self, texts: list):
+        """
+        fit and return the weights of a list of texts as one sparse matrix
+        """
+        self.fit(texts)
+        return sp.vstack(list(self.transform(texts)), format="csr")
+
+    def get_term(self, column: int) -> str:
+        return self.terms[column]
+
+    def top_terms(self, matrix, n: int = 5) -> list:
+        """
+        return the n terms with the highest weight of every row, as lists of (term, weight)
+
+        :param matrix
+        :type sparse matrix or list of sparse rows
+        """
+        if isinstance(matrix, list):
+            if not matrix:
+                return []
+            matrix = sp.vstack(matrix)
+        matrix = sp.csr_matrix(matrix)
+        top = []
+        for i in range(matrix.shape[0]):
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            data = matrix.data[start:end]
+            indices = matrix.indices[start:end]
+            if len(data) > n:
+                # partial sort, only the n highest are ordered
+                best = np.argpartition(-data, n - 1)[:n]
+            else:
+                best = np.arange(len(data))
+            best = best[np.argsort(-data[best], kind="stable")]
+            top.append([(self.get_term(indices[j]), float(data[j])) for j in best])
+        return top